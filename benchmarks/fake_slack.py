@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+from collections import Counter
+import random
+import time
+from typing import Any, NamedTuple, final
+
+from fastapi import FastAPI, Request, responses
+import uvicorn
+
+TEAM_ID = "T0BENCHMARK"
+
+
+class FakeSlackSettings(NamedTuple):
+    latency_ms: float = 0
+    latency_jitter_ms: float = 0
+    # Share of calls answered with 429 and Retry-After
+    rate_limit_rate: float = 0
+    retry_after_seconds: int = 1
+    # Share of calls answered with 500
+    failure_rate: float = 0
+    team_id: str = TEAM_ID
+    users: int = 200
+    seed: int | None = None
+
+
+def make_user(user_id: str, team_id: str) -> dict[str, Any]:
+    return {
+        "id": user_id,
+        "locale": "en-US",
+        "real_name": f"Benchmark {user_id}",
+        "team_id": team_id,
+        "tz_offset": 0,
+    }
+
+
+@final
+class FakeSlack:
+    def __init__(self, settings: FakeSlackSettings = FakeSlackSettings()):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.calls: Counter[str] = Counter()
+        self.app = FastAPI()
+        self.register_routes()
+
+    async def simulate(self, name: str) -> responses.Response | None:
+        self.calls[name] += 1
+        settings = self.settings
+        delay_ms = settings.latency_ms + self.random.uniform(
+            -settings.latency_jitter_ms, settings.latency_jitter_ms
+        )
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+        roll = self.random.random()
+        if roll < settings.rate_limit_rate:
+            self.calls["rate_limited"] += 1
+            return responses.JSONResponse(
+                {"ok": False, "error": "ratelimited"},
+                status_code=429,
+                headers={"Retry-After": str(settings.retry_after_seconds)},
+            )
+        if roll < settings.rate_limit_rate + settings.failure_rate:
+            self.calls["failed"] += 1
+            return responses.JSONResponse(
+                {"ok": False, "error": "internal_error"}, status_code=500
+            )
+        return None
+
+    def register_routes(self) -> None:
+        app = self.app
+
+        @app.post("/api/users.info")
+        async def users_info(request: Request):
+            if (response := await self.simulate("users.info")) is not None:
+                return response
+            user_id = request.query_params.get("user", "")
+            return {"ok": True, "user": make_user(user_id, self.settings.team_id)}
+
+        @app.post("/api/users.list")
+        async def users_list(request: Request):
+            if (response := await self.simulate("users.list")) is not None:
+                return response
+            offset = int(request.query_params.get("cursor") or 0)
+            limit = int(request.query_params.get("limit") or 200)
+            end = min(offset + limit, self.settings.users)
+            return {
+                "ok": True,
+                "members": [
+                    make_user(f"U{i:06d}", self.settings.team_id)
+                    for i in range(offset, end)
+                ],
+                "response_metadata": {
+                    "next_cursor": str(end) if end < self.settings.users else ""
+                },
+            }
+
+        @app.post("/api/chat.postMessage")
+        async def chat_post_message(request: Request):
+            if (response := await self.simulate("chat.postMessage")) is not None:
+                return response
+            body = await request.json()
+            return {
+                "ok": True,
+                "channel": body.get("channel"),
+                "ts": f"{time.time():.6f}",
+            }
+
+        @app.post("/response_url/{path:path}")
+        async def response_url(path: str):
+            if (response := await self.simulate("response_url")) is not None:
+                return response
+            return responses.PlainTextResponse("ok")
+
+        @app.get("/stats")
+        def stats():
+            return dict(self.calls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve a fake Slack Web API with injectable latency and errors"
+    )
+    _ = parser.add_argument("--host", default="127.0.0.1")
+    _ = parser.add_argument("--port", type=int, default=8081)
+    _ = parser.add_argument("--latency-ms", type=float, default=0)
+    _ = parser.add_argument("--latency-jitter-ms", type=float, default=0)
+    _ = parser.add_argument("--rate-limit-rate", type=float, default=0)
+    _ = parser.add_argument("--retry-after-seconds", type=int, default=1)
+    _ = parser.add_argument("--failure-rate", type=float, default=0)
+    _ = parser.add_argument("--users", type=int, default=200)
+    _ = parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    fake_slack = FakeSlack(
+        FakeSlackSettings(
+            latency_ms=args.latency_ms,
+            latency_jitter_ms=args.latency_jitter_ms,
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after_seconds=args.retry_after_seconds,
+            failure_rate=args.failure_rate,
+            users=args.users,
+            seed=args.seed,
+        )
+    )
+    print(f"Set SLACK_API_BASE_URL=http://{args.host}:{args.port}/api/")
+    uvicorn.run(fake_slack.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any
+from urllib.parse import urlencode
+
+import httpx
+
+from benchmarks.fake_slack import TEAM_ID, FakeSlack, FakeSlackSettings
+from benchmarks.report import compare_results, save_results, summarize_latencies
+from lib.models import AFKRecord
+from lib.services import WriteMode
+
+SIGNING_SECRET = "benchmark-signing-secret"
+CHANNEL_ID = "C0BENCHMARK"
+# Host name of the in-process fake Slack, requests to it never leave the process
+IN_PROCESS_SLACK_URL = "http://fake-slack.local"
+# Clear runs last, it cancels the records the other scenarios read
+SCENARIOS = ("create", "list", "table", "interactive", "clear")
+
+type RequestBuilder = Callable[[int], tuple[str, bytes]]
+
+
+def parse_int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Drive the Slack endpoints through the FastAPI app with local stand-ins for Slack and storage"
+    )
+    _ = parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    _ = parser.add_argument("--concurrency", type=parse_int_list, default=[1, 10, 50])
+    _ = parser.add_argument("--records", type=parse_int_list, default=[0, 1000])
+    _ = parser.add_argument("--requests", type=int, default=500)
+    _ = parser.add_argument("--users", type=int, default=200)
+    _ = parser.add_argument("--storage", choices=("memory", "mongo"), default="memory")
+    _ = parser.add_argument(
+        "--slack-url",
+        default=None,
+        help="Base URL of a running fake Slack server, by default one runs in process",
+    )
+    _ = parser.add_argument("--slack-latency-ms", type=float, default=0)
+    _ = parser.add_argument("--slack-latency-jitter-ms", type=float, default=0)
+    _ = parser.add_argument("--slack-rate-limit-rate", type=float, default=0)
+    _ = parser.add_argument("--slack-failure-rate", type=float, default=0)
+    _ = parser.add_argument("--log-level", default="WARNING")
+    _ = parser.add_argument("--output", default=None)
+    _ = parser.add_argument("--compare", default=None, help="Earlier results file")
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # Read when main is imported
+    os.environ["SLACK_SIGNING_SECRET"] = SIGNING_SECRET
+    os.environ["SLACK_BOT_TOKEN"] = "xoxb-benchmark"
+    os.environ["AFK_STORAGE_BACKEND"] = args.storage
+    os.environ["LOG_LEVEL"] = args.log_level
+    # One benchmark team sends everything, its limits would cap the results
+    os.environ.setdefault("RATE_LIMIT_TEAM_REQUESTS_PER_SECOND", "0")
+    os.environ.setdefault("RATE_LIMIT_USER_REQUESTS_PER_SECOND", "0")
+    os.environ["SLACK_API_BASE_URL"] = f"{get_slack_url(args)}/api/"
+
+
+def get_slack_url(args: argparse.Namespace) -> str:
+    return (args.slack_url or IN_PROCESS_SLACK_URL).rstrip("/")
+
+
+def get_signed_headers(body: bytes, content_type: str) -> dict[str, str]:
+    timestamp = str(int(time.time()))
+    signature = hmac.new(
+        SIGNING_SECRET.encode(),
+        b"v0:" + timestamp.encode() + b":" + body,
+        hashlib.sha256,
+    ).hexdigest()
+    return {
+        "Content-Type": content_type,
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": f"v0={signature}",
+    }
+
+
+def get_user_id(index: int, users: int) -> str:
+    return f"U{index % users:06d}"
+
+
+def get_slash_command_builder(
+    text: str, users: int, run_id: str, response_url: str
+) -> RequestBuilder:
+    def build(index: int) -> tuple[str, bytes]:
+        body = urlencode(
+            {
+                "api_app_id": "A0BENCHMARK",
+                "channel_id": CHANNEL_ID,
+                "command": "/afk",
+                "is_enterprise_install": "false",
+                "response_url": response_url,
+                "team_id": TEAM_ID,
+                "text": text,
+                "token": "benchmark",
+                "trigger_id": f"{run_id}.{index}",
+                "user_id": get_user_id(index, users),
+            }
+        ).encode()
+        return "/v1/slack_bot", body
+
+    return build
+
+
+def get_next_page_builder(users: int, run_id: str, response_url: str) -> RequestBuilder:
+    def build(index: int) -> tuple[str, bytes]:
+        payload = {
+            "type": "block_actions",
+            "actions": [
+                {
+                    "action_id": "next_page_button",
+                    "block_id": "pagination_block",
+                    "value": "list:40",
+                }
+            ],
+            "response_url": response_url,
+            "team": {"id": TEAM_ID},
+            "trigger_id": f"{run_id}.{index}",
+            "user": {"id": get_user_id(index, users)},
+        }
+        return "/v1/interactive_message", urlencode(
+            {"payload": json.dumps(payload)}
+        ).encode()
+
+    return build
+
+
+def get_request_builder(
+    scenario: str, users: int, run_id: str, response_url: str
+) -> RequestBuilder:
+    if scenario == "create":
+        return get_slash_command_builder(
+            "for 2 hours", users=users, run_id=run_id, response_url=response_url
+        )
+    if scenario == "interactive":
+        return get_next_page_builder(
+            users=users, run_id=run_id, response_url=response_url
+        )
+    return get_slash_command_builder(
+        scenario, users=users, run_id=run_id, response_url=response_url
+    )
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    build_request: RequestBuilder,
+    requests: int,
+    concurrency: int,
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def work() -> None:
+        nonlocal errors
+        # Workers share one iterator, so each request is sent exactly once
+        for index in indexes:
+            path, body = build_request(index)
+            headers = get_signed_headers(
+                body, content_type="application/x-www-form-urlencoded"
+            )
+            started_at = time.perf_counter()
+            try:
+                response = await client.post(path, content=body, headers=headers)
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started_at)
+            errors += failed
+
+    started_at = time.perf_counter()
+    _ = await asyncio.gather(*(work() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    # Imported here, main reads its configuration at import
+    import main as server
+
+    fake_slack: FakeSlack | None = None
+    if args.slack_url is None:
+        fake_slack = FakeSlack(
+            FakeSlackSettings(
+                latency_ms=args.slack_latency_ms,
+                latency_jitter_ms=args.slack_latency_jitter_ms,
+                rate_limit_rate=args.slack_rate_limit_rate,
+                failure_rate=args.slack_failure_rate,
+                users=args.users,
+            )
+        )
+        transport = httpx.ASGITransport(app=fake_slack.app)
+        server.slack_service.http_client = httpx.AsyncClient(
+            base_url=server.slack_service.http_client.base_url, transport=transport
+        )
+        server.slack_service.webhook_client = httpx.AsyncClient(transport=transport)
+    response_url = f"{get_slack_url(args)}/response_url/commands/benchmark"
+
+    scenarios = [s for s in SCENARIOS if s in args.scenarios.split(",")]
+    results: dict[str, Any] = {}
+    async with server.app.router.lifespan_context(server.app):
+        storage_service = server.get_storage_service()
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark"
+        )
+        for records in args.records:
+            for concurrency in args.concurrency:
+                # Start every run from the same seeded team
+                _ = await storage_service.write(
+                    [],
+                    mode=WriteMode.OVERWRITE,
+                    scope={"team_id": [TEAM_ID]},
+                )
+                end_datetime = datetime.now(tz=UTC) + timedelta(days=1)
+                _ = await storage_service.write(
+                    [
+                        AFKRecord(
+                            channel_id=CHANNEL_ID,
+                            command="/afk",
+                            end_datetime=(
+                                end_datetime + timedelta(seconds=i)
+                            ).timestamp(),
+                            start_datetime=datetime.now(tz=UTC).timestamp(),
+                            team_id=TEAM_ID,
+                            text="seeded",
+                            trigger_id=f"seed.{i}",
+                            user_id=get_user_id(i, args.users),
+                        )
+                        for i in range(records)
+                    ]
+                )
+                for scenario in scenarios:
+                    key = f"{scenario}@c{concurrency}/r{records}"
+                    results[key] = await run_scenario(
+                        client,
+                        build_request=get_request_builder(
+                            scenario,
+                            users=args.users,
+                            run_id=f"{key}.{time.time_ns()}",
+                            response_url=response_url,
+                        ),
+                        requests=args.requests,
+                        concurrency=concurrency,
+                    )
+                    latency = results[key]["latency_ms"]
+                    print(
+                        f"{key:<28} {results[key]['throughput_rps']:>9.1f} req/s"
+                        f"  p50 {latency['p50']:>8.2f} ms  p95 {latency['p95']:>8.2f} ms"
+                        f"  p99 {latency['p99']:>8.2f} ms  errors {results[key]['errors']}"
+                    )
+        await client.aclose()
+    if fake_slack is not None:
+        print(f"Fake Slack calls: {dict(fake_slack.calls)}")
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+    path = save_results(
+        "load_test",
+        parameters={
+            "concurrency": args.concurrency,
+            "records": args.records,
+            "requests": args.requests,
+            "scenarios": args.scenarios,
+            "slack_failure_rate": args.slack_failure_rate,
+            "slack_latency_jitter_ms": args.slack_latency_jitter_ms,
+            "slack_latency_ms": args.slack_latency_ms,
+            "slack_rate_limit_rate": args.slack_rate_limit_rate,
+            "slack_url": args.slack_url,
+            "storage": args.storage,
+            "users": args.users,
+        },
+        results=results,
+        output=args.output,
+    )
+    print(f"Results saved to {path}")
+    if args.compare:
+        print("\n".join(compare_results(results, args.compare)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+import statistics
+import timeit
+from typing import Any
+
+from benchmarks.report import compare_results, save_results
+from lib.models import AFKRecord, AFKStatus, UserInfo
+from lib.services import SlackService
+from lib.utils import format_afk_records_to_print, typed_dict_to_mongodb_query
+
+TEAM_ID = "T0BENCHMARK"
+
+
+def parse_int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Time the hot helpers of the slash command paths"
+    )
+    _ = parser.add_argument("--records", type=parse_int_list, default=[10, 40, 1000])
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    _ = parser.add_argument("--output", default=None)
+    _ = parser.add_argument("--compare", default=None, help="Earlier results file")
+    return parser.parse_args()
+
+
+def measure(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    timer = timeit.Timer(func)
+    # Enough loops for each repeat to take at least 0.2 seconds
+    loops, _ = timer.autorange()
+    per_call = [total / loops for total in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "ns_per_op_best": round(min(per_call) * 1e9, 1),
+        "ns_per_op_median": round(statistics.median(per_call) * 1e9, 1),
+        "ops_per_second": round(1 / min(per_call), 1),
+    }
+
+
+def make_records(count: int) -> list[AFKRecord]:
+    now = datetime.now(tz=UTC)
+    return [
+        AFKRecord(
+            channel_id="C0BENCHMARK",
+            command="/afk",
+            end_datetime=(now + timedelta(hours=1, seconds=i)).timestamp(),
+            start_datetime=now.timestamp(),
+            team_id=TEAM_ID,
+            text="for 1 hour",
+            trigger_id=f"trigger.{i}",
+            user_id=f"U{i % 100:06d}",
+        )
+        for i in range(count)
+    ]
+
+
+def make_users_info(records: list[AFKRecord]) -> dict[str, UserInfo]:
+    return {
+        record.user_id: UserInfo(
+            id=record.user_id,
+            locale="en-US",
+            real_name=f"Benchmark {record.user_id}",
+            team_id=TEAM_ID,
+            tz_offset=0,
+        )
+        for record in records
+    }
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    active_filter = {
+        "end_datetime": datetime.now(tz=UTC),
+        "status": [AFKStatus.ACTIVE],
+        "team_id": [TEAM_ID],
+    }
+    results["typed_dict_to_mongodb_query"] = measure(
+        lambda: typed_dict_to_mongodb_query(active_filter), repeat=args.repeat
+    )
+    for count in args.records:
+        records = make_records(count)
+        users_info = make_users_info(records)
+        viewer = next(iter(users_info.values()))
+        results[f"format_afk_records_to_print[{count}]"] = measure(
+            lambda: format_afk_records_to_print(
+                afk_records=records, user_info=viewer, users_info=users_info
+            ),
+            repeat=args.repeat,
+        )
+        records_to_print = format_afk_records_to_print(
+            afk_records=records, user_info=viewer, users_info=users_info
+        )
+        results[f"get_table_response[{count}]"] = measure(
+            lambda: SlackService.get_table_response(records_to_print),
+            repeat=args.repeat,
+        )
+    for name, result in results.items():
+        print(
+            f"{name:<40} {result['ns_per_op_best']:>14,.0f} ns/op"
+            f"  {result['ops_per_second']:>14,.0f} ops/s"
+        )
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    results = run(args)
+    path = save_results(
+        "micro",
+        parameters={"records": args.records, "repeat": args.repeat},
+        results=results,
+        output=args.output,
+    )
+    print(f"Results saved to {path}")
+    if args.compare:
+        print("\n".join(compare_results(results, args.compare)))
+
+
+if __name__ == "__main__":
+    main()
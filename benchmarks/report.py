@@ -0,0 +1,95 @@
+from collections.abc import Mapping, Sequence
+from datetime import UTC, datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+from typing import Any
+
+DEFAULT_RESULTS_DIR = "benchmark_results"
+
+
+def summarize_latencies(latencies: Sequence[float]) -> dict[str, float]:
+    # Seconds in, milliseconds out, percentiles by nearest rank
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+    return {
+        name: round(value * 1000, 3)
+        for name, value in (
+            ("p50", percentile(50)),
+            ("p95", percentile(95)),
+            ("p99", percentile(99)),
+            ("max", ordered[-1]),
+            ("mean", statistics.fmean(ordered)),
+        )
+    }
+
+
+def get_git_commit() -> str:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+    except OSError:
+        return "unknown"
+    return completed.stdout.strip() if completed.returncode == 0 else "unknown"
+
+
+def save_results(
+    name: str,
+    parameters: Mapping[str, Any],
+    results: Mapping[str, Any],
+    output: str | None = None,
+) -> str:
+    created_at = datetime.now(tz=UTC)
+    path = output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"{name}-{created_at:%Y%m%dT%H%M%SZ}.json"
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, mode="w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "benchmark": name,
+                "created_at": created_at.isoformat(),
+                "environment": {
+                    "git_commit": get_git_commit(),
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                },
+                "parameters": parameters,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    return path
+
+
+def flatten(results: Mapping[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        if isinstance(value, Mapping):
+            flat.update(flatten(value, prefix=f"{prefix}{key}."))
+        elif isinstance(value, int | float) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = float(value)
+    return flat
+
+
+def compare_results(results: Mapping[str, Any], baseline_path: str) -> list[str]:
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = flatten(json.load(file)["results"])
+    lines: list[str] = []
+    for key, value in flatten(results).items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        change = (value - previous) / previous * 100 if previous else 0.0
+        lines.append(f"{key}: {previous:g} -> {value:g} ({change:+.1f}%)")
+    return lines
@@ -0,0 +1,250 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable, Collection
+from enum import Enum
+import logging
+import math
+import time
+from typing import Any, NamedTuple, final
+from urllib.parse import parse_qsl
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from lib.interactions import parse_interactive_payload
+from lib.metrics import metrics
+from lib.tracing import span
+
+logger = logging.getLogger(__name__)
+
+event_loop_lag = metrics.gauge(
+    "event_loop_lag_seconds", "How late the last event loop lag probe woke up"
+)
+requests_in_flight = metrics.gauge(
+    "slack_requests_in_flight", "Slack requests being handled right now"
+)
+
+
+class AdmissionDecision(Enum):
+    ADMIT = "admit"
+    OVERLOADED = "overloaded"
+    TEAM_RATE_LIMITED = "team_rate_limited"
+    USER_RATE_LIMITED = "user_rate_limited"
+
+
+# Shown to the user by Slack, which treats anything but a 200 as a failed command
+REJECTION_MESSAGES = {
+    AdmissionDecision.OVERLOADED: "AFK Slackbot is busy right now, please try again in a few seconds.",
+    AdmissionDecision.TEAM_RATE_LIMITED: "Your workspace is sending too many AFK commands, please try again in a few seconds.",
+    AdmissionDecision.USER_RATE_LIMITED: "You are sending AFK commands too quickly, please try again in a few seconds.",
+}
+
+requests_rejected = {
+    decision: metrics.counter(
+        "slack_requests_rejected_total",
+        "Slack requests turned away before being handled",
+        labels={"reason": decision.value},
+    )
+    for decision in REJECTION_MESSAGES
+}
+
+
+class Admission(NamedTuple):
+    decision: AdmissionDecision
+    retry_after_seconds: float = 0
+
+
+@final
+class TokenBucketLimiter:
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: float,
+        max_keys: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, refilled_at), least recently used first. An evicted
+        # key starts again with a full bucket.
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def try_acquire(self, key: str) -> float:
+        # 0 when a token was taken, otherwise seconds until the next one
+        now = self.clock()
+        tokens, refilled_at = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - refilled_at) * self.rate_per_second)
+        wait_seconds = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait_seconds = (1 - tokens) / self.rate_per_second
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            _ = self.buckets.popitem(last=False)
+        return wait_seconds
+
+
+@final
+class EventLoopLagMonitor:
+    def __init__(self, interval_seconds: float = 0.1):
+        self.interval_seconds = interval_seconds
+        self.lag_seconds = 0.0
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="event_loop_lag")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        _ = self.task.cancel()
+        _ = await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        self.lag_seconds = 0.0
+
+    async def run(self) -> None:
+        # A busy loop runs the wakeup late, by about as long as callbacks wait
+        loop = asyncio.get_running_loop()
+        while True:
+            started_at = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            self.lag_seconds = max(
+                0.0, loop.time() - started_at - self.interval_seconds
+            )
+            event_loop_lag.set(self.lag_seconds)
+
+
+@final
+class AdmissionController:
+    def __init__(
+        self,
+        team_limiter: TokenBucketLimiter | None = None,
+        user_limiter: TokenBucketLimiter | None = None,
+        lag_monitor: EventLoopLagMonitor | None = None,
+        max_event_loop_lag_seconds: float = 0,
+        max_in_flight: int = 0,
+        overload_retry_after_seconds: float = 1,
+    ):
+        self.team_limiter = team_limiter
+        self.user_limiter = user_limiter
+        self.lag_monitor = lag_monitor
+        self.max_event_loop_lag_seconds = max_event_loop_lag_seconds
+        self.max_in_flight = max_in_flight
+        self.overload_retry_after_seconds = overload_retry_after_seconds
+        self.in_flight = 0
+
+    def is_overloaded(self) -> bool:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return True
+        return bool(
+            self.lag_monitor is not None
+            and self.max_event_loop_lag_seconds
+            and self.lag_monitor.lag_seconds > self.max_event_loop_lag_seconds
+        )
+
+    def admit(self, team_id: str | None, user_id: str | None) -> Admission:
+        # Shedding is checked first, it costs nothing and protects everyone
+        if self.is_overloaded():
+            return Admission(
+                AdmissionDecision.OVERLOADED, self.overload_retry_after_seconds
+            )
+        # The user's own bucket goes first, so a user over their limit doesn't
+        # also use up their team's
+        if self.user_limiter is not None and team_id and user_id:
+            wait_seconds = self.user_limiter.try_acquire(f"{team_id}:{user_id}")
+            if wait_seconds:
+                return Admission(AdmissionDecision.USER_RATE_LIMITED, wait_seconds)
+        if self.team_limiter is not None and team_id:
+            wait_seconds = self.team_limiter.try_acquire(team_id)
+            if wait_seconds:
+                return Admission(AdmissionDecision.TEAM_RATE_LIMITED, wait_seconds)
+        return Admission(AdmissionDecision.ADMIT)
+
+
+class SlackRequestBody(NamedTuple):
+    form: dict[str, str]
+    # The decoded `payload` field of interactions, None for slash commands or
+    # when it isn't a JSON object
+    payload: dict[str, Any] | None = None
+
+
+def parse_slack_request_body(body: bytes) -> SlackRequestBody | None:
+    # Slash commands are form fields, interactions a JSON `payload` field
+    try:
+        form = dict(parse_qsl(body.decode(), keep_blank_values=True))
+    except UnicodeDecodeError:
+        return None
+    payload_value = form.get("payload")
+    return SlackRequestBody(
+        form=form,
+        payload=parse_interactive_payload(payload_value) if payload_value else None,
+    )
+
+
+def get_requester(body: SlackRequestBody | None) -> tuple[str | None, str | None]:
+    if body is None:
+        return None, None
+    if body.payload is None:
+        return body.form.get("team_id"), body.form.get("user_id")
+    team, user = body.payload.get("team"), body.payload.get("user")
+    if not isinstance(team, dict) or not isinstance(user, dict):
+        return None, None
+    return team.get("id"), user.get("id")
+
+
+@final
+class AdmissionMiddleware:
+    # Sits inside SlackSignatureMiddleware, which leaves the verified body in
+    # the request state. The body is parsed once here and left next to it for
+    # the handlers.
+    def __init__(
+        self, app: ASGIApp, controller: AdmissionController, paths: Collection[str]
+    ):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        with span("body_parse"):
+            body = parse_slack_request_body(state.get("raw_body", b""))
+        state["slack_body"] = body
+        team_id, user_id = get_requester(body)
+        admission = self.controller.admit(team_id=team_id, user_id=user_id)
+        if admission.decision != AdmissionDecision.ADMIT:
+            requests_rejected[admission.decision].inc()
+            logger.warning(
+                "Slack request rejected",
+                extra={
+                    "reason": admission.decision.value,
+                    "team_id": team_id,
+                    "user_id": user_id,
+                },
+            )
+            response = JSONResponse(
+                {
+                    "response_type": "ephemeral",
+                    "text": REJECTION_MESSAGES[admission.decision],
+                },
+                headers={
+                    "Retry-After": str(max(1, math.ceil(admission.retry_after_seconds)))
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        self.controller.in_flight += 1
+        requests_in_flight.set(self.controller.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.in_flight -= 1
+            requests_in_flight.set(self.controller.in_flight)
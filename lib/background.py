@@ -0,0 +1,39 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+from typing import Any, final
+
+logger = logging.getLogger(__name__)
+
+
+@final
+class PeriodicTask:
+    def __init__(
+        self,
+        name: str,
+        interval_seconds: float,
+        func: Callable[[], Awaitable[Any]],
+    ):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        _ = self.task.cancel()
+        _ = await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                _ = await self.func()
+            except Exception:
+                logger.exception("Periodic task failed", extra={"task": self.name})
+            await asyncio.sleep(self.interval_seconds)
@@ -1,63 +1,165 @@
-from datetime import UTC, datetime, timedelta, timezone
+from datetime import datetime, timedelta, timezone
 
-from afk_parser.afk_parser import AFKParser
 from fastapi import Response, status
-from slack_sdk.models.blocks import MarkdownTextObject
+from slack_sdk.models.blocks import MarkdownTextObject, SectionBlock
 
-from lib.models import AFKRecord, AFKStatus, SlackPostRequestBody, UserInfo
-from lib.services import DatabaseService, SlackService
+from lib.models import (
+    AFKRecord,
+    AFKRecordFilter,
+    SlackPostRequestBody,
+    SlashSubcommand,
+    UserInfo,
+)
+from lib.phrase_parser import CachedAFKParser
+from lib.services import (
+    AFKNotificationScheduler,
+    DatabaseService,
+    SlackService,
+    WriteMode,
+    starts_later,
+)
+from lib.tracing import span
 from lib.utils import format_afk_record_to_print, format_afk_records_to_print
 
+# 4 sections of 10 fields plus the pagination block stays under Slack's
+# 50 blocks per message, a table page stays under 3000 characters per section
+LIST_PAGE_SIZE = 40
+TABLE_PAGE_SIZE = 25
 
-async def handle_list_subcommand(service: DatabaseService, user_info: UserInfo):
-    afk_records = await service.read(
-        {
-            "end_datetime": datetime.now(tz=UTC),
-            "status": [AFKStatus.ACTIVE],
-            "team_id": [user_info.team_id],
-        }
-    )
-    return (
-        {
-            "blocks": [
-                block.to_dict()
-                for block in SlackService.get_list_response(
-                    records=format_afk_records_to_print(
-                        afk_records=sorted(afk_records, key=lambda r: r.end_datetime),
-                        user_info=user_info,
-                    ),
+
+async def handle_list_subcommand(
+    service: DatabaseService,
+    slack_service: SlackService,
+    user_info: UserInfo,
+    offset: int = 0,
+    user_id: str | None = None,
+):
+    with span("mongo_read"):
+        afk_records, has_more = await service.read_active_page(
+            team_id=user_info.team_id,
+            offset=offset,
+            limit=LIST_PAGE_SIZE,
+            user_id=user_id,
+        )
+    if len(afk_records) == 0:
+        return MarkdownTextObject(text="No AFK records")
+    with span("user_lookup"):
+        users_info = await slack_service.get_users_info(
+            user_ids=(afk_record.user_id for afk_record in afk_records),
+            team_id=user_info.team_id,
+        )
+
+    with span("blocks_build"):
+        blocks = SlackService.get_list_response(
+            records=format_afk_records_to_print(
+                afk_records=afk_records,
+                user_info=user_info,
+                users_info=users_info,
+                show_own_record_ids=True,
+            ),
+        )
+        if has_more:
+            blocks.append(
+                SlackService.get_next_page_block(
+                    subcommand=SlashSubcommand.LIST,
+                    offset=offset + LIST_PAGE_SIZE,
+                    user_id=user_id,
                 )
-            ]
-        }
-        if len(afk_records) > 0
-        else MarkdownTextObject(text="No AFK records")
-    )
+            )
+        return {"blocks": [block.to_dict() for block in blocks]}
 
 
-async def handle_table_subcommand(service: DatabaseService, user_info: UserInfo):
-    afk_records = await service.read(
-        {
-            "end_datetime": datetime.now(tz=UTC),
-            "status": [AFKStatus.ACTIVE],
-            "team_id": [user_info.team_id],
-        }
-    )
-    return (
-        SlackService.get_table_response(
+async def handle_table_subcommand(
+    service: DatabaseService,
+    slack_service: SlackService,
+    user_info: UserInfo,
+    offset: int = 0,
+):
+    with span("mongo_read"):
+        afk_records, has_more = await service.read_active_page(
+            team_id=user_info.team_id, offset=offset, limit=TABLE_PAGE_SIZE
+        )
+    if len(afk_records) == 0:
+        return MarkdownTextObject(text="No AFK records")
+    with span("user_lookup"):
+        users_info = await slack_service.get_users_info(
+            user_ids=(afk_record.user_id for afk_record in afk_records),
+            team_id=user_info.team_id,
+        )
+
+    with span("blocks_build"):
+        table = SlackService.get_table_response(
             records=format_afk_records_to_print(
-                afk_records=sorted(afk_records, key=lambda r: r.end_datetime),
+                afk_records=afk_records,
                 user_info=user_info,
+                users_info=users_info,
+                mention_unknown_users=False,
             ),
         )
-        if len(afk_records) > 0
-        else MarkdownTextObject(text="No AFK records")
-    )
+        if not has_more:
+            return table
+        return {
+            "blocks": [
+                SectionBlock(text=table).to_dict(),
+                SlackService.get_next_page_block(
+                    subcommand=SlashSubcommand.TABLE, offset=offset + TABLE_PAGE_SIZE
+                ).to_dict(),
+            ]
+        }
 
 
-async def handle_clear_subcommand(service: DatabaseService, user_info: UserInfo):
-    records_updated = await service.clear_afk_status(
-        {"team_id": [user_info.team_id], "user_id": [user_info.id]}
+def parse_next_page_value(value: str) -> tuple[SlashSubcommand, int, str | None] | None:
+    # Written by SlackService.get_next_page_block as subcommand:offset[:user_id]
+    subcommand, _, rest = value.partition(":")
+    offset, _, user_id = rest.partition(":")
+    if subcommand not in (SlashSubcommand.LIST.value, SlashSubcommand.TABLE.value):
+        return None
+    if not offset.isdecimal() or (user_id and subcommand != SlashSubcommand.LIST.value):
+        return None
+    return SlashSubcommand(subcommand), int(offset), user_id or None
+
+
+async def handle_next_page_action(
+    service: DatabaseService,
+    slack_service: SlackService,
+    user_info: UserInfo,
+    value: str,
+):
+    next_page = parse_next_page_value(value)
+    if next_page is None:
+        return {
+            "response_type": "ephemeral",
+            "replace_original": False,
+            "text": "This page is no longer available, please run the command again",
+        }
+    subcommand, offset, user_id = next_page
+    if subcommand == SlashSubcommand.TABLE:
+        return await handle_table_subcommand(
+            service=service,
+            slack_service=slack_service,
+            user_info=user_info,
+            offset=offset,
+        )
+    return await handle_list_subcommand(
+        service=service,
+        slack_service=slack_service,
+        user_info=user_info,
+        offset=offset,
+        user_id=user_id,
     )
+
+
+async def handle_clear_subcommand(
+    service: DatabaseService, user_info: UserInfo, record_id: str | None = None
+):
+    filter: AFKRecordFilter = {
+        "team_id": [user_info.team_id],
+        "user_id": [user_info.id],
+    }
+    if record_id is not None:
+        filter["id"] = [record_id]
+    with span("mongo_write"):
+        records_updated = await service.clear_afk_status(filter)
     return MarkdownTextObject(
         text=(
             f"{records_updated} AFK record{'s' if records_updated > 1 else ''} cleared"
@@ -72,10 +174,13 @@ async def handle_create_subcommand(
     database_service: DatabaseService,
     slack_service: SlackService,
     user_info: UserInfo,
+    afk_parser: CachedAFKParser,
+    notification_scheduler: AFKNotificationScheduler | None = None,
 ):
-    parse_result = AFKParser().parse_dates(
-        phrase=slack_post_request_body.text, tz_offset=user_info.tz_offset
-    )
+    with span("phrase_parse"):
+        parse_result = afk_parser.parse_dates(
+            phrase=slack_post_request_body.text, tz_offset=user_info.tz_offset
+        )
     if not parse_result:
         custom_timezone = timezone(timedelta(seconds=user_info.tz_offset))
         now = datetime.now(tz=custom_timezone)
@@ -93,6 +198,7 @@ async def handle_create_subcommand(
         database_service=database_service,
         slack_service=slack_service,
         user_info=user_info,
+        notification_scheduler=notification_scheduler,
     )
 
 
@@ -101,14 +207,27 @@ async def send_slack_message(
     database_service: DatabaseService,
     slack_service: SlackService,
     user_info: UserInfo,
+    notification_scheduler: AFKNotificationScheduler | None = None,
 ):
-    _ = await database_service.write(records=[afk_record])
-    _ = slack_service.post_message(
-        channel_id=afk_record.channel_id,
-        blocks=SlackService.get_list_response(
+    with span("mongo_write"):
+        write_result = await database_service.write(
+            records=[afk_record], mode=WriteMode.CREATE
+        )
+    if not write_result.inserted_ids:
+        # A retry of a command that was already recorded and announced
+        return Response(status_code=status.HTTP_200_OK)
+    if notification_scheduler is not None:
+        await notification_scheduler.submit(afk_record)
+        if starts_later(afk_record):
+            # Announced to the channel by the scheduler once it starts
+            return MarkdownTextObject(
+                text="AFK scheduled, the channel will be notified when it starts"
+            )
+    with span("blocks_build"):
+        blocks = SlackService.get_list_response(
             records=[
                 format_afk_record_to_print(afk_record=afk_record, user_info=user_info)
             ]
-        ),
-    )
+        )
+    slack_service.enqueue_message(channel_id=afk_record.channel_id, blocks=blocks)
     return Response(status_code=status.HTTP_200_OK)
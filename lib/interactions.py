@@ -0,0 +1,118 @@
+from collections.abc import Awaitable, Callable
+import logging
+import random
+from typing import Any, NamedTuple, final
+
+from lib.metrics import metrics
+from lib.models import SlackPayloadType
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson comes with the optional speedups extra
+    from json import loads as json_loads
+
+logger = logging.getLogger(__name__)
+
+interactions_received = metrics.counter(
+    "slack_interactions_received_total", "Interactive payloads received from Slack"
+)
+interactions_unhandled = metrics.counter(
+    "slack_interactions_unhandled_total",
+    "Interactive payloads acknowledged without a registered handler",
+)
+
+
+class InteractiveAction(NamedTuple):
+    payload: dict[str, Any]
+    # The clicked element for block_actions, None for view_submission
+    action: dict[str, Any] | None
+
+
+type InteractiveActionHandler = Callable[[InteractiveAction], Awaitable[Any]]
+
+
+class InteractiveRoute(NamedTuple):
+    handler: InteractiveActionHandler
+    interaction: InteractiveAction
+
+
+def parse_interactive_payload(payload_value: str) -> dict[str, Any] | None:
+    try:
+        payload = json_loads(payload_value)
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) and payload else None
+
+
+@final
+class InteractiveActionRouter:
+    def __init__(self, log_sample_rate: float = 0.0):
+        self.log_sample_rate = log_sample_rate
+        self.action_id_handlers: dict[str, InteractiveActionHandler] = {}
+        self.block_id_handlers: dict[str, InteractiveActionHandler] = {}
+        self.view_handlers: dict[str, InteractiveActionHandler] = {}
+
+    def action(
+        self, action_id: str | None = None, block_id: str | None = None
+    ) -> Callable[[InteractiveActionHandler], InteractiveActionHandler]:
+        if (action_id is None) == (block_id is None):
+            raise ValueError("Register an action by exactly one of action_id, block_id")
+
+        def decorator(handler: InteractiveActionHandler) -> InteractiveActionHandler:
+            if action_id is not None:
+                self.action_id_handlers[action_id] = handler
+            elif block_id is not None:
+                self.block_id_handlers[block_id] = handler
+            return handler
+
+        return decorator
+
+    def view_submission(
+        self, callback_id: str
+    ) -> Callable[[InteractiveActionHandler], InteractiveActionHandler]:
+        def decorator(handler: InteractiveActionHandler) -> InteractiveActionHandler:
+            self.view_handlers[callback_id] = handler
+            return handler
+
+        return decorator
+
+    def resolve(self, payload: dict[str, Any]) -> InteractiveRoute | None:
+        interactions_received.inc()
+        self.log_sample(payload)
+        payload_type = payload.get("type")
+        if payload_type == SlackPayloadType.BLOCK_ACTIONS.value:
+            # A specific action_id wins over a handler for its whole block
+            for action in payload.get("actions", []):
+                handler = self.action_id_handlers.get(
+                    action.get("action_id", "")
+                ) or self.block_id_handlers.get(action.get("block_id", ""))
+                if handler is not None:
+                    return InteractiveRoute(
+                        handler=handler,
+                        interaction=InteractiveAction(payload=payload, action=action),
+                    )
+        elif payload_type == SlackPayloadType.VIEW_SUBMISSION.value:
+            handler = self.view_handlers.get(
+                payload.get("view", {}).get("callback_id", "")
+            )
+            if handler is not None:
+                return InteractiveRoute(
+                    handler=handler,
+                    interaction=InteractiveAction(payload=payload, action=None),
+                )
+        interactions_unhandled.inc()
+        return None
+
+    def log_sample(self, payload: dict[str, Any]) -> None:
+        if self.log_sample_rate <= 0 or random.random() >= self.log_sample_rate:
+            return
+        summary = {
+            "type": payload.get("type"),
+            "team_id": payload.get("team", {}).get("id"),
+            "user_id": payload.get("user", {}).get("id"),
+            "action_ids": [
+                action.get("action_id") for action in payload.get("actions", [])
+            ],
+            "callback_id": payload.get("view", {}).get("callback_id"),
+        }
+        logger.info("Interactive payload", extra={"payload": summary})
@@ -0,0 +1,44 @@
+from contextvars import ContextVar
+from datetime import UTC, datetime
+import json
+import logging
+from typing import Any, override
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has, anything else was passed through `extra`
+RESERVED_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    @override
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, tz=UTC).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        current_request_id = request_id.get()
+        if current_request_id is not None:
+            entry["request_id"] = current_request_id
+        entry.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in RESERVED_RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "INFO") -> None:
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
+    # Uvicorn's access log duplicates the request log written by the middleware
+    logging.getLogger("uvicorn.access").disabled = True
@@ -0,0 +1,199 @@
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Callable, Mapping, Sequence
+from itertools import accumulate
+import time
+from typing import final
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+type Labels = tuple[tuple[str, str], ...]
+
+
+def to_labels(labels: Mapping[str, str] | None) -> Labels:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+@final
+class Counter:
+    def __init__(self, name: str, description: str, labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+@final
+class Gauge:
+    def __init__(self, name: str, description: str, labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+@final
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        labels: Labels = (),
+    ):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+@final
+class ErrorRateWindow:
+    def __init__(
+        self, window_seconds: float = 300, clock: Callable[[], float] = time.monotonic
+    ):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.outcomes: deque[tuple[float, bool]] = deque()
+        self.errors = 0
+
+    def record(self, error: bool) -> None:
+        now = self.clock()
+        self.prune(now)
+        self.outcomes.append((now, error))
+        self.errors += error
+
+    def prune(self, now: float) -> None:
+        while self.outcomes and self.outcomes[0][0] <= now - self.window_seconds:
+            _, error = self.outcomes.popleft()
+            self.errors -= error
+
+    def get_error_rate(self) -> tuple[float, int]:
+        self.prune(self.clock())
+        total = len(self.outcomes)
+        return (self.errors / total if total else 0.0), total
+
+
+@final
+class MetricsRegistry:
+    def __init__(self):
+        self.counters: dict[tuple[str, Labels], Counter] = {}
+        self.gauges: dict[tuple[str, Labels], Gauge] = {}
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def counter(
+        self,
+        name: str,
+        description: str = "",
+        labels: Mapping[str, str] | None = None,
+    ) -> Counter:
+        key = (name, to_labels(labels))
+        if key not in self.counters:
+            self.counters[key] = Counter(
+                name=name, description=description, labels=key[1]
+            )
+        return self.counters[key]
+
+    def gauge(
+        self,
+        name: str,
+        description: str = "",
+        labels: Mapping[str, str] | None = None,
+    ) -> Gauge:
+        key = (name, to_labels(labels))
+        if key not in self.gauges:
+            self.gauges[key] = Gauge(name=name, description=description, labels=key[1])
+        return self.gauges[key]
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        labels: Mapping[str, str] | None = None,
+    ) -> Histogram:
+        key = (name, to_labels(labels))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(
+                name=name, description=description, buckets=buckets, labels=key[1]
+            )
+        return self.histograms[key]
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        described: set[str] = set()
+
+        def describe(name: str, description: str, metric_type: str) -> None:
+            # HELP and TYPE appear once per name, before its first sample
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), counter in sorted(self.counters.items()):
+            describe(name, counter.description, "counter")
+            lines.append(f"{name}{format_labels(labels)} {format_value(counter.value)}")
+
+        for (name, labels), gauge in sorted(self.gauges.items()):
+            describe(name, gauge.description, "gauge")
+            lines.append(f"{name}{format_labels(labels)} {format_value(gauge.value)}")
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            describe(name, histogram.description, "histogram")
+            upper_bounds = [format_value(bucket) for bucket in histogram.buckets]
+            for upper_bound, cumulative_count in zip(
+                [*upper_bounds, "+Inf"], accumulate(histogram.bucket_counts)
+            ):
+                bucket_labels = format_labels((*labels, ("le", upper_bound)))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative_count}")
+            lines.append(
+                f"{name}_sum{format_labels(labels)} {format_value(histogram.sum)}"
+            )
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,168 @@
+from collections.abc import Callable, Collection
+import hashlib
+import hmac
+import logging
+import time
+from typing import final
+from uuid import uuid4
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from lib.log import request_id
+from lib.metrics import metrics
+from lib.tracing import span_durations
+
+SLACK_SIGNATURE_VERSION = b"v0"
+REQUEST_ID_HEADER = b"x-request-id"
+
+logger = logging.getLogger(__name__)
+
+signatures_rejected = metrics.counter(
+    "slack_signatures_rejected_total", "Slack requests rejected by signature checks"
+)
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def replay_body(body: bytes, receive: Receive) -> Receive:
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if replayed:
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+
+@final
+class SlackSignatureMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        signing_secret: str,
+        paths: Collection[str],
+        max_age_seconds: float = 5 * 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        # Keyed once, every request signs on a copy
+        self.hmac = hmac.new(signing_secret.encode(), digestmod=hashlib.sha256)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        timestamp: bytes | None = None
+        signature: bytes | None = None
+        for name, value in scope["headers"]:
+            if name == b"x-slack-request-timestamp":
+                timestamp = value
+            elif name == b"x-slack-signature":
+                signature = value
+
+        body = await read_body(receive)
+        if not self.is_valid_request(timestamp, signature, body):
+            signatures_rejected.inc()
+            response = JSONResponse(
+                {"detail": "Invalid Slack signature"}, status_code=400
+            )
+            await response(scope, receive, send)
+            return
+
+        # Handlers read the body from request.state instead of the stream
+        scope.setdefault("state", {})["raw_body"] = body
+        await self.app(scope, replay_body(body, receive), send)
+
+    def is_valid_request(
+        self, timestamp: bytes | None, signature: bytes | None, body: bytes
+    ) -> bool:
+        if timestamp is None or signature is None:
+            return False
+        try:
+            signed_at = int(timestamp)
+        except ValueError:
+            return False
+        # Old signatures are rejected so captured requests can't be replayed
+        if abs(self.clock() - signed_at) > self.max_age_seconds:
+            return False
+
+        mac = self.hmac.copy()
+        mac.update(SLACK_SIGNATURE_VERSION + b":" + timestamp + b":" + body)
+        expected = SLACK_SIGNATURE_VERSION + b"=" + mac.hexdigest().encode()
+        return hmac.compare_digest(expected, signature)
+
+
+@final
+class RequestContextMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Keep the caller's id when there is one so logs can be joined up
+        current_request_id = (
+            next(
+                (
+                    value.decode()
+                    for name, value in scope["headers"]
+                    if name == REQUEST_ID_HEADER
+                ),
+                None,
+            )
+            or uuid4().hex
+        )
+        request_id_token = request_id.set(current_request_id)
+        durations: dict[str, float] = {}
+        span_durations_token = span_durations.set(durations)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER, current_request_id.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            logger.info(
+                "request",
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+                    "spans_ms": {
+                        name: round(duration * 1000, 2)
+                        for name, duration in durations.items()
+                    },
+                },
+            )
+            span_durations.reset(span_durations_token)
+            request_id.reset(request_id_token)
@@ -1,7 +1,7 @@
 from collections.abc import Sequence
 from datetime import UTC, datetime
 from enum import Enum
-from typing import Any, TypedDict
+from typing import Any, NamedTuple, TypedDict
 from uuid import uuid4
 
 from fastapi.datastructures import FormData
@@ -69,9 +69,43 @@ class AFKRecord(BaseModel):
         )
 
 
+class AFKDisplayRow(NamedTuple):
+    # Everything a rendered AFK record needs, leaving out bookkeeping fields
+    # such as `command`, `trigger_id`, `version` and `expires_at`
+    channel_id: str
+    created: float
+    end_datetime: float
+    id: str
+    start_datetime: float
+    status: str
+    team_id: str
+    text: str
+    user_id: str
+
+    @staticmethod
+    def from_record(record: AFKRecord) -> "AFKDisplayRow":
+        return AFKDisplayRow(
+            channel_id=record.channel_id,
+            created=record.created,
+            end_datetime=record.end_datetime,
+            id=record.id,
+            start_datetime=record.start_datetime,
+            status=record.status,
+            team_id=record.team_id,
+            text=record.text,
+            user_id=record.user_id,
+        )
+
+
+class DatetimeRange(TypedDict, total=False):
+    gte: datetime
+    lt: datetime
+
+
 class AFKRecordFilter(TypedDict, total=False):
     id: Sequence[str]
-    end_datetime: datetime
+    end_datetime: datetime | DatetimeRange
+    start_datetime: datetime | DatetimeRange
     status: Sequence[AFKStatus]
     team_id: Sequence[str]
     user_id: Sequence[str]
@@ -79,6 +113,9 @@ class AFKRecordFilter(TypedDict, total=False):
 
 class AFKRecordToPrint(BaseModel):
     end_datetime: str = Field(description="AFK end datetime as str")
+    id: str | None = Field(
+        default=None, description="AFK record id, for `/afk clear <id>`"
+    )
     real_name: str = Field(description="User's display name on Slack")
     start_datetime: str = Field(description="AFK start datetime as str")
     text: str = Field(description="Text used to trigger AFK Slackbot")
@@ -103,3 +140,20 @@ class UserInfo(BaseModel):
     real_name: str = Field(description="User's display name on Slack")
     team_id: str = Field(description="Slack team id")
     tz_offset: int = Field(description="Number of seconds offset from UTC")
+
+
+class ReadinessReport(BaseModel):
+    ready: bool = Field(description="Whether the instance should receive traffic")
+    checked_at: datetime = Field(description="When the dependencies were last checked")
+    mongo_ping_ms: float | None = Field(
+        description="MongoDB ping round trip, None when the ping failed"
+    )
+    mongo_pool_utilization: float = Field(
+        description="Share of the busiest connection pool checked out"
+    )
+    mongo_connections_in_use: int = Field(description="Checked out connections")
+    mongo_max_pool_size: int = Field(description="Connection limit across pools")
+    slack_api_error_rate: float = Field(
+        description="Share of recent Slack Web API calls that failed"
+    )
+    slack_api_calls: int = Field(description="Slack Web API calls in the window")
@@ -0,0 +1,146 @@
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+import re
+import time
+from typing import NamedTuple, final
+
+from afk_parser.afk_parser import AFKParser
+
+from lib.cache import TTLCache
+from lib.metrics import metrics
+
+# Timestamps closer than this are treated as equal when comparing two parses
+ANCHOR_TOLERANCE_SECONDS = 1.0
+
+parse_cache_hits = metrics.counter(
+    "afk_parse_cache_hits_total", "AFK phrases resolved from the parse plan cache"
+)
+parse_cache_misses = metrics.counter(
+    "afk_parse_cache_misses_total", "AFK phrases that needed a full parse"
+)
+parse_cache_evictions = metrics.counter(
+    "afk_parse_cache_evictions_total", "Parse plans evicted to stay under max size"
+)
+
+
+class ParsePlan(NamedTuple):
+    observed_at: float
+    start: float | None
+    end: float | None
+    # None until a second parse at a later time shows whether the endpoint moves
+    # with the clock ("for 1 hour") or stays put ("until 5pm")
+    start_is_relative: bool | None = None
+    end_is_relative: bool | None = None
+    valid_until: float = float("inf")
+
+    @property
+    def is_verified(self) -> bool:
+        return self.start is None or (
+            self.start_is_relative is not None and self.end_is_relative is not None
+        )
+
+
+def normalize_phrase(phrase: str) -> str:
+    return re.sub(r"\s+", " ", phrase.strip().lower())
+
+
+def classify_anchor(previous: float, current: float, elapsed: float) -> bool | None:
+    if abs((current - previous) - elapsed) < ANCHOR_TOLERANCE_SECONDS:
+        return True
+    if abs(current - previous) < ANCHOR_TOLERANCE_SECONDS:
+        return False
+    return None
+
+
+@final
+class CachedAFKParser:
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 24 * 60 * 60,
+        absolute_plan_ttl_seconds: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.parser = AFKParser()
+        self.absolute_plan_ttl_seconds = absolute_plan_ttl_seconds
+        self.clock = clock
+        self.plans: TTLCache[tuple[str, int], ParsePlan] = TTLCache(
+            ttl_seconds=ttl_seconds, max_size=max_size
+        )
+
+    def parse_dates(
+        self, phrase: str, tz_offset: int
+    ) -> tuple[datetime, datetime] | None:
+        # Spellings differing only in case and spacing share a plan, the parser
+        # still sees the phrase as typed
+        key = (normalize_phrase(phrase), tz_offset)
+        tz = timezone(timedelta(seconds=tz_offset))
+        now = self.clock()
+
+        plan = self.plans.get(key)
+        if plan is not None and plan.is_verified and now < plan.valid_until:
+            parse_cache_hits.inc()
+            if plan.start is None or plan.end is None:
+                return None
+            elapsed = now - plan.observed_at
+            start = plan.start + elapsed if plan.start_is_relative else plan.start
+            end = plan.end + elapsed if plan.end_is_relative else plan.end
+            return (
+                datetime.fromtimestamp(start, tz=tz),
+                datetime.fromtimestamp(end, tz=tz),
+            )
+
+        parse_cache_misses.inc()
+        parse_result = self.parser.parse_dates(phrase=phrase, tz_offset=tz_offset)
+        if not parse_result:
+            self.store(key, ParsePlan(observed_at=now, start=None, end=None))
+            return None
+
+        start, end = parse_result[0].timestamp(), parse_result[1].timestamp()
+        self.store(key, self.learn(plan, now=now, start=start, end=end))
+        return parse_result[0], parse_result[1]
+
+    def store(self, key: tuple[str, int], plan: ParsePlan) -> None:
+        evictions = self.plans.evictions
+        self.plans.set(key, plan)
+        if self.plans.evictions > evictions:
+            parse_cache_evictions.inc(self.plans.evictions - evictions)
+
+    def learn(
+        self, previous: ParsePlan | None, now: float, start: float, end: float
+    ) -> ParsePlan:
+        observation = ParsePlan(observed_at=now, start=start, end=end)
+        if previous is None or previous.start is None or previous.end is None:
+            return observation
+
+        elapsed = now - previous.observed_at
+        if elapsed < 2 * ANCHOR_TOLERANCE_SECONDS:
+            return observation
+        start_is_relative = classify_anchor(previous.start, start, elapsed)
+        end_is_relative = classify_anchor(previous.end, end, elapsed)
+        if start_is_relative is None or end_is_relative is None:
+            return observation
+
+        if start_is_relative and end_is_relative:
+            valid_until = float("inf")
+        else:
+            # Fixed times such as "until 5pm" roll over to the next day once they
+            # pass, so only trust them for a short while and never past one
+            valid_until = min(
+                [
+                    now + self.absolute_plan_ttl_seconds,
+                    *(
+                        endpoint
+                        for endpoint, is_relative in (
+                            (start, start_is_relative),
+                            (end, end_is_relative),
+                        )
+                        if not is_relative and endpoint > now
+                    ),
+                ]
+            )
+        return observation._replace(
+            start_is_relative=start_is_relative,
+            end_is_relative=end_is_relative,
+            valid_until=valid_until,
+        )
@@ -1,3 +1,12 @@
+from .active_afk_read_model import *
 from .database_service import *
+from .deferred_response_service import *
+from .health_service import *
+from .invalidation_bus import *
+from .leader_election import *
+from .message_scheduler import *
 from .mongo_db import *
+from .notification_scheduler import *
+from .record_lifecycle_service import *
 from .slack_service import *
+from .storage_backends import *
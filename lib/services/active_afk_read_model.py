@@ -0,0 +1,201 @@
+import asyncio
+from bisect import insort
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from datetime import UTC, datetime
+from itertools import count
+import logging
+from typing import Any, final
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure
+
+from lib.metrics import metrics
+from lib.models import AFKDisplayRow, AFKRecord, AFKRecordFilter, AFKStatus
+from lib.utils import record_matches_filter
+
+logger = logging.getLogger(__name__)
+
+CHANGE_STREAMS_NOT_SUPPORTED = 40573
+
+read_model_hits = metrics.counter(
+    "active_afk_read_model_hits_total", "Active AFK reads served from memory"
+)
+read_model_misses = metrics.counter(
+    "active_afk_read_model_misses_total", "Active AFK reads that went to MongoDB"
+)
+read_model_evictions = metrics.counter(
+    "active_afk_read_model_evictions_total", "Expired AFK records evicted from memory"
+)
+
+
+def get_end_datetime(record: AFKDisplayRow) -> float:
+    return record.end_datetime
+
+
+@final
+class ActiveAFKReadModel:
+    def __init__(self, max_teams: int = 1000):
+        self.max_teams = max_teams
+        self.mode = "write_through"
+        # Per team, active records ordered by end_datetime
+        self.teams: OrderedDict[str, list[AFKDisplayRow]] = OrderedDict()
+        # Bumped on every change to a team so a slow load can't overwrite
+        # newer data with an older snapshot. Versions come from one counter, so
+        # teams whose entry was dropped can fall back to the highest dropped one.
+        self.versions: dict[str, int] = {}
+        self.version_counter = count(1)
+        self.min_version = 0
+        # A delete change was seen, applied once the change stream catches up
+        self.pending_delete = False
+
+    def get_version(self, team_id: str) -> int:
+        return self.versions.get(team_id, self.min_version)
+
+    def bump_version(self, team_id: str) -> None:
+        self.versions[team_id] = next(self.version_counter)
+        if len(self.versions) > 2 * self.max_teams:
+            for unloaded_team_id in self.versions.keys() - self.teams.keys():
+                self.forget_version(unloaded_team_id)
+
+    def forget_version(self, team_id: str) -> None:
+        # Loads started before this still see a different version afterwards
+        version = self.versions.pop(team_id, None)
+        if version is not None:
+            self.min_version = max(self.min_version, version)
+
+    def get_active(self, team_id: str, now: float) -> list[AFKDisplayRow] | None:
+        records = self.teams.get(team_id)
+        if records is None:
+            read_model_misses.inc()
+            return None
+        self.teams.move_to_end(team_id)
+        expired = 0
+        while expired < len(records) and records[expired].end_datetime < now:
+            expired += 1
+        if expired:
+            del records[:expired]
+            read_model_evictions.inc(expired)
+        read_model_hits.inc()
+        return list(records)
+
+    def load(
+        self, team_id: str, records: Sequence[AFKDisplayRow], version: int
+    ) -> None:
+        if self.get_version(team_id) != version:
+            return
+        self.teams[team_id] = sorted(records, key=get_end_datetime)
+        self.teams.move_to_end(team_id)
+        while len(self.teams) > self.max_teams:
+            evicted_team_id, _ = self.teams.popitem(last=False)
+            self.forget_version(evicted_team_id)
+
+    def get_known_team_ids(self) -> list[str]:
+        return list(self.teams.keys() | self.versions.keys())
+
+    def invalidate(self, team_id: str | None = None) -> None:
+        if team_id is not None:
+            _ = self.teams.pop(team_id, None)
+            self.bump_version(team_id)
+            return
+        # Every load in flight started before this, for any team
+        self.teams.clear()
+        self.versions.clear()
+        self.min_version = next(self.version_counter)
+
+    def apply_invalidation(self, team_ids: Sequence[str]) -> None:
+        # Sent by another instance after it wrote these teams' records
+        if not team_ids:
+            self.invalidate()
+        for team_id in team_ids:
+            self.invalidate(team_id)
+
+    def upsert(self, record: AFKDisplayRow) -> None:
+        self.bump_version(record.team_id)
+        records = self.teams.get(record.team_id)
+        if records is None:
+            return
+        records[:] = [r for r in records if r.id != record.id]
+        if (
+            record.status == AFKStatus.ACTIVE.value
+            and record.end_datetime >= datetime.now(tz=UTC).timestamp()
+        ):
+            insort(records, record, key=get_end_datetime)
+
+    def apply_write(self, records: Sequence[AFKRecord]) -> None:
+        for record in records:
+            self.upsert(AFKDisplayRow.from_record(record))
+
+    def apply_clear(self, filter: AFKRecordFilter) -> None:
+        team_ids = filter.get("team_id")
+        if not team_ids:
+            # Also turns away loads in flight for teams without a version
+            self.min_version = next(self.version_counter)
+            team_ids = self.get_known_team_ids()
+        for team_id in team_ids:
+            self.bump_version(team_id)
+            records = self.teams.get(team_id)
+            if records is not None:
+                records[:] = [
+                    r for r in records if not record_matches_filter(r, filter)
+                ]
+
+    def apply_change(self, change: Mapping[str, Any]) -> None:
+        document = change.get("fullDocument")
+        if change["operationType"] in ("insert", "replace", "update") and document:
+            self.upsert(AFKDisplayRow.from_record(AFKRecord.model_validate(document)))
+        else:
+            # Deletes only carry the _id, so everything is dropped and reloaded
+            # lazily. Compaction deletes in bulk, that is done once per burst.
+            self.pending_delete = True
+
+    def apply_pending_delete(self) -> None:
+        if self.pending_delete:
+            self.pending_delete = False
+            self.invalidate()
+
+    async def follow(
+        self,
+        collection: AsyncIOMotorCollection[dict[str, Any]],
+        load_team: Callable[[str], Awaitable[list[AFKDisplayRow]]],
+        poll_interval_seconds: float,
+        retry_interval_seconds: float = 5,
+    ) -> None:
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    self.mode = "change_stream"
+                    while stream.alive:
+                        change = await stream.try_next()
+                        if change is None:
+                            # Caught up with the stream
+                            self.apply_pending_delete()
+                        else:
+                            self.apply_change(change)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_NOT_SUPPORTED:
+                    break
+                logger.warning("Change stream failed", exc_info=True)
+            except Exception:
+                logger.warning("Change stream failed", exc_info=True)
+            # Events may have been missed while the stream was down
+            self.pending_delete = False
+            self.invalidate()
+            await asyncio.sleep(retry_interval_seconds)
+
+        # Standalone MongoDB servers have no change streams, poll instead
+        self.mode = "polling"
+        logger.info("Change streams unavailable, polling for active AFK records")
+        while True:
+            await asyncio.sleep(poll_interval_seconds)
+            for team_id in list(self.teams):
+                version = self.get_version(team_id)
+                try:
+                    self.load(team_id, await load_team(team_id), version)
+                except Exception:
+                    logger.warning(
+                        "Failed to refresh active AFK records",
+                        exc_info=True,
+                        extra={"team_id": team_id},
+                    )
+                    self.invalidate(team_id)
@@ -1,53 +1,218 @@
-from collections.abc import Sequence
-from enum import Enum
+from collections.abc import AsyncIterator, Iterable, Sequence
+from datetime import UTC, datetime, timedelta
 from typing import Any, final
 
-from motor.motor_asyncio import AsyncIOMotorCollection
+from lib.models import AFKDisplayRow, AFKRecord, AFKRecordFilter, AFKStatus
+from lib.services.active_afk_read_model import ActiveAFKReadModel
+from lib.services.invalidation_bus import ACTIVE_AFK_TOPIC, InvalidationBus
+from lib.services.storage_backends import StorageBackend, WriteMode, WriteResult
 
-from lib.models import AFKRecord, AFKRecordFilter, AFKStatus
-from lib.utils import typed_dict_to_mongodb_query
-
-
-class WriteMode(Enum):
-    OVERWRITE = "w"
-    APPEND = "a"
+AFK_RECORD_DISPLAY_FIELDS = AFKDisplayRow._fields
 
 
 @final
 class DatabaseService:
-    def __init__(self, collection: AsyncIOMotorCollection[dict[str, Any]]):
-        self.collection = collection
+    def __init__(
+        self,
+        backend: StorageBackend,
+        retention: timedelta = timedelta(days=7),
+        read_model: ActiveAFKReadModel | None = None,
+        invalidation_bus: InvalidationBus | None = None,
+    ):
+        self.backend = backend
+        self.retention = retention
+        self.read_model = read_model
+        self.invalidation_bus = invalidation_bus
+
+    def to_document(self, record: AFKRecord) -> dict[str, Any]:
+        return {
+            **record.model_dump(),
+            "expires_at": datetime.fromtimestamp(record.end_datetime, tz=UTC)
+            + self.retention,
+        }
+
+    async def ensure_indexes(self) -> list[str]:
+        return await self.backend.ensure_indexes()
+
+    async def explain(self, filter: AFKRecordFilter) -> dict[str, Any]:
+        return await self.backend.explain(filter)
 
     async def read(self, filter: AFKRecordFilter) -> list[AFKRecord]:
-        query = typed_dict_to_mongodb_query(filter)
-        cursor = self.collection.find(filter=query)
-        objects: list[dict[str, Any]] = await cursor.to_list(length=None)
-        records = [AFKRecord.model_validate(o) for o in objects]
+        return [
+            AFKRecord.model_validate(document)
+            async for document in self.backend.find(filter)
+        ]
+
+    async def iter_records(
+        self,
+        filter: AFKRecordFilter,
+        batch_size: int = 100,
+        skip: int = 0,
+        limit: int = 0,
+    ) -> AsyncIterator[AFKDisplayRow]:
+        # Documents come from our own writes, so skip validation and build the
+        # rows directly from the projected fields
+        async for document in self.backend.find(
+            filter,
+            fields=AFK_RECORD_DISPLAY_FIELDS,
+            skip=skip,
+            limit=limit,
+            batch_size=batch_size,
+        ):
+            yield AFKDisplayRow(**document)
+
+    async def read_for_display(self, filter: AFKRecordFilter) -> list[AFKDisplayRow]:
+        return [record async for record in self.iter_records(filter)]
+
+    async def read_active(self, team_id: str) -> list[AFKDisplayRow]:
+        now = datetime.now(tz=UTC)
+        if self.read_model is None:
+            return await self.read_active_from_db(team_id=team_id, now=now)
+
+        records = self.read_model.get_active(team_id=team_id, now=now.timestamp())
+        if records is None:
+            version = self.read_model.get_version(team_id)
+            records = await self.read_active_from_db(team_id=team_id, now=now)
+            self.read_model.load(team_id=team_id, records=records, version=version)
         return records
 
+    async def read_active_page(
+        self, team_id: str, offset: int, limit: int, user_id: str | None = None
+    ) -> tuple[list[AFKDisplayRow], bool]:
+        if self.read_model is not None:
+            records = await self.read_active(team_id=team_id)
+            if user_id is not None:
+                records = [record for record in records if record.user_id == user_id]
+            return records[offset : offset + limit], len(records) > offset + limit
+
+        filter: AFKRecordFilter = {
+            "end_datetime": datetime.now(tz=UTC),
+            "status": [AFKStatus.ACTIVE],
+            "team_id": [team_id],
+        }
+        if user_id is not None:
+            filter["user_id"] = [user_id]
+        # One extra record tells us whether there is a next page
+        records = [
+            record
+            async for record in self.iter_records(
+                filter,
+                skip=offset,
+                limit=limit + 1,
+            )
+        ]
+        return records[:limit], len(records) > limit
+
+    async def read_active_from_db(
+        self, team_id: str, now: datetime | None = None
+    ) -> list[AFKDisplayRow]:
+        return await self.read_for_display(
+            {
+                "end_datetime": now or datetime.now(tz=UTC),
+                "status": [AFKStatus.ACTIVE],
+                "team_id": [team_id],
+            }
+        )
+
+    def get_overwrite_scope(
+        self, records: Sequence[AFKRecord], scope: AFKRecordFilter | None
+    ) -> AFKRecordFilter:
+        if scope:
+            return scope
+        team_ids = sorted({record.team_id for record in records})
+        if not team_ids:
+            raise ValueError("Overwriting without records needs an explicit scope")
+        return {"team_id": team_ids}
+
     async def write(
-        self, records: Sequence[AFKRecord], mode: WriteMode = WriteMode.APPEND
-    ) -> list[Any]:
-        if mode == WriteMode.OVERWRITE:
-            _ = await self.collection.delete_many(filter={})
-        insert_result = await self.collection.insert_many(
-            documents=[record.model_dump() for record in records]
+        self,
+        records: Sequence[AFKRecord],
+        mode: WriteMode = WriteMode.APPEND,
+        scope: AFKRecordFilter | None = None,
+    ) -> WriteResult:
+        # Only records in scope that aren't part of this write are removed,
+        # defaulting to the teams being written
+        overwrite_scope = (
+            self.get_overwrite_scope(records, scope)
+            if mode == WriteMode.OVERWRITE
+            else None
         )
-        return insert_result.inserted_ids
+        documents = [self.to_document(record) for record in records]
+        try:
+            result = await self.backend.write(
+                documents, mode=mode, scope=overwrite_scope
+            )
+        except Exception:
+            self.invalidate_teams(records)
+            raise
+
+        if self.read_model is not None:
+            if overwrite_scope is not None:
+                team_ids = overwrite_scope.get("team_id")
+                if team_ids:
+                    for team_id in team_ids:
+                        self.read_model.invalidate(team_id)
+                else:
+                    self.read_model.invalidate()
+            inserted_ids = set(result.inserted_ids)
+            self.read_model.apply_write(
+                [record for record in records if record.id in inserted_ids]
+                if mode == WriteMode.CREATE
+                else records
+            )
+        if overwrite_scope is not None:
+            scope_team_ids = overwrite_scope.get("team_id")
+            await self.publish_invalidation(
+                [*scope_team_ids, *(record.team_id for record in records)]
+                if scope_team_ids
+                else []
+            )
+        elif result.inserted_ids or result.modified_count:
+            await self.publish_invalidation(record.team_id for record in records)
+        return result
 
     async def update(self, records: Sequence[AFKRecord], upsert: bool = False) -> int:
-        filter = {"id": {"$in": [record.id for record in records]}}
-        update_result = await self.collection.update_many(
-            filter=filter,
-            update={"$set": [record.model_dump() for record in records]},
-            upsert=upsert,
-        )
-        return update_result.modified_count
+        try:
+            result = await self.backend.replace(
+                [self.to_document(record) for record in records], upsert=upsert
+            )
+        except Exception:
+            self.invalidate_teams(records)
+            raise
+        if self.read_model is not None:
+            if result.matched_count + len(result.inserted_ids) == len(records):
+                self.read_model.apply_write(records)
+            else:
+                # Records without a match weren't written, and bulk writes don't
+                # say which those were, so the teams are reloaded instead
+                self.invalidate_teams(records)
+        await self.publish_invalidation([record.team_id for record in records])
+        return result.modified_count + len(result.inserted_ids)
+
+    def invalidate_teams(self, records: Sequence[AFKRecord]) -> None:
+        # Part of a failed bulk write may have been applied, reload the teams
+        if self.read_model is not None:
+            for team_id in {record.team_id for record in records}:
+                self.read_model.invalidate(team_id)
 
     async def clear_afk_status(self, filter: AFKRecordFilter) -> int:
         filter["status"] = [AFKStatus.ACTIVE]
-        update_result = await self.collection.update_many(
-            filter=typed_dict_to_mongodb_query(filter),
-            update={"$set": {"status": AFKStatus.CANCELLED.value}},
+        modified_count = await self.backend.cancel(
+            filter, expires_at=datetime.now(tz=UTC) + self.retention
         )
-        return update_result.modified_count
+        if self.read_model is not None:
+            self.read_model.apply_clear(filter)
+        if modified_count:
+            await self.publish_invalidation(filter.get("team_id", []))
+        return modified_count
+
+    async def publish_invalidation(self, team_ids: Iterable[str]) -> None:
+        # Other instances' read models hear about writes from the change stream,
+        # without one the teams are broadcast. No teams means every team.
+        if (
+            self.invalidation_bus is None
+            or self.read_model is None
+            or self.read_model.mode == "change_stream"
+        ):
+            return
+        await self.invalidation_bus.publish(ACTIVE_AFK_TOPIC, sorted(set(team_ids)))
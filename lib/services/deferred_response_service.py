@@ -0,0 +1,153 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from contextvars import Context, copy_context
+import logging
+import time
+from typing import Any, NamedTuple, final
+
+from fastapi import Response
+import httpx
+from slack_sdk.models.blocks import MarkdownTextObject
+
+from lib.metrics import metrics
+from lib.tracing import span, start_trace
+from lib.utils import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+ack_latency = metrics.histogram(
+    "slack_bot_ack_latency_seconds",
+    "Time from receiving a slash command to acknowledging it",
+)
+completion_latency = metrics.histogram(
+    "slack_bot_completion_latency_seconds",
+    "Time from receiving a slash command to delivering its response_url reply",
+)
+deliveries_failed = metrics.counter(
+    "slack_bot_response_url_failures_total",
+    "Deferred replies that could not be delivered to response_url",
+)
+
+
+class DeferredJob(NamedTuple):
+    response_url: str
+    handler: Callable[[], Awaitable[Any]]
+    received_at: float
+    # The submitting request's context, so logs keep its request id
+    context: Context
+
+
+def to_response_url_payload(result: Any) -> dict[str, Any] | None:
+    if isinstance(result, Response):
+        return None
+    if isinstance(result, MarkdownTextObject):
+        return {"text": result.text}
+    if isinstance(result, dict):
+        return result
+    return {"text": str(result)}
+
+
+@final
+class DeferredResponseService:
+    def __init__(
+        self,
+        worker_count: int = 4,
+        max_queue_size: int = 100,
+        max_delivery_attempts: int = 3,
+        retry_backoff_seconds: float = 0.5,
+    ):
+        self.worker_count = worker_count
+        self.max_delivery_attempts = max_delivery_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.queue: asyncio.Queue[DeferredJob] = asyncio.Queue(maxsize=max_queue_size)
+        self.http_client = httpx.AsyncClient(timeout=httpx.Timeout(5.0))
+        self.workers: list[asyncio.Task[None]] = []
+
+    async def start(self):
+        self.workers = [
+            asyncio.create_task(self.run_worker()) for _ in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        await self.queue.join()
+        for worker in self.workers:
+            _ = worker.cancel()
+        _ = await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        await self.http_client.aclose()
+
+    def submit(
+        self,
+        response_url: str,
+        handler: Callable[[], Awaitable[Any]],
+        received_at: float,
+    ) -> bool:
+        try:
+            self.queue.put_nowait(
+                DeferredJob(
+                    response_url=response_url,
+                    handler=handler,
+                    received_at=received_at,
+                    context=copy_context(),
+                )
+            )
+        except asyncio.QueueFull:
+            return False
+        ack_latency.observe(time.perf_counter() - received_at)
+        return True
+
+    async def run_worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await asyncio.create_task(self.process(job), context=job.context)
+            finally:
+                self.queue.task_done()
+
+    async def process(self, job: DeferredJob):
+        durations = start_trace()
+        try:
+            payload = to_response_url_payload(await job.handler())
+        except Exception:
+            logger.exception("Deferred slash command failed")
+            payload = {"text": "Something went wrong, please try again"}
+        if payload is not None and not await self.deliver(job.response_url, payload):
+            deliveries_failed.inc()
+        completion_seconds = time.perf_counter() - job.received_at
+        completion_latency.observe(completion_seconds)
+        logger.info(
+            "deferred response",
+            extra={
+                "duration_ms": round(completion_seconds * 1000, 2),
+                "spans_ms": {
+                    name: round(duration * 1000, 2)
+                    for name, duration in durations.items()
+                },
+            },
+        )
+
+    async def deliver(self, response_url: str, payload: dict[str, Any]) -> bool:
+        for attempt in range(self.max_delivery_attempts):
+            delay = self.retry_backoff_seconds * 2**attempt
+            try:
+                with span("slack_post"):
+                    response = await self.http_client.post(
+                        url=response_url, json=payload
+                    )
+                if response.is_success:
+                    return True
+                if response.status_code == 429:
+                    delay = parse_retry_after(
+                        response.headers.get("Retry-After"), delay
+                    )
+                elif response.status_code < 500:
+                    return False
+            except httpx.HTTPError:
+                logger.warning(
+                    "Failed to deliver to response_url",
+                    exc_info=True,
+                    extra={"attempt": attempt + 1},
+                )
+            if attempt + 1 < self.max_delivery_attempts:
+                await asyncio.sleep(delay)
+        return False
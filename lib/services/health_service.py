@@ -0,0 +1,196 @@
+import asyncio
+from datetime import UTC, datetime
+import logging
+import threading
+import time
+from typing import Any, Protocol, final, override
+
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionCheckOutStartedEvent,
+    ConnectionClosedEvent,
+    ConnectionCreatedEvent,
+    ConnectionPoolListener,
+    ConnectionReadyEvent,
+    PoolClearedEvent,
+    PoolClosedEvent,
+    PoolCreatedEvent,
+    PoolReadyEvent,
+)
+
+from lib.cache import TTLCache
+from lib.metrics import ErrorRateWindow, metrics
+from lib.models import ReadinessReport
+
+logger = logging.getLogger(__name__)
+
+# PyMongo's default when maxPoolSize isn't set
+DEFAULT_MAX_POOL_SIZE = 100
+
+mongo_ping_seconds = metrics.gauge(
+    "mongo_ping_seconds", "Round trip of the last readiness ping to MongoDB"
+)
+mongo_pool_utilization = metrics.gauge(
+    "mongo_pool_utilization",
+    "Share of the busiest MongoDB connection pool checked out at the last readiness check",
+)
+slack_api_error_rate = metrics.gauge(
+    "slack_api_error_rate",
+    "Share of recent Slack Web API calls that failed at the last readiness check",
+)
+
+
+@final
+class ConnectionPoolMonitor(ConnectionPoolListener):
+    def __init__(self):
+        # PyMongo publishes pool events from its own threads
+        self.lock = threading.Lock()
+        self.max_pool_sizes: dict[Any, int] = {}
+        self.checked_out: dict[Any, int] = {}
+
+    def get_utilization(self) -> tuple[float, int, int]:
+        with self.lock:
+            in_use = sum(self.checked_out.values())
+            max_pool_size = sum(self.max_pool_sizes.values())
+            # The busiest server decides, one saturated pool stalls its requests
+            utilization = max(
+                (
+                    self.checked_out.get(address, 0) / size
+                    for address, size in self.max_pool_sizes.items()
+                    if size
+                ),
+                default=0.0,
+            )
+        return utilization, in_use, max_pool_size
+
+    @override
+    def pool_created(self, event: PoolCreatedEvent) -> None:
+        with self.lock:
+            self.max_pool_sizes[event.address] = event.options.get(
+                "maxPoolSize", DEFAULT_MAX_POOL_SIZE
+            )
+
+    @override
+    def pool_ready(self, event: PoolReadyEvent) -> None:
+        pass
+
+    @override
+    def pool_cleared(self, event: PoolClearedEvent) -> None:
+        pass
+
+    @override
+    def pool_closed(self, event: PoolClosedEvent) -> None:
+        with self.lock:
+            _ = self.max_pool_sizes.pop(event.address, None)
+            _ = self.checked_out.pop(event.address, None)
+
+    @override
+    def connection_created(self, event: ConnectionCreatedEvent) -> None:
+        pass
+
+    @override
+    def connection_ready(self, event: ConnectionReadyEvent) -> None:
+        pass
+
+    @override
+    def connection_closed(self, event: ConnectionClosedEvent) -> None:
+        pass
+
+    @override
+    def connection_check_out_started(
+        self, event: ConnectionCheckOutStartedEvent
+    ) -> None:
+        pass
+
+    @override
+    def connection_check_out_failed(self, event: ConnectionCheckOutFailedEvent) -> None:
+        pass
+
+    @override
+    def connection_checked_out(self, event: ConnectionCheckedOutEvent) -> None:
+        with self.lock:
+            self.checked_out[event.address] = self.checked_out.get(event.address, 0) + 1
+
+    @override
+    def connection_checked_in(self, event: ConnectionCheckedInEvent) -> None:
+        with self.lock:
+            self.checked_out[event.address] = max(
+                self.checked_out.get(event.address, 0) - 1, 0
+            )
+
+
+class CommandDatabase(Protocol):
+    async def command(self, command: str, /) -> Any: ...
+
+
+class PingableClient(Protocol):
+    # The slice of AsyncIOMotorClient the readiness ping needs
+    def get_database(self, name: str, /) -> CommandDatabase: ...
+
+
+@final
+class HealthService:
+    def __init__(
+        self,
+        # None when records aren't stored in MongoDB
+        client: PingableClient | None,
+        pool_monitor: ConnectionPoolMonitor,
+        slack_api_errors: ErrorRateWindow,
+        cache_seconds: float = 5,
+        ping_timeout_seconds: float = 2,
+        max_slack_error_rate: float = 0.5,
+        min_slack_calls: int = 10,
+    ):
+        self.client = client
+        self.pool_monitor = pool_monitor
+        self.slack_api_errors = slack_api_errors
+        self.ping_timeout_seconds = ping_timeout_seconds
+        self.max_slack_error_rate = max_slack_error_rate
+        self.min_slack_calls = min_slack_calls
+        # One entry, concurrent probes share a single in-flight check
+        self.reports: TTLCache[str, ReadinessReport] = TTLCache(
+            ttl_seconds=cache_seconds, max_size=1
+        )
+
+    async def get_readiness(self) -> ReadinessReport:
+        report = await self.reports.get_or_load("readiness", self.check_readiness)
+        return report if report is not None else await self.check_readiness()
+
+    async def check_readiness(self) -> ReadinessReport:
+        mongo_ping_ms: float | None = None
+        if self.client is not None:
+            started_at = time.perf_counter()
+            try:
+                _ = await asyncio.wait_for(
+                    self.client.get_database("admin").command("ping"),
+                    timeout=self.ping_timeout_seconds,
+                )
+                ping_seconds = time.perf_counter() - started_at
+                mongo_ping_seconds.set(ping_seconds)
+                mongo_ping_ms = round(ping_seconds * 1000, 2)
+            except Exception:
+                logger.warning("MongoDB ping failed", exc_info=True)
+        mongo_ok = self.client is None or mongo_ping_ms is not None
+
+        utilization, in_use, max_pool_size = self.pool_monitor.get_utilization()
+        mongo_pool_utilization.set(utilization)
+        error_rate, slack_calls = self.slack_api_errors.get_error_rate()
+        slack_api_error_rate.set(error_rate)
+        # A handful of failures after a quiet spell shouldn't pull the instance
+        slack_ok = (
+            slack_calls < self.min_slack_calls
+            or error_rate <= self.max_slack_error_rate
+        )
+
+        return ReadinessReport(
+            ready=mongo_ok and slack_ok,
+            checked_at=datetime.now(tz=UTC),
+            mongo_ping_ms=mongo_ping_ms,
+            mongo_pool_utilization=round(utilization, 4),
+            mongo_connections_in_use=in_use,
+            mongo_max_pool_size=max_pool_size,
+            slack_api_error_rate=round(error_rate, 4),
+            slack_api_calls=slack_calls,
+        )
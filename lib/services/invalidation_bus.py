@@ -0,0 +1,133 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Sequence
+from datetime import UTC, datetime, timedelta
+import inspect
+import logging
+from typing import Any, final
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, IndexModel
+
+from lib.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Team ids whose active AFK records changed, empty for every team
+ACTIVE_AFK_TOPIC = "active_afk"
+# Ids of new AFK records for the instance running the notification scheduler
+AFK_EVENTS_TOPIC = "afk_events"
+
+type InvalidationHandler = Callable[[list[str]], Awaitable[Any] | None]
+
+invalidations_published = metrics.counter(
+    "cache_invalidations_published_total", "Invalidations sent to other instances"
+)
+invalidations_received = metrics.counter(
+    "cache_invalidations_received_total", "Invalidations applied from other instances"
+)
+
+
+@final
+class InvalidationBus:
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection[dict[str, Any]],
+        origin: str,
+        poll_interval_seconds: float = 1,
+        retention_seconds: float = 60 * 60,
+        # Messages are ordered by their writer's clock, polls look back this far
+        # so one written late by a slower instance isn't skipped
+        overlap_seconds: float = 5,
+    ):
+        self.collection = collection
+        self.origin = origin
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retention_seconds = retention_seconds
+        self.overlap_seconds = overlap_seconds
+        self.handlers: defaultdict[str, list[InvalidationHandler]] = defaultdict(list)
+        # When each message still inside the overlap was applied, by _id
+        self.seen: dict[Any, datetime] = {}
+        self.task: asyncio.Task[None] | None = None
+
+    async def ensure_indexes(self) -> list[str]:
+        return await self.collection.create_indexes(
+            [
+                IndexModel(
+                    [("created_at", ASCENDING)],
+                    name="created_at_ttl",
+                    expireAfterSeconds=int(self.retention_seconds),
+                )
+            ]
+        )
+
+    def subscribe(self, topic: str, handler: InvalidationHandler) -> None:
+        self.handlers[topic].append(handler)
+
+    async def publish(self, topic: str, keys: Sequence[str]) -> None:
+        # The change is already stored, other instances catch up on their own
+        # once their caches expire, so a failed broadcast is only logged
+        try:
+            _ = await self.collection.insert_one(
+                {
+                    "topic": topic,
+                    "keys": list(keys),
+                    "origin": self.origin,
+                    "created_at": datetime.now(tz=UTC),
+                }
+            )
+            invalidations_published.inc()
+        except Exception:
+            logger.warning(
+                "Failed to publish invalidation", exc_info=True, extra={"topic": topic}
+            )
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.follow(), name="invalidation_bus")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        _ = self.task.cancel()
+        _ = await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def poll(self, since: datetime) -> None:
+        async for message in self.collection.find(
+            {"created_at": {"$gte": since}, "origin": {"$ne": self.origin}},
+            sort=[("created_at", ASCENDING)],
+        ):
+            if message["_id"] in self.seen:
+                continue
+            self.seen[message["_id"]] = datetime.now(tz=UTC)
+            invalidations_received.inc()
+            for handler in self.handlers.get(message["topic"], ()):
+                try:
+                    result = handler(message["keys"])
+                    if inspect.isawaitable(result):
+                        _ = await result
+                except Exception:
+                    logger.exception(
+                        "Invalidation handler failed",
+                        extra={"topic": message["topic"]},
+                    )
+        # Applied before `since` means written before it, so never returned again
+        for message_id, seen_at in list(self.seen.items()):
+            if seen_at < since:
+                del self.seen[message_id]
+
+    async def follow(self) -> None:
+        # Only changes made after this instance started matter, its caches
+        # start out empty
+        polled_at = datetime.now(tz=UTC)
+        while True:
+            await asyncio.sleep(self.poll_interval_seconds)
+            now = datetime.now(tz=UTC)
+            try:
+                await self.poll(
+                    since=polled_at - timedelta(seconds=self.overlap_seconds)
+                )
+                polled_at = now
+            except Exception:
+                logger.warning("Failed to poll invalidations", exc_info=True)
@@ -0,0 +1,132 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+import logging
+from typing import Any, Protocol, final
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
+
+from lib.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_JOBS_LEASE = "background_jobs"
+
+is_leader_gauge = metrics.gauge(
+    "background_jobs_leader",
+    "Whether this instance runs the fleet-wide background jobs",
+)
+
+
+class Lease(Protocol):
+    async def acquire(self) -> bool: ...
+
+    async def release(self) -> None: ...
+
+
+@final
+class MongoLease:
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection[dict[str, Any]],
+        holder: str,
+        name: str = BACKGROUND_JOBS_LEASE,
+        ttl_seconds: float = 30,
+    ):
+        self.collection = collection
+        self.holder = holder
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+
+    async def acquire(self) -> bool:
+        # Takes the lease when it is free or expired, or extends our own. The
+        # upsert of a lease held by someone else collides on _id instead.
+        now = datetime.now(tz=UTC)
+        try:
+            _ = await self.collection.update_one(
+                {
+                    "_id": self.name,
+                    "$or": [{"holder": self.holder}, {"expires_at": {"$lte": now}}],
+                },
+                {
+                    "$set": {
+                        "holder": self.holder,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                        "renewed_at": now,
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release(self) -> None:
+        _ = await self.collection.delete_one({"_id": self.name, "holder": self.holder})
+
+
+@final
+class InMemoryLease:
+    # A single process is always its own leader
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+@final
+class LeaderElection:
+    def __init__(
+        self,
+        lease: Lease,
+        on_elected: Callable[[], Awaitable[Any]],
+        on_demoted: Callable[[], Awaitable[Any]],
+        renew_interval_seconds: float = 10,
+    ):
+        self.lease = lease
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.renew_interval_seconds = renew_interval_seconds
+        self.is_leader = False
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="leader_election")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        _ = self.task.cancel()
+        _ = await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        if self.is_leader:
+            await self.set_leader(False)
+            try:
+                # Lets another instance take over without waiting for expiry
+                await self.lease.release()
+            except Exception:
+                logger.warning("Failed to release lease", exc_info=True)
+
+    async def set_leader(self, is_leader: bool) -> None:
+        self.is_leader = is_leader
+        is_leader_gauge.set(int(is_leader))
+        logger.info("Leadership changed", extra={"is_leader": is_leader})
+        try:
+            _ = await (self.on_elected() if is_leader else self.on_demoted())
+        except Exception:
+            logger.exception("Leadership change handler failed")
+
+    async def run(self) -> None:
+        while True:
+            try:
+                acquired = await self.lease.acquire()
+            except Exception:
+                # Without a renewal the lease runs out, someone else may take it
+                logger.warning("Failed to renew lease", exc_info=True)
+                acquired = False
+            if acquired != self.is_leader:
+                await self.set_leader(acquired)
+            await asyncio.sleep(self.renew_interval_seconds)
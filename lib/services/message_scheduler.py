@@ -0,0 +1,120 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+import logging
+from typing import Any, final
+
+from slack_sdk.models.blocks import Block
+
+from lib.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOCKS_PER_MESSAGE = 50
+
+messages_posted = metrics.counter(
+    "slack_messages_posted_total", "Messages posted through chat.postMessage"
+)
+messages_coalesced = metrics.counter(
+    "slack_messages_coalesced_total",
+    "Announcements merged into a message with other announcements",
+)
+messages_rate_limited = metrics.counter(
+    "slack_messages_rate_limited_total", "chat.postMessage calls rejected with 429"
+)
+messages_dropped = metrics.counter(
+    "slack_messages_dropped_total", "Announcements that could not be delivered"
+)
+
+
+class SlackRateLimitedError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited by Slack, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@final
+class SlackMessageScheduler:
+    def __init__(
+        self,
+        post_message: Callable[[str, Sequence[Block]], Awaitable[Any]],
+        coalesce_window_seconds: float = 0.25,
+        max_attempts: int = 3,
+        retry_backoff_seconds: float = 0.5,
+        max_rate_limited_attempts: int = 5,
+    ):
+        self.post_message = post_message
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_rate_limited_attempts = max_rate_limited_attempts
+        self.pending: dict[str, list[list[Block]]] = {}
+        self.drainers: dict[str, asyncio.Task[None]] = {}
+
+    def enqueue(self, channel_id: str, blocks: Sequence[Block]) -> None:
+        self.pending.setdefault(channel_id, []).append(list(blocks))
+        if channel_id not in self.drainers:
+            self.drainers[channel_id] = asyncio.create_task(self.drain(channel_id))
+
+    async def flush(self) -> None:
+        while self.drainers:
+            _ = await asyncio.gather(*self.drainers.values(), return_exceptions=True)
+
+    async def drain(self, channel_id: str) -> None:
+        try:
+            # Give other announcements for the same channel a chance to pile up
+            await asyncio.sleep(self.coalesce_window_seconds)
+            while self.pending.get(channel_id):
+                await self.send(channel_id, self.take_batch(channel_id))
+        finally:
+            _ = self.pending.pop(channel_id, None)
+            del self.drainers[channel_id]
+
+    def take_batch(self, channel_id: str) -> list[Block]:
+        queue = self.pending[channel_id]
+        batch: list[Block] = []
+        taken = 0
+        for blocks in queue:
+            if batch and len(batch) + len(blocks) > MAX_BLOCKS_PER_MESSAGE:
+                break
+            batch.extend(blocks)
+            taken += 1
+        del queue[:taken]
+        if taken > 1:
+            messages_coalesced.inc(taken - 1)
+        return batch
+
+    async def send(self, channel_id: str, blocks: list[Block]) -> None:
+        attempt = 0
+        rate_limited_attempt = 0
+        while True:
+            try:
+                _ = await self.post_message(channel_id, blocks)
+                messages_posted.inc()
+                return
+            except SlackRateLimitedError as e:
+                # Slack rate limits per channel, so only this channel's drainer waits
+                messages_rate_limited.inc()
+                rate_limited_attempt += 1
+                if rate_limited_attempt >= self.max_rate_limited_attempts:
+                    # Gives up rather than hold the channel's queue indefinitely
+                    logger.warning(
+                        "Dropping message still rate limited after retries",
+                        extra={
+                            "channel_id": channel_id,
+                            "attempt": rate_limited_attempt,
+                        },
+                    )
+                    messages_dropped.inc()
+                    return
+                await asyncio.sleep(e.retry_after)
+            except Exception:
+                logger.warning(
+                    "Failed to post message",
+                    exc_info=True,
+                    extra={"channel_id": channel_id, "attempt": attempt + 1},
+                )
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    messages_dropped.inc()
+                    return
+                await asyncio.sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
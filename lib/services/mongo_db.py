@@ -1,14 +1,67 @@
-import os
-from typing import Any
+import time
+from typing import Any, final
 
-from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 
-_ = load_dotenv()
-if os.path.exists(path="/etc/secrets/.env"):
-    _ = load_dotenv("/etc/secrets/.env")
+from lib.services.health_service import ConnectionPoolMonitor
 
-client = AsyncIOMotorClient(os.environ["MONGODB_URI"])
-db = client.afk_slackbot
+DATABASE_NAME = "afk_slackbot"
+AFK_RECORDS_COLLECTION = "afk_records"
+AFK_RECORDS_ARCHIVE_COLLECTION = "afk_records_archive"
+SCHEDULER_STATE_COLLECTION = "scheduler_state"
+LEASES_COLLECTION = "leases"
+CACHE_INVALIDATIONS_COLLECTION = "cache_invalidations"
 
-afk_records_collection: AsyncIOMotorCollection[dict[str, Any]] = db.afk_records
+
+@final
+class MongoConnection:
+    def __init__(
+        self,
+        # None when records aren't kept in MongoDB, the client is then never built
+        uri: str | None,
+        database_name: str = DATABASE_NAME,
+        max_pool_size: int = 100,
+        min_pool_size: int = 0,
+        server_selection_timeout_ms: int = 30_000,
+        connect_timeout_ms: int = 20_000,
+        socket_timeout_ms: int | None = None,
+    ):
+        self.uri = uri
+        self.database_name = database_name
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self.connect_timeout_ms = connect_timeout_ms
+        self.socket_timeout_ms = socket_timeout_ms
+        self.pool_monitor = ConnectionPoolMonitor()
+        self.client: AsyncIOMotorClient[dict[str, Any]] | None = None
+
+    def get_client(self) -> AsyncIOMotorClient[dict[str, Any]]:
+        # Building the client resolves the URI and starts server monitoring, so it
+        # waits for first use, and is then kept for warm invocations of the process
+        if self.client is None:
+            if self.uri is None:
+                raise RuntimeError("No MongoDB URI configured")
+            self.client = AsyncIOMotorClient(
+                self.uri,
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=self.min_pool_size,
+                serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+                connectTimeoutMS=self.connect_timeout_ms,
+                socketTimeoutMS=self.socket_timeout_ms,
+                event_listeners=[self.pool_monitor],
+            )
+        return self.client
+
+    def get_collection(self, name: str) -> AsyncIOMotorCollection[dict[str, Any]]:
+        return self.get_client()[self.database_name][name]
+
+    async def connect(self) -> float:
+        started_at = time.perf_counter()
+        _ = await self.get_client().admin.command("ping")
+        return time.perf_counter() - started_at
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+            self.client = None
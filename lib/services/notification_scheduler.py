@@ -0,0 +1,379 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from datetime import UTC, datetime
+from enum import Enum
+import heapq
+from itertools import count
+import logging
+import time
+from typing import Any, NamedTuple, Protocol, final
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from slack_sdk.models.blocks import Block, MarkdownTextObject, SectionBlock
+
+from lib.metrics import metrics
+from lib.models import (
+    AFKDisplayRow,
+    AFKRecord,
+    AFKRecordFilter,
+    AFKStatus,
+    DatetimeRange,
+    UserInfo,
+)
+from lib.services.database_service import DatabaseService
+from lib.services.invalidation_bus import AFK_EVENTS_TOPIC, InvalidationBus
+from lib.services.slack_service import SlackService
+from lib.utils import format_afk_record_to_print
+
+logger = logging.getLogger(__name__)
+
+AFK_NOTIFICATIONS_CURSOR = "afk_notifications"
+
+notifications_sent = metrics.counter(
+    "afk_notifications_sent_total", "AFK start and end announcements queued"
+)
+notifications_skipped = metrics.counter(
+    "afk_notifications_skipped_total",
+    "Due AFK events dropped because the record changed or they were too late",
+)
+notifications_pending = metrics.gauge(
+    "afk_notifications_pending", "AFK start and end events waiting in memory"
+)
+
+
+class AFKEventKind(Enum):
+    START = "start"
+    END = "end"
+
+
+class AFKEvent(NamedTuple):
+    fire_at: float
+    # Unique, so heap comparisons never reach the fields after it
+    sequence: int
+    kind: AFKEventKind
+    record_id: str
+
+
+def starts_later(record: AFKRecord | AFKDisplayRow) -> bool:
+    # Records starting by the time they are created are announced straight away
+    return record.start_datetime > record.created
+
+
+def get_event_times(
+    record: AFKRecord | AFKDisplayRow,
+) -> Iterator[tuple[AFKEventKind, float]]:
+    if starts_later(record):
+        yield AFKEventKind.START, record.start_datetime
+    yield AFKEventKind.END, record.end_datetime
+
+
+class SchedulerCursorStore(Protocol):
+    async def load(self) -> float | None: ...
+
+    async def save(self, cursor: float) -> None: ...
+
+
+@final
+class MongoSchedulerCursorStore:
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection[dict[str, Any]],
+        name: str = AFK_NOTIFICATIONS_CURSOR,
+    ):
+        self.collection = collection
+        self.name = name
+
+    async def load(self) -> float | None:
+        document = await self.collection.find_one({"_id": self.name})
+        return None if document is None else document["cursor"]
+
+    async def save(self, cursor: float) -> None:
+        # $max so a slow writer can't move the cursor back
+        _ = await self.collection.update_one(
+            {"_id": self.name},
+            {"$max": {"cursor": cursor}, "$set": {"updated_at": datetime.now(tz=UTC)}},
+            upsert=True,
+        )
+
+
+@final
+class InMemorySchedulerCursorStore:
+    def __init__(self):
+        self.cursor: float | None = None
+
+    async def load(self) -> float | None:
+        return self.cursor
+
+    async def save(self, cursor: float) -> None:
+        self.cursor = max(cursor, self.cursor or cursor)
+
+
+@final
+class AFKNotificationScheduler:
+    def __init__(
+        self,
+        database_service: DatabaseService,
+        slack_service: SlackService,
+        cursor_store: SchedulerCursorStore,
+        lookahead_seconds: float = 15 * 60,
+        max_delay_seconds: float = 15 * 60,
+        load_batch_size: int = 500,
+        fire_batch_size: int = 500,
+        retry_interval_seconds: float = 5,
+        invalidation_bus: InvalidationBus | None = None,
+    ):
+        self.database_service = database_service
+        self.slack_service = slack_service
+        self.cursor_store = cursor_store
+        self.lookahead_seconds = lookahead_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.load_batch_size = load_batch_size
+        self.fire_batch_size = fire_batch_size
+        self.retry_interval_seconds = retry_interval_seconds
+        self.invalidation_bus = invalidation_bus
+        self.events: list[AFKEvent] = []
+        # (record id, kind) of every event in the heap, loads and local
+        # schedule() calls can overlap
+        self.scheduled: set[tuple[str, AFKEventKind]] = set()
+        self.sequence = count()
+        # Every event firing before loaded_until is in the heap or already fired
+        self.loaded_until: float | None = None
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="afk_notifications")
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        _ = self.task.cancel()
+        _ = await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        # Another instance may run the scheduler before this one starts it again,
+        # so a restart begins from the persisted cursor
+        self.events.clear()
+        self.scheduled.clear()
+        self.loaded_until = None
+        notifications_pending.set(0)
+
+    def push(self, kind: AFKEventKind, fire_at: float, record_id: str) -> bool:
+        key = (record_id, kind)
+        if key in self.scheduled:
+            return False
+        self.scheduled.add(key)
+        event = AFKEvent(
+            fire_at=fire_at,
+            sequence=next(self.sequence),
+            kind=kind,
+            record_id=record_id,
+        )
+        heapq.heappush(self.events, event)
+        notifications_pending.set(len(self.events))
+        if self.events[0] is event:
+            self.wakeup.set()
+        return True
+
+    def schedule(self, record: AFKRecord | AFKDisplayRow) -> int:
+        # Events after loaded_until are picked up by a later load
+        if self.loaded_until is None:
+            return 0
+        return sum(
+            self.push(kind, fire_at, record.id)
+            for kind, fire_at in get_event_times(record)
+            if fire_at < self.loaded_until
+        )
+
+    async def submit(self, record: AFKRecord) -> None:
+        # Only the instance holding the background jobs lease runs the scheduler,
+        # the others hand new records over to it
+        if self.task is not None:
+            _ = self.schedule(record)
+        elif self.invalidation_bus is not None:
+            await self.invalidation_bus.publish(AFK_EVENTS_TOPIC, [record.id])
+
+    async def schedule_ids(self, record_ids: Sequence[str]) -> int:
+        if self.task is None:
+            return 0
+        scheduled = 0
+        async for record in self.database_service.iter_records(
+            {"id": record_ids, "status": [AFKStatus.ACTIVE]}
+        ):
+            scheduled += self.schedule(record)
+        return scheduled
+
+    async def load(self, now: float) -> int:
+        if self.loaded_until is None:
+            cursor = await self.cursor_store.load()
+            # Events missed while no instance was running are still sent, unless
+            # they are too late to be useful
+            self.loaded_until = max(cursor or now, now - self.max_delay_seconds)
+        window: DatetimeRange = {
+            "gte": datetime.fromtimestamp(self.loaded_until, tz=UTC),
+            "lt": datetime.fromtimestamp(now + self.lookahead_seconds, tz=UTC),
+        }
+        filters: list[tuple[AFKEventKind, AFKRecordFilter]] = [
+            (
+                AFKEventKind.START,
+                {"start_datetime": window, "status": [AFKStatus.ACTIVE]},
+            ),
+            (AFKEventKind.END, {"end_datetime": window, "status": [AFKStatus.ACTIVE]}),
+        ]
+        loaded = 0
+        for kind, filter in filters:
+            async for record in self.database_service.iter_records(
+                filter, batch_size=self.load_batch_size
+            ):
+                if kind == AFKEventKind.START:
+                    if starts_later(record):
+                        loaded += self.push(kind, record.start_datetime, record.id)
+                else:
+                    loaded += self.push(kind, record.end_datetime, record.id)
+        self.loaded_until = now + self.lookahead_seconds
+        return loaded
+
+    def pop_due(self, now: float) -> list[AFKEvent]:
+        due: list[AFKEvent] = []
+        while (
+            self.events
+            and self.events[0].fire_at <= now
+            and len(due) < self.fire_batch_size
+        ):
+            event = heapq.heappop(self.events)
+            self.scheduled.discard((event.record_id, event.kind))
+            due.append(event)
+        notifications_pending.set(len(self.events))
+        return due
+
+    async def fire(self, events: Sequence[AFKEvent], now: float) -> int:
+        # Records may have been cleared or edited since they were loaded
+        records = {
+            record.id: record
+            async for record in self.database_service.iter_records(
+                {
+                    "id": [event.record_id for event in events],
+                    "status": [AFKStatus.ACTIVE],
+                }
+            )
+        }
+        due: list[tuple[AFKEventKind, AFKDisplayRow]] = []
+        for event in events:
+            record = records.get(event.record_id)
+            if (
+                record is None
+                or event.fire_at < now - self.max_delay_seconds
+                or event.fire_at
+                != (
+                    record.start_datetime
+                    if event.kind == AFKEventKind.START
+                    else record.end_datetime
+                )
+            ):
+                notifications_skipped.inc()
+                continue
+            due.append((event.kind, record))
+        if not due:
+            return 0
+
+        teams_user_ids: defaultdict[str, set[str]] = defaultdict(set)
+        for kind, record in due:
+            if kind == AFKEventKind.START:
+                teams_user_ids[record.team_id].add(record.user_id)
+        users_info: dict[str, UserInfo] = {}
+        for team_id, user_ids in teams_user_ids.items():
+            users_info.update(
+                await self.slack_service.get_users_info(
+                    user_ids=user_ids, team_id=team_id
+                )
+            )
+
+        channels: defaultdict[str, list[tuple[AFKEventKind, AFKDisplayRow]]] = (
+            defaultdict(list)
+        )
+        for kind, record in due:
+            channels[record.channel_id].append((kind, record))
+        for channel_id, channel_events in channels.items():
+            self.slack_service.enqueue_message(
+                channel_id=channel_id,
+                blocks=self.get_blocks(channel_events, users_info),
+            )
+        notifications_sent.inc(len(due))
+        return len(due)
+
+    @staticmethod
+    def get_blocks(
+        events: Sequence[tuple[AFKEventKind, AFKDisplayRow]],
+        users_info: dict[str, UserInfo],
+    ) -> list[Block]:
+        # Start times are shown in each user's own locale and timezone
+        started = [
+            format_afk_record_to_print(
+                afk_record=record,
+                user_info=users_info.get(record.user_id)
+                or UserInfo(
+                    id=record.user_id,
+                    locale="en-US",
+                    real_name=f"<@{record.user_id}>",
+                    team_id=record.team_id,
+                    tz_offset=0,
+                ),
+            )
+            for kind, record in events
+            if kind == AFKEventKind.START
+        ]
+        back_user_ids = list(
+            dict.fromkeys(
+                record.user_id for kind, record in events if kind == AFKEventKind.END
+            )
+        )
+        blocks = SlackService.get_list_response(records=started) if started else []
+        if back_user_ids:
+            mentions = ", ".join(f"<@{user_id}>" for user_id in back_user_ids)
+            blocks.append(
+                SectionBlock(
+                    text=MarkdownTextObject(
+                        text=f"{mentions} {'is' if len(back_user_ids) == 1 else 'are'} back"
+                    )
+                )
+            )
+        return blocks
+
+    async def tick(self) -> float:
+        now = time.time()
+        if self.loaded_until is None or now + self.lookahead_seconds / 2 >= (
+            self.loaded_until
+        ):
+            _ = await self.load(now)
+        fired = False
+        while due := self.pop_due(now):
+            try:
+                _ = await self.fire(due, now)
+            except Exception:
+                # Put them back, the next tick retries
+                for event in due:
+                    _ = self.push(event.kind, event.fire_at, event.record_id)
+                raise
+            fired = True
+        if fired:
+            # Everything due by now has been queued
+            await self.cursor_store.save(now)
+        next_load_at = (self.loaded_until or now) - self.lookahead_seconds / 2
+        next_fire_at = self.events[0].fire_at if self.events else next_load_at
+        return max(0, min(next_fire_at, next_load_at) - time.time())
+
+    async def run(self) -> None:
+        while True:
+            # Cleared first, so events scheduled during the tick wake the next wait
+            self.wakeup.clear()
+            try:
+                timeout = await self.tick()
+            except Exception:
+                logger.exception("AFK notification tick failed")
+                timeout = self.retry_interval_seconds
+            try:
+                async with asyncio.timeout(timeout):
+                    _ = await self.wakeup.wait()
+            except TimeoutError:
+                pass
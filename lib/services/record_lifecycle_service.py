@@ -0,0 +1,136 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from enum import Enum
+import gzip
+from typing import Any, final
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import BulkWriteError
+
+from lib.metrics import metrics
+from lib.models import AFKRecord
+
+DUPLICATE_KEY_ERROR = 11000
+
+records_archived = metrics.counter(
+    "afk_records_archived_total", "Expired AFK records moved out of afk_records"
+)
+
+
+class ArchiveMode(Enum):
+    NONE = "none"
+    COLLECTION = "collection"
+    JSONL = "jsonl"
+
+
+@final
+class RecordLifecycleService:
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection[dict[str, Any]],
+        retention: timedelta,
+        archive_mode: ArchiveMode = ArchiveMode.COLLECTION,
+        archive_collection: AsyncIOMotorCollection[dict[str, Any]] | None = None,
+        archive_path: str = "afk_records_archive.jsonl.gz",
+        batch_size: int = 500,
+    ):
+        if archive_mode == ArchiveMode.COLLECTION and archive_collection is None:
+            raise ValueError("archive_collection is required to archive to MongoDB")
+        self.collection = collection
+        self.retention = retention
+        self.archive_mode = archive_mode
+        self.archive_collection = archive_collection
+        self.archive_path = archive_path
+        self.batch_size = batch_size
+
+    async def ensure_indexes(self) -> list[str]:
+        # Without an archive MongoDB's TTL monitor can delete expired records
+        # itself, otherwise compact() has to copy them out first
+        index = (
+            IndexModel(
+                [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+            )
+            if self.archive_mode == ArchiveMode.NONE
+            else IndexModel([("expires_at", ASCENDING)], name="expires_at")
+        )
+        async for existing in self.collection.list_indexes():
+            if (
+                existing["key"] == {"expires_at": ASCENDING}
+                and existing["name"] != index.document["name"]
+            ):
+                _ = await self.collection.drop_index(existing["name"])
+        return await self.collection.create_indexes([index])
+
+    async def backfill_expiry(self) -> int:
+        # Records written before expires_at existed get it derived from end_datetime
+        update_result = await self.collection.update_many(
+            filter={"expires_at": {"$exists": False}},
+            update=[
+                {
+                    "$set": {
+                        "expires_at": {
+                            "$toDate": {
+                                "$multiply": [
+                                    {
+                                        "$add": [
+                                            "$end_datetime",
+                                            self.retention.total_seconds(),
+                                        ]
+                                    },
+                                    1000,
+                                ]
+                            }
+                        }
+                    }
+                }
+            ],
+        )
+        return update_result.modified_count
+
+    async def compact(self) -> int:
+        compacted = 0
+        while True:
+            cursor = self.collection.find(
+                filter={"expires_at": {"$lte": datetime.now(tz=UTC)}},
+                limit=self.batch_size,
+            )
+            documents: list[dict[str, Any]] = await cursor.to_list(length=None)
+            if not documents:
+                return compacted
+            await self.archive(documents)
+            delete_result = await self.collection.delete_many(
+                filter={"_id": {"$in": [document["_id"] for document in documents]}}
+            )
+            records_archived.inc(delete_result.deleted_count)
+            compacted += delete_result.deleted_count
+            if len(documents) < self.batch_size:
+                return compacted
+
+    async def archive(self, documents: list[dict[str, Any]]) -> None:
+        if (
+            self.archive_mode == ArchiveMode.COLLECTION
+            and self.archive_collection is not None
+        ):
+            try:
+                _ = await self.archive_collection.insert_many(
+                    documents=documents, ordered=False
+                )
+            except BulkWriteError as e:
+                # Documents already archived by an interrupted earlier run are fine
+                if any(
+                    error["code"] != DUPLICATE_KEY_ERROR
+                    for error in e.details.get("writeErrors", [])
+                ):
+                    raise
+        elif self.archive_mode == ArchiveMode.JSONL:
+            lines = "".join(
+                AFKRecord.model_validate(document).model_dump_json() + "\n"
+                for document in documents
+            )
+            await asyncio.to_thread(self.append_to_archive_file, lines)
+
+    def append_to_archive_file(self, lines: str) -> None:
+        # Every batch becomes its own gzip member, which gzip readers concatenate
+        with gzip.open(self.archive_path, mode="at", encoding="utf-8") as file:
+            _ = file.write(lines)
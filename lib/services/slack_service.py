@@ -1,8 +1,10 @@
-from collections.abc import Sequence
-from typing import final
+import asyncio
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+import logging
+from typing import Any, final
 
-import requests
-from slack_sdk import WebClient
+import httpx
 from slack_sdk.models.blocks import (
     ActionsBlock,
     Block,
@@ -13,14 +15,75 @@ from slack_sdk.models.blocks import (
     SectionBlock,
 )
 
-from lib.models import AFKRecordToPrint, UserInfo
+from lib.cache import TTLCache
+from lib.metrics import ErrorRateWindow
+from lib.models import AFKRecordToPrint, SlashSubcommand, UserInfo
+from lib.services.message_scheduler import SlackMessageScheduler, SlackRateLimitedError
+from lib.tracing import span
+from lib.utils import parse_retry_after
+
+SLACK_API_BASE_URL = "https://slack.com/api/"
+MAX_FIELDS_PER_SECTION = 10
+NEXT_PAGE_ACTION_ID = "next_page_button"
+
+logger = logging.getLogger(__name__)
 
 
 @final
 class SlackService:
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        api_base_url: str = SLACK_API_BASE_URL,
+        user_info_cache_ttl_seconds: float = 300,
+        user_info_cache_max_size: int = 1024,
+        user_info_cache_max_teams: int = 100,
+        max_connections: int = 20,
+        message_coalesce_window_seconds: float = 0.25,
+        user_info_lookup_concurrency: int = 10,
+        error_rate_window_seconds: float = 300,
+    ):
         self.token = token
-        self.web_client = WebClient(token=token)
+        self.http_client = httpx.AsyncClient(
+            base_url=api_base_url,
+            headers={"Authorization": f"Bearer {token}"},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(5.0),
+        )
+        # response_url posts go to a different host and need no bot token
+        self.webhook_client = httpx.AsyncClient(timeout=httpx.Timeout(5.0))
+        self.user_info_cache_ttl_seconds = user_info_cache_ttl_seconds
+        self.user_info_cache_max_size = user_info_cache_max_size
+        self.user_info_cache_max_teams = user_info_cache_max_teams
+        # One cache per team, least recently used first. An evicted team starts
+        # again with an empty cache.
+        self.user_info_caches: OrderedDict[str, TTLCache[str, UserInfo]] = OrderedDict()
+        self.user_info_lookup_semaphore = asyncio.Semaphore(
+            user_info_lookup_concurrency
+        )
+        # Transport failures and 5xx replies from the Web API, read by readiness checks
+        self.api_error_rate = ErrorRateWindow(window_seconds=error_rate_window_seconds)
+        self.message_scheduler = SlackMessageScheduler(
+            post_message=self.post_message,
+            coalesce_window_seconds=message_coalesce_window_seconds,
+        )
+
+    async def call_api(self, method: str, **kwargs: Any) -> httpx.Response:
+        try:
+            response = await self.http_client.post(url=method, **kwargs)
+        except httpx.HTTPError:
+            self.api_error_rate.record(error=True)
+            raise
+        self.api_error_rate.record(error=response.status_code >= 500)
+        return response
+
+    async def aclose(self):
+        await self.message_scheduler.flush()
+        await self.http_client.aclose()
+        await self.webhook_client.aclose()
 
     @staticmethod
     def get_custom_input_block(text: str, initial_date_time: int):
@@ -61,40 +124,157 @@ class SlackService:
             ]
         }
 
-    async def get_user_info(self, user_id: str) -> UserInfo | None:
-        api_url = "https://slack.com/api/users.info"
-        headers = {
-            "Authorization": f"Bearer {self.token}",
+    def get_user_info_cache(self, team_id: str) -> TTLCache[str, UserInfo]:
+        cache = self.user_info_caches.get(team_id)
+        if cache is None:
+            cache = TTLCache(
+                ttl_seconds=self.user_info_cache_ttl_seconds,
+                max_size=self.user_info_cache_max_size,
+            )
+            self.user_info_caches[team_id] = cache
+            if len(self.user_info_caches) > self.user_info_cache_max_teams:
+                _ = self.user_info_caches.popitem(last=False)
+        else:
+            self.user_info_caches.move_to_end(team_id)
+        return cache
+
+    async def get_user_info(self, user_id: str, team_id: str) -> UserInfo | None:
+        return await self.get_user_info_cache(team_id).get_or_load(
+            key=user_id, loader=lambda: self.fetch_user_info(user_id=user_id)
+        )
+
+    async def get_users_info(
+        self, user_ids: Iterable[str], team_id: str
+    ) -> dict[str, UserInfo]:
+        distinct_user_ids = list(dict.fromkeys(user_ids))
+        users_info = await asyncio.gather(
+            *(
+                self.get_user_info(user_id=user_id, team_id=team_id)
+                for user_id in distinct_user_ids
+            )
+        )
+        return {
+            user_id: user_info
+            for user_id, user_info in zip(distinct_user_ids, users_info)
+            if user_info is not None
         }
-        query_params = {"user": user_id, "include_locale": True}
+
+    async def sync_team_users(
+        self, team_id: str, max_rate_limited_attempts: int = 3
+    ) -> int:
+        cache = self.get_user_info_cache(team_id)
+        synced = 0
+        cursor = ""
+        rate_limited_attempt = 0
+        while True:
+            response = await self.call_api(
+                "users.list",
+                params={
+                    "cursor": cursor,
+                    "include_locale": "true",
+                    "limit": 200,
+                    "team_id": team_id,
+                },
+            )
+            if response.status_code == 429:
+                rate_limited_attempt += 1
+                if rate_limited_attempt < max_rate_limited_attempts:
+                    # The same page is requested again once Slack allows it
+                    await asyncio.sleep(
+                        parse_retry_after(response.headers.get("Retry-After"), 1)
+                    )
+                    continue
+            response_json = response.json() if response.is_success else {}
+            if not response_json.get("ok", False):
+                # Users left out are looked up one by one when they are needed
+                logger.warning(
+                    "users.list sync stopped early",
+                    extra={
+                        "team_id": team_id,
+                        "status_code": response.status_code,
+                        "error": response_json.get("error"),
+                        "synced": synced,
+                    },
+                )
+                return synced
+            rate_limited_attempt = 0
+            for member in response_json.get("members", []):
+                if member.get("deleted") or member.get("is_bot"):
+                    continue
+                try:
+                    cache.set(member["id"], UserInfo.model_validate(member))
+                    synced += 1
+                except Exception:
+                    logger.warning(
+                        "Skipping malformed user from users.list",
+                        exc_info=True,
+                        extra={"team_id": team_id},
+                    )
+            cursor = response_json.get("response_metadata", {}).get("next_cursor", "")
+            if not cursor:
+                return synced
+
+    async def sync_known_teams_users(self) -> int:
+        return sum(
+            [
+                await self.sync_team_users(team_id)
+                for team_id in list(self.user_info_caches)
+            ]
+        )
+
+    async def fetch_user_info(self, user_id: str) -> UserInfo | None:
+        query_params = {"user": user_id, "include_locale": "true"}
         try:
-            response = requests.post(url=api_url, headers=headers, params=query_params)
+            async with self.user_info_lookup_semaphore:
+                response = await self.call_api("users.info", params=query_params)
             response_json = response.json()
             user = response_json.get("user", None)
             return UserInfo.model_validate(user)
-        except Exception as e:
-            print(f"Error: {e}")  # TODO: replace with logger
+        except Exception:
+            logger.warning(
+                "User lookup failed", exc_info=True, extra={"user_id": user_id}
+            )
             return None
 
     @staticmethod
-    def get_list_response(records: list[AFKRecordToPrint]):
-        return [
-            SectionBlock(
-                fields=[
-                    MarkdownTextObject(
-                        text="\n".join(
-                            [
-                                f"*{record.real_name}* (afk {record.text})",
-                                f"From: {record.start_datetime}",
-                                f"Upto: {record.end_datetime}",
-                            ]
-                        )
-                    )
-                    for record in records
-                ]
+    def get_list_response(records: list[AFKRecordToPrint]) -> list[Block]:
+        # Slack rejects sections with more than 10 fields
+        fields = [
+            MarkdownTextObject(
+                text="\n".join(
+                    [
+                        f"*{record.real_name}* (afk {record.text})",
+                        f"From: {record.start_datetime}",
+                        f"Upto: {record.end_datetime}",
+                        *([f"Id: `{record.id}`"] if record.id is not None else []),
+                    ]
+                )
             )
+            for record in records
+        ]
+        return [
+            SectionBlock(fields=fields[i : i + MAX_FIELDS_PER_SECTION])
+            for i in range(0, len(fields), MAX_FIELDS_PER_SECTION)
         ]
 
+    @staticmethod
+    def get_next_page_block(
+        subcommand: SlashSubcommand, offset: int, user_id: str | None = None
+    ) -> Block:
+        value = f"{subcommand.value}:{offset}"
+        if user_id is not None:
+            value += f":{user_id}"
+        return ActionsBlock(
+            block_id="pagination_block",
+            elements=[
+                ButtonElement(
+                    text="Next page",
+                    action_id=NEXT_PAGE_ACTION_ID,
+                    value=value,
+                )
+            ],
+        )
+
     @staticmethod
     def get_table_response(records: list[AFKRecordToPrint]):
         max_len_real_name = len(max(records, key=lambda r: len(r.real_name)).real_name)
@@ -133,7 +313,40 @@ class SlackService:
             text="```" + "\n".join([header_block, divider_block, *table_block]) + "```"
         )
 
-    def post_message(self, channel_id: str, blocks: Sequence[Block]):
-        return self.web_client.chat_postMessage(
-            channel=channel_id, blocks=blocks, text="Message from AFK Slackbot"
-        )
+    async def post_message(
+        self, channel_id: str, blocks: Sequence[Block]
+    ) -> dict[str, Any]:
+        with span("slack_post"):
+            response = await self.call_api(
+                "chat.postMessage",
+                json={
+                    "channel": channel_id,
+                    "blocks": [block.to_dict() for block in blocks],
+                    "text": "Message from AFK Slackbot",
+                },
+            )
+        if response.status_code == 429:
+            raise SlackRateLimitedError(
+                retry_after=parse_retry_after(response.headers.get("Retry-After"), 1)
+            )
+        _ = response.raise_for_status()
+        response_json: dict[str, Any] = response.json()
+        if not response_json.get("ok", False):
+            raise RuntimeError(f"chat.postMessage failed: {response_json.get('error')}")
+        return response_json
+
+    async def post_to_response_url(
+        self, response_url: str, payload: dict[str, Any]
+    ) -> bool:
+        try:
+            with span("slack_post"):
+                response = await self.webhook_client.post(
+                    url=response_url, json=payload
+                )
+            return response.is_success
+        except httpx.HTTPError:
+            logger.warning("Failed to post to response_url", exc_info=True)
+            return False
+
+    def enqueue_message(self, channel_id: str, blocks: Sequence[Block]) -> None:
+        self.message_scheduler.enqueue(channel_id=channel_id, blocks=blocks)
@@ -0,0 +1,475 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterator, Mapping, Sequence
+from datetime import datetime
+from enum import Enum
+from itertools import count, islice
+from typing import Any, NamedTuple, Protocol, final
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, DeleteMany, IndexModel, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from lib.models import AFKRecord, AFKRecordFilter, AFKStatus
+from lib.utils import (
+    fields_to_mongodb_projection,
+    record_matches_filter,
+    to_mongodb_value,
+    typed_dict_to_mongodb_query,
+)
+
+
+class StorageBackendName(Enum):
+    MONGO = "mongo"
+    MEMORY = "memory"
+
+
+class WriteMode(Enum):
+    OVERWRITE = "w"
+    APPEND = "a"
+    # Skips records whose trigger_id was already written, Slack retries a slash
+    # command with the same trigger_id when the first attempt is slow
+    CREATE = "c"
+
+
+type WriteOperation = ReplaceOne[dict[str, Any]] | UpdateOne | DeleteMany
+
+
+class WriteResult(NamedTuple):
+    inserted_ids: list[str]
+    # Existing records the write found, whether or not they changed
+    matched_count: int
+    modified_count: int
+    deleted_count: int
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Marks records written with WriteMode.CREATE, the only ones whose trigger_id
+# has to be unique
+UNIQUE_TRIGGER_ID_FIELD = "unique_trigger_id"
+
+# `_id` breaks ties between records ending at the same time, so reads come back
+# in insertion order without needing an in-memory sort
+AFK_RECORDS_SORT = [("end_datetime", ASCENDING), ("_id", ASCENDING)]
+
+AFK_RECORDS_INDEXES = [
+    IndexModel(
+        [
+            ("team_id", ASCENDING),
+            ("status", ASCENDING),
+            ("end_datetime", ASCENDING),
+            ("_id", ASCENDING),
+        ],
+        name="team_id_status_end_datetime",
+    ),
+    IndexModel(
+        [("team_id", ASCENDING), ("user_id", ASCENDING), ("status", ASCENDING)],
+        name="team_id_user_id_status",
+    ),
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    # Not unique, records written before retries were deduplicated may share one
+    IndexModel([("trigger_id", ASCENDING)], name="trigger_id"),
+    # Only a unique index makes concurrent upserts of one trigger_id insert a
+    # single record, the second one fails instead
+    IndexModel(
+        [("trigger_id", ASCENDING)],
+        name="trigger_id_unique",
+        unique=True,
+        partialFilterExpression={UNIQUE_TRIGGER_ID_FIELD: True},
+    ),
+    # Across teams, for loading upcoming AFK start and end notifications
+    IndexModel(
+        [("status", ASCENDING), ("start_datetime", ASCENDING)],
+        name="status_start_datetime",
+    ),
+    IndexModel(
+        [("status", ASCENDING), ("end_datetime", ASCENDING), ("_id", ASCENDING)],
+        name="status_end_datetime",
+    ),
+]
+
+# Fields the in-memory engine keeps a lookup table for, end_datetime is covered
+# by its sort order
+IN_MEMORY_INDEXED_FIELDS = ("team_id", "user_id", "trigger_id")
+
+
+class StorageBackend(Protocol):
+    async def ensure_indexes(self) -> list[str]: ...
+
+    async def explain(self, filter: AFKRecordFilter) -> dict[str, Any]: ...
+
+    # Documents matching the filter, ordered by end_datetime then insertion
+    def find(
+        self,
+        filter: AFKRecordFilter,
+        fields: Sequence[str] | None = None,
+        skip: int = 0,
+        limit: int = 0,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict[str, Any]]: ...
+
+    async def write(
+        self,
+        documents: Sequence[dict[str, Any]],
+        mode: WriteMode,
+        scope: AFKRecordFilter | None = None,
+    ) -> WriteResult: ...
+
+    async def replace(
+        self, documents: Sequence[dict[str, Any]], upsert: bool
+    ) -> WriteResult: ...
+
+    async def cancel(self, filter: AFKRecordFilter, expires_at: datetime) -> int: ...
+
+
+def get_end_datetime_lower_bound(filter: AFKRecordFilter) -> float | None:
+    value = filter.get("end_datetime")
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, Mapping) and "gte" in value:
+        return value["gte"].timestamp()
+    return None
+
+
+@final
+class MongoStorageBackend:
+    def __init__(self, collection: AsyncIOMotorCollection[dict[str, Any]]):
+        self.collection = collection
+
+    async def ensure_indexes(self) -> list[str]:
+        return await self.collection.create_indexes(AFK_RECORDS_INDEXES)
+
+    async def explain(self, filter: AFKRecordFilter) -> dict[str, Any]:
+        query = typed_dict_to_mongodb_query(filter)
+        cursor = self.collection.find(filter=query, sort=AFK_RECORDS_SORT)
+        return await cursor.explain()
+
+    async def find(
+        self,
+        filter: AFKRecordFilter,
+        fields: Sequence[str] | None = None,
+        skip: int = 0,
+        limit: int = 0,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict[str, Any]]:
+        cursor = self.collection.find(
+            filter=typed_dict_to_mongodb_query(filter),
+            projection=(
+                fields_to_mongodb_projection(tuple(fields))
+                if fields is not None
+                else None
+            ),
+            sort=AFK_RECORDS_SORT,
+            batch_size=batch_size,
+            skip=skip,
+            limit=limit,
+        )
+        async for document in cursor:
+            yield document
+
+    async def write(
+        self,
+        documents: Sequence[dict[str, Any]],
+        mode: WriteMode,
+        scope: AFKRecordFilter | None = None,
+    ) -> WriteResult:
+        operations: list[WriteOperation] = [
+            UpdateOne(
+                filter={"trigger_id": document["trigger_id"]},
+                update={"$setOnInsert": {**document, UNIQUE_TRIGGER_ID_FIELD: True}},
+                upsert=True,
+            )
+            if mode == WriteMode.CREATE
+            else ReplaceOne(
+                filter={"id": document["id"]}, replacement=document, upsert=True
+            )
+            for document in documents
+        ]
+        if mode == WriteMode.OVERWRITE:
+            if scope is None:
+                raise ValueError("Overwriting needs a scope")
+            written_ids = [document["id"] for document in documents]
+            operations.append(
+                DeleteMany(
+                    filter={
+                        "$and": [
+                            typed_dict_to_mongodb_query(scope),
+                            {"id": {"$nin": written_ids}},
+                        ]
+                    }
+                )
+            )
+        return await self.bulk_write(
+            operations,
+            documents=documents,
+            ignore_duplicates=mode == WriteMode.CREATE,
+        )
+
+    async def replace(
+        self, documents: Sequence[dict[str, Any]], upsert: bool
+    ) -> WriteResult:
+        return await self.bulk_write(
+            [
+                ReplaceOne(
+                    filter={"id": document["id"]}, replacement=document, upsert=upsert
+                )
+                for document in documents
+            ],
+            documents=documents,
+        )
+
+    async def bulk_write(
+        self,
+        operations: Sequence[WriteOperation],
+        documents: Sequence[dict[str, Any]],
+        ignore_duplicates: bool = False,
+    ) -> WriteResult:
+        if not operations:
+            return WriteResult(
+                inserted_ids=[], matched_count=0, modified_count=0, deleted_count=0
+            )
+        # Unordered so one failing record doesn't hold back the rest. PyMongo
+        # splits large batches by the server's limits, one round trip per batch.
+        try:
+            bulk_write_result = await self.collection.bulk_write(
+                list(operations), ordered=False
+            )
+            upserted_indexes = list(bulk_write_result.upserted_ids or {})
+            matched_count = bulk_write_result.matched_count
+            modified_count = bulk_write_result.modified_count
+            deleted_count = bulk_write_result.deleted_count
+        except BulkWriteError as e:
+            # A concurrent retry of the same slash command inserted the record
+            # first, so it already exists
+            if (
+                not ignore_duplicates
+                or e.details.get("writeConcernErrors")
+                or any(
+                    error["code"] != DUPLICATE_KEY_ERROR
+                    for error in e.details["writeErrors"]
+                )
+            ):
+                raise
+            upserted_indexes = [upsert["index"] for upsert in e.details["upserted"]]
+            matched_count = e.details["nMatched"]
+            modified_count = e.details["nModified"]
+            deleted_count = e.details["nRemoved"]
+        # Upserts are reported by operation index, the document at that position
+        return WriteResult(
+            inserted_ids=[
+                documents[index]["id"]
+                for index in sorted(upserted_indexes)
+                if index < len(documents)
+            ],
+            matched_count=matched_count,
+            modified_count=modified_count,
+            deleted_count=deleted_count,
+        )
+
+    async def cancel(self, filter: AFKRecordFilter, expires_at: datetime) -> int:
+        update_result = await self.collection.update_many(
+            filter=typed_dict_to_mongodb_query(filter),
+            update={
+                "$set": {"status": AFKStatus.CANCELLED.value},
+                "$min": {"expires_at": expires_at},
+            },
+        )
+        return update_result.modified_count
+
+
+@final
+class InMemoryStorageBackend:
+    def __init__(self):
+        self.records: dict[str, AFKRecord] = {}
+        self.expires_at: dict[str, datetime] = {}
+        # (end_datetime, insertion sequence, id), the sequence plays the part of
+        # `_id` in breaking ties the way MongoDB reads do
+        self.order: list[tuple[float, int, str]] = []
+        self.sort_keys: dict[str, tuple[float, int, str]] = {}
+        self.sequence = count()
+        self.indexes: dict[str, defaultdict[str, set[str]]] = {
+            field: defaultdict(set) for field in IN_MEMORY_INDEXED_FIELDS
+        }
+
+    async def ensure_indexes(self) -> list[str]:
+        return []
+
+    async def explain(self, filter: AFKRecordFilter) -> dict[str, Any]:
+        return {
+            "indexes": [
+                field
+                for field in ("id", *IN_MEMORY_INDEXED_FIELDS)
+                if filter.get(field)
+            ],
+            "end_datetime_lower_bound": get_end_datetime_lower_bound(filter),
+        }
+
+    def get_candidate_ids(self, filter: AFKRecordFilter) -> set[str] | None:
+        candidate_ids: set[str] | None = None
+        # Records are keyed by id, so id filters are looked up directly
+        if record_ids := filter.get("id"):
+            candidate_ids = {
+                record_id for record_id in record_ids if record_id in self.records
+            }
+        for field in IN_MEMORY_INDEXED_FIELDS:
+            values: Sequence[Any] | None = filter.get(field)
+            if not values:
+                continue
+            index = self.indexes[field]
+            ids = set[str]().union(
+                *(index.get(to_mongodb_value(value), ()) for value in values)
+            )
+            candidate_ids = ids if candidate_ids is None else candidate_ids & ids
+        return candidate_ids
+
+    def match(self, filter: AFKRecordFilter) -> Iterator[AFKRecord]:
+        lower_bound = get_end_datetime_lower_bound(filter)
+        start = 0 if lower_bound is None else bisect_left(self.order, (lower_bound,))
+        candidate_ids = self.get_candidate_ids(filter)
+        # Walk whichever is smaller, the team or user lookup or the sorted range.
+        # Both are copied so writes between yields can't disturb the walk.
+        if candidate_ids is not None and len(candidate_ids) < len(self.order) - start:
+            sort_keys = sorted(
+                self.sort_keys[record_id]
+                for record_id in candidate_ids
+                if lower_bound is None or self.sort_keys[record_id][0] >= lower_bound
+            )
+        else:
+            sort_keys = self.order[start:]
+        for _, _, record_id in sort_keys:
+            record = self.records.get(record_id)
+            if record is not None and record_matches_filter(record, filter):
+                yield record
+
+    def to_document(self, record: AFKRecord, fields: set[str] | None) -> dict[str, Any]:
+        if fields is not None:
+            return record.model_dump(include=fields)
+        return {**record.model_dump(), "expires_at": self.expires_at[record.id]}
+
+    async def find(
+        self,
+        filter: AFKRecordFilter,
+        fields: Sequence[str] | None = None,
+        skip: int = 0,
+        limit: int = 0,
+        batch_size: int = 0,
+    ) -> AsyncIterator[dict[str, Any]]:
+        included_fields = set(fields) if fields is not None else None
+        for record in islice(self.match(filter), skip, skip + limit if limit else None):
+            yield self.to_document(record, included_fields)
+
+    def insert(
+        self, record: AFKRecord, expires_at: datetime, sequence: int | None = None
+    ) -> None:
+        sort_key = (
+            record.end_datetime,
+            next(self.sequence) if sequence is None else sequence,
+            record.id,
+        )
+        insort(self.order, sort_key)
+        self.sort_keys[record.id] = sort_key
+        self.records[record.id] = record
+        self.expires_at[record.id] = expires_at
+        for field, index in self.indexes.items():
+            index[getattr(record, field)].add(record.id)
+
+    def delete(self, record_id: str) -> int:
+        record = self.records.pop(record_id)
+        del self.expires_at[record_id]
+        sort_key = self.sort_keys.pop(record_id)
+        del self.order[bisect_left(self.order, sort_key)]
+        for field, index in self.indexes.items():
+            value = getattr(record, field)
+            ids = index[value]
+            ids.discard(record_id)
+            if not ids:
+                del index[value]
+        return sort_key[1]
+
+    def upsert(
+        self, document: dict[str, Any], upsert: bool = True
+    ) -> tuple[bool, bool]:
+        record = AFKRecord.model_validate(document)
+        expires_at: datetime = document["expires_at"]
+        existing = self.records.get(record.id)
+        if existing is None:
+            if upsert:
+                self.insert(record, expires_at)
+            return upsert, False
+        if existing == record and self.expires_at[record.id] == expires_at:
+            return False, False
+        # A replaced record keeps its place among records with the same end
+        self.insert(record, expires_at, sequence=self.delete(record.id))
+        return False, True
+
+    async def write(
+        self,
+        documents: Sequence[dict[str, Any]],
+        mode: WriteMode,
+        scope: AFKRecordFilter | None = None,
+    ) -> WriteResult:
+        if mode == WriteMode.OVERWRITE and scope is None:
+            raise ValueError("Overwriting needs a scope")
+        inserted_ids: list[str] = []
+        matched_count = 0
+        modified_count = 0
+        for document in documents:
+            if (
+                mode == WriteMode.CREATE
+                and document["trigger_id"] in (self.indexes["trigger_id"])
+            ):
+                matched_count += 1
+                continue
+            matched_count += document["id"] in self.records
+            inserted, modified = self.upsert(document)
+            if inserted:
+                inserted_ids.append(document["id"])
+            modified_count += modified
+
+        deleted_count = 0
+        if mode == WriteMode.OVERWRITE and scope is not None:
+            written_ids = {document["id"] for document in documents}
+            stale_ids = [
+                record.id
+                for record in self.match(scope)
+                if record.id not in written_ids
+            ]
+            for record_id in stale_ids:
+                _ = self.delete(record_id)
+            deleted_count = len(stale_ids)
+        return WriteResult(
+            inserted_ids=inserted_ids,
+            matched_count=matched_count,
+            modified_count=modified_count,
+            deleted_count=deleted_count,
+        )
+
+    async def replace(
+        self, documents: Sequence[dict[str, Any]], upsert: bool
+    ) -> WriteResult:
+        inserted_ids: list[str] = []
+        matched_count = 0
+        modified_count = 0
+        for document in documents:
+            matched_count += document["id"] in self.records
+            inserted, modified = self.upsert(document, upsert=upsert)
+            if inserted:
+                inserted_ids.append(document["id"])
+            modified_count += modified
+        return WriteResult(
+            inserted_ids=inserted_ids,
+            matched_count=matched_count,
+            modified_count=modified_count,
+            deleted_count=0,
+        )
+
+    async def cancel(self, filter: AFKRecordFilter, expires_at: datetime) -> int:
+        # Status isn't indexed, records can be swapped in place
+        matched = list(self.match(filter))
+        for record in matched:
+            self.records[record.id] = record.model_copy(
+                update={"status": AFKStatus.CANCELLED.value}
+            )
+            self.expires_at[record.id] = min(self.expires_at[record.id], expires_at)
+        return len(matched)
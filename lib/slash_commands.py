@@ -0,0 +1,79 @@
+from collections.abc import Awaitable, Callable
+import re
+from typing import Any, NamedTuple, final
+
+from lib.models import SlackPostRequestBody, SlashSubcommand, UserInfo
+
+# The manifest sets should_escape, so Slack sends mentions as <@U123|name>,
+# the name part is optional
+USER_MENTION_PATTERN = r"(?:<@(?P<user_id>[UW][A-Z0-9]+)(?:\|[^>]*)?>)?"
+RECORD_ID_PATTERN = (
+    r"(?P<record_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})?"
+)
+
+
+class SlashCommand(NamedTuple):
+    body: SlackPostRequestBody
+    user_info: UserInfo
+    arguments: dict[str, str]
+
+
+type SlashCommandHandler = Callable[[SlashCommand], Awaitable[Any]]
+
+
+class SlashCommandRoute(NamedTuple):
+    argument_pattern: re.Pattern[str]
+    handler: SlashCommandHandler
+
+
+@final
+class SlashCommandDispatcher:
+    def __init__(self):
+        self.routes: dict[str, SlashCommandRoute] = {}
+        self.default_handler: SlashCommandHandler | None = None
+
+    def register(
+        self, subcommand: SlashSubcommand, argument_pattern: str = ""
+    ) -> Callable[[SlashCommandHandler], SlashCommandHandler]:
+        def decorator(handler: SlashCommandHandler) -> SlashCommandHandler:
+            self.routes[subcommand.value] = SlashCommandRoute(
+                argument_pattern=re.compile(argument_pattern), handler=handler
+            )
+            return handler
+
+        return decorator
+
+    def register_default(self, handler: SlashCommandHandler) -> SlashCommandHandler:
+        self.default_handler = handler
+        return handler
+
+    def resolve(self, text: str) -> tuple[SlashCommandHandler, dict[str, str]]:
+        words = text.split(maxsplit=1)
+        route = self.routes.get(words[0].lower()) if words else None
+        if route is not None:
+            # Text that doesn't fit the subcommand's arguments is an AFK phrase,
+            # e.g. "list" is a subcommand but "list for 2 hours" is not
+            match = route.argument_pattern.fullmatch(
+                words[1].strip() if len(words) > 1 else ""
+            )
+            if match is not None:
+                return route.handler, {
+                    key: value
+                    for key, value in match.groupdict().items()
+                    if value is not None
+                }
+        if self.default_handler is None:
+            raise RuntimeError("No default slash command handler registered")
+        return self.default_handler, {}
+
+    async def dispatch(
+        self, slack_post_request_body: SlackPostRequestBody, user_info: UserInfo
+    ) -> Any:
+        handler, arguments = self.resolve(slack_post_request_body.text)
+        return await handler(
+            SlashCommand(
+                body=slack_post_request_body,
+                user_info=user_info,
+                arguments=arguments,
+            )
+        )
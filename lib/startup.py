@@ -0,0 +1,63 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+import logging
+import os
+import time
+from typing import final
+
+from lib.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def get_process_age_seconds() -> float | None:
+    # Counts from process start, so interpreter startup and every import before
+    # ours are included. Only Linux exposes the start time cheaply.
+    try:
+        with open("/proc/self/stat") as file:
+            stat = file.read()
+        # The command name can hold spaces, the fields after it can't
+        start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf(
+            "SC_CLK_TCK"
+        )
+    except Exception:
+        return None
+
+
+@final
+class StartupReport:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = seconds
+        metrics.gauge(
+            "startup_phase_seconds",
+            "Time spent in each phase of the last startup",
+            labels={"phase": phase},
+        ).set(seconds)
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started_at)
+
+    def record_process_age(self, phase: str) -> None:
+        process_age = get_process_age_seconds()
+        if process_age is not None:
+            self.record(phase, process_age)
+
+    def log(self) -> None:
+        logger.info(
+            "startup",
+            extra={
+                "phases_ms": {
+                    phase: round(seconds * 1000, 2)
+                    for phase, seconds in self.phases.items()
+                }
+            },
+        )
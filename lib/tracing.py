@@ -0,0 +1,35 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+from lib.metrics import metrics
+
+# Durations of the spans finished so far in the current request, in seconds
+span_durations: ContextVar[dict[str, float] | None] = ContextVar(
+    "span_durations", default=None
+)
+
+
+def start_trace() -> dict[str, float]:
+    durations: dict[str, float] = {}
+    _ = span_durations.set(durations)
+    return durations
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started_at
+        metrics.histogram(
+            "afk_span_duration_seconds",
+            "Time spent in each stage of handling a Slack request",
+            labels={"span": name},
+        ).observe(duration)
+        durations = span_durations.get()
+        if durations is not None:
+            # A span can run more than once per request, e.g. two Slack posts
+            durations[name] = durations.get(name, 0.0) + duration
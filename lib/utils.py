@@ -1,60 +1,186 @@
-from collections.abc import Sequence
-from collections.abc import Mapping
-from datetime import datetime, timedelta, timezone
+from collections.abc import Callable, Mapping, Sequence
+from datetime import UTC, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from enum import Enum
-from typing import Any
+from functools import lru_cache
+from typing import Any, final
 
-from babel import dates
+from babel import Locale, dates
 
-from lib.models import AFKRecord, AFKRecordToPrint, UserInfo
+from lib.models import AFKDisplayRow, AFKRecord, AFKRecordToPrint, UserInfo
 
+QueryShape = tuple[tuple[str, str], ...]
 
-def typed_dict_to_mongodb_query(typed_dict: Mapping[str, Any]):
-    filters = [
-        {
-            k: {"$gte": v.timestamp()}
-            if isinstance(v, datetime)
-            else {"$in": tuple(map(lambda e: e.value if isinstance(e, Enum) else e, v))}
-            for k, v in typed_dict.items()
-            if v
-        }
-    ]
-    query = {"$or": filters} if filters else {}
-    return query
+
+def to_mongodb_value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def equality_operator(value: Sequence[Any]) -> Any:
+    return to_mongodb_value(value[0])
+
+
+def membership_operator(value: Sequence[Any]) -> dict[str, list[Any]]:
+    return {"$in": [to_mongodb_value(e) for e in value]}
+
+
+def lower_bound_operator(value: datetime) -> dict[str, float]:
+    return {"$gte": value.timestamp()}
+
+
+def range_operator(value: Mapping[str, datetime]) -> dict[str, float]:
+    return {f"${op}": bound.timestamp() for op, bound in sorted(value.items())}
+
+
+QUERY_OPERATORS: dict[str, Callable[[Any], Any]] = {
+    "eq": equality_operator,
+    "gte": lower_bound_operator,
+    "in": membership_operator,
+    "range": range_operator,
+}
+
+
+def get_filter_value_kind(value: Any) -> str:
+    if isinstance(value, datetime):
+        return "gte"
+    if isinstance(value, Mapping):
+        return "range"
+    return "eq" if len(value) == 1 else "in"
+
+
+@lru_cache(maxsize=256)
+def compile_query_shape(
+    shape: QueryShape,
+) -> tuple[tuple[str, Callable[[Any], Any]], ...]:
+    return tuple((field, QUERY_OPERATORS[kind]) for field, kind in shape)
+
+
+def typed_dict_to_mongodb_query(typed_dict: Mapping[str, Any]) -> dict[str, Any]:
+    # Fields are emitted in a canonical order with the cheapest operator that
+    # expresses each filter, so equal filters always produce the same query shape
+    shape = tuple(
+        sorted((k, get_filter_value_kind(v)) for k, v in typed_dict.items() if v)
+    )
+    return {
+        field: operator(typed_dict[field])
+        for field, operator in compile_query_shape(shape)
+    }
+
+
+def record_matches_filter(
+    record: AFKRecord | AFKDisplayRow, filter: Mapping[str, Any]
+) -> bool:
+    # In-memory counterpart of typed_dict_to_mongodb_query
+    for field, value in filter.items():
+        if not value:
+            continue
+        actual = getattr(record, field)
+        kind = get_filter_value_kind(value)
+        if kind == "gte":
+            if actual < value.timestamp():
+                return False
+        elif kind == "range":
+            if "gte" in value and actual < value["gte"].timestamp():
+                return False
+            if "lt" in value and actual >= value["lt"].timestamp():
+                return False
+        elif actual not in {to_mongodb_value(e) for e in value}:
+            return False
+    return True
+
+
+def parse_retry_after(value: str | None, default: float) -> float:
+    # Retry-After is either a number of seconds or an HTTP date
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except ValueError:
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(tz=UTC)).total_seconds())
+
+
+@lru_cache(maxsize=64)
+def fields_to_mongodb_projection(fields: tuple[str, ...]) -> dict[str, int]:
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+
+@final
+class DatetimeFormatter:
+    # Equivalent to babel.dates.format_datetime(format="short") with the locale
+    # and patterns parsed once instead of on every call
+    def __init__(self, locale: str, tz_offset: int):
+        self.locale = Locale.parse(locale.replace("-", "_"))
+        self.tzinfo = timezone(timedelta(seconds=tz_offset))
+        self.datetime_template = str(self.locale.datetime_formats["short"]).replace(
+            "'", ""
+        )
+        self.date_pattern = dates.parse_pattern(self.locale.date_formats["short"])
+        self.time_pattern = dates.parse_pattern(self.locale.time_formats["short"])
+
+    def format(self, timestamp: float) -> str:
+        local_datetime = datetime.fromtimestamp(timestamp, tz=self.tzinfo)
+        local_date = local_datetime.date()
+        return self.datetime_template.replace(
+            "{0}",
+            self.time_pattern.apply(
+                local_datetime.timetz(), self.locale, reference_date=local_date
+            ),
+        ).replace("{1}", self.date_pattern.apply(local_date, self.locale))
+
+
+@lru_cache(maxsize=256)
+def get_datetime_formatter(locale: str, tz_offset: int) -> DatetimeFormatter:
+    return DatetimeFormatter(locale=locale, tz_offset=tz_offset)
 
 
 def format_afk_record_to_print(
-    afk_record: AFKRecord, user_info: UserInfo
+    afk_record: AFKRecord | AFKDisplayRow, user_info: UserInfo
 ) -> AFKRecordToPrint:
-    locale = user_info.locale.replace("-", "_")
-    custom_timezone = timezone(timedelta(seconds=user_info.tz_offset))
-    users_local_now = datetime.now(tz=custom_timezone)
-    users_local_time_zone = users_local_now.tzinfo
-
-    return AFKRecordToPrint(
-        text=afk_record.text,
-        real_name=user_info.real_name,
-        start_datetime=dates.format_datetime(
-            datetime.fromtimestamp(afk_record.start_datetime, tz=users_local_time_zone),
-            locale=locale,
-            format="short",
-        ),
-        end_datetime=dates.format_datetime(
-            datetime.fromtimestamp(afk_record.end_datetime, tz=users_local_time_zone),
-            locale=locale,
-            format="short",
-        ),
+    (afk_record_to_print,) = format_afk_records_to_print(
+        afk_records=[afk_record], user_info=user_info
     )
+    return afk_record_to_print
 
 
 def format_afk_records_to_print(
-    afk_records: Sequence[AFKRecord], user_info: UserInfo
+    afk_records: Sequence[AFKRecord | AFKDisplayRow],
+    user_info: UserInfo,
+    users_info: Mapping[str, UserInfo] | None = None,
+    mention_unknown_users: bool = True,
+    show_own_record_ids: bool = False,
 ) -> list[AFKRecordToPrint]:
-    return list(
-        map(
-            lambda record: format_afk_record_to_print(
-                afk_record=record, user_info=user_info
+    # Times are shown in the viewer's locale and timezone, names come from each
+    # record's own user. Unresolved users fall back to a Slack mention, or to
+    # the plain user id where mentions don't render, such as code blocks.
+    # Viewers can only clear their own records, so only those ids are shown.
+    formatter = get_datetime_formatter(
+        locale=user_info.locale, tz_offset=user_info.tz_offset
+    )
+    if users_info is None:
+        users_info = {user_info.id: user_info}
+    unknown_user_template = "<@{user_id}>" if mention_unknown_users else "{user_id}"
+    return [
+        AFKRecordToPrint(
+            text=afk_record.text,
+            real_name=(
+                users_info[afk_record.user_id].real_name
+                if afk_record.user_id in users_info
+                else unknown_user_template.format(user_id=afk_record.user_id)
+            ),
+            start_datetime=formatter.format(afk_record.start_datetime),
+            end_datetime=formatter.format(afk_record.end_datetime),
+            id=(
+                afk_record.id
+                if show_own_record_ids and afk_record.user_id == user_info.id
+                else None
             ),
-            afk_records,
         )
-    )
+        for afk_record in afk_records
+    ]
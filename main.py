@@ -1,40 +1,433 @@
-from datetime import UTC, datetime
-import json
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+from functools import cache
+import logging
 import os
+import socket
+import time
+from uuid import uuid4
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, responses
 from pydantic import ValidationError
-from slack_sdk.signature import SignatureVerifier
 from starlette import status
+from starlette.background import BackgroundTask
 import uvicorn
 
+from lib.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    EventLoopLagMonitor,
+    SlackRequestBody,
+    TokenBucketLimiter,
+)
+from lib.background import PeriodicTask
 from lib.command_handlers import (
     handle_clear_subcommand,
     handle_create_subcommand,
     handle_list_subcommand,
+    handle_next_page_action,
     handle_table_subcommand,
     send_slack_message,
 )
+from lib.interactions import (
+    InteractiveAction,
+    InteractiveActionRouter,
+    InteractiveRoute,
+)
+from lib.log import configure_logging
+from lib.metrics import PROMETHEUS_CONTENT_TYPE, metrics
+from lib.middleware import RequestContextMiddleware, SlackSignatureMiddleware
 from lib.models import (
     AFKRecord,
     SlackPayloadType,
     SlackPostRequestBody,
     SlashSubcommand,
+    UserInfo,
+)
+from lib.phrase_parser import CachedAFKParser
+from lib.services import (
+    ACTIVE_AFK_TOPIC,
+    AFK_EVENTS_TOPIC,
+    AFK_RECORDS_ARCHIVE_COLLECTION,
+    AFK_RECORDS_COLLECTION,
+    CACHE_INVALIDATIONS_COLLECTION,
+    LEASES_COLLECTION,
+    NEXT_PAGE_ACTION_ID,
+    SCHEDULER_STATE_COLLECTION,
+    SLACK_API_BASE_URL,
+    ActiveAFKReadModel,
+    AFKNotificationScheduler,
+    ArchiveMode,
+    DatabaseService,
+    DeferredResponseService,
+    HealthService,
+    InMemoryLease,
+    InMemorySchedulerCursorStore,
+    InMemoryStorageBackend,
+    InvalidationBus,
+    LeaderElection,
+    MongoConnection,
+    MongoLease,
+    MongoSchedulerCursorStore,
+    MongoStorageBackend,
+    RecordLifecycleService,
+    SlackService,
+    StorageBackend,
+    StorageBackendName,
+    to_response_url_payload,
 )
-from lib.services import DatabaseService, SlackService, afk_records_collection
+from lib.slash_commands import (
+    RECORD_ID_PATTERN,
+    USER_MENTION_PATTERN,
+    SlashCommand,
+    SlashCommandDispatcher,
+)
+from lib.startup import StartupReport
+from lib.tracing import span
 
 _ = load_dotenv()
 #! Reading .env file when app is hosted on render.com
 if os.path.exists(path="/etc/secrets/.env"):
     _ = load_dotenv("/etc/secrets/.env")
+configure_logging(level=os.environ.get("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
 
 server_started_at = datetime.now(tz=UTC)
-storage_service = DatabaseService(collection=afk_records_collection)
-slack_service = SlackService(token=os.environ["SLACK_BOT_TOKEN"])
+# Tells workers and replicas apart in leases and invalidation messages
+instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+record_retention = timedelta(
+    seconds=float(os.environ.get("AFK_RECORD_RETENTION_SECONDS", 7 * 24 * 60 * 60))
+)
+active_afk_read_model = (
+    ActiveAFKReadModel()
+    if os.environ.get("ENABLE_ACTIVE_AFK_CACHE", "true").lower() == "true"
+    else None
+)
+# `memory` keeps records in the process, for load tests and runs without MongoDB
+storage_backend_name = StorageBackendName(
+    os.environ.get("AFK_STORAGE_BACKEND", StorageBackendName.MONGO.value)
+)
+# Nothing connects at import, the client is built in lifespan or on first use
+mongo_connection = MongoConnection(
+    uri=(
+        os.environ["MONGODB_URI"]
+        if storage_backend_name == StorageBackendName.MONGO
+        else None
+    ),
+    max_pool_size=int(os.environ.get("MONGODB_MAX_POOL_SIZE", 100)),
+    min_pool_size=int(os.environ.get("MONGODB_MIN_POOL_SIZE", 0)),
+    server_selection_timeout_ms=int(
+        os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30_000)
+    ),
+    connect_timeout_ms=int(os.environ.get("MONGODB_CONNECT_TIMEOUT_MS", 20_000)),
+    socket_timeout_ms=int(os.environ.get("MONGODB_SOCKET_TIMEOUT_MS", 0)) or None,
+)
+
+
+@cache
+def get_invalidation_bus() -> InvalidationBus | None:
+    # In-memory storage lives in a single process, there is nobody to tell
+    if storage_backend_name != StorageBackendName.MONGO:
+        return None
+    return InvalidationBus(
+        collection=mongo_connection.get_collection(CACHE_INVALIDATIONS_COLLECTION),
+        origin=instance_id,
+        poll_interval_seconds=float(
+            os.environ.get("CACHE_INVALIDATION_POLL_INTERVAL_SECONDS", 1)
+        ),
+    )
+
+
+@cache
+def get_storage_service() -> DatabaseService:
+    backend: StorageBackend = (
+        MongoStorageBackend(
+            collection=mongo_connection.get_collection(AFK_RECORDS_COLLECTION)
+        )
+        if storage_backend_name == StorageBackendName.MONGO
+        else InMemoryStorageBackend()
+    )
+    return DatabaseService(
+        backend=backend,
+        retention=record_retention,
+        read_model=active_afk_read_model,
+        invalidation_bus=get_invalidation_bus(),
+    )
+
+
+@cache
+def get_record_lifecycle_service() -> RecordLifecycleService:
+    return RecordLifecycleService(
+        collection=mongo_connection.get_collection(AFK_RECORDS_COLLECTION),
+        retention=record_retention,
+        archive_mode=ArchiveMode(os.environ.get("AFK_RECORD_ARCHIVE", "collection")),
+        archive_collection=mongo_connection.get_collection(
+            AFK_RECORDS_ARCHIVE_COLLECTION
+        ),
+        archive_path=os.environ.get(
+            "AFK_RECORD_ARCHIVE_PATH", "afk_records_archive.jsonl.gz"
+        ),
+    )
+
+
+@cache
+def get_health_service() -> HealthService:
+    return HealthService(
+        client=(
+            mongo_connection.get_client()
+            if storage_backend_name == StorageBackendName.MONGO
+            else None
+        ),
+        pool_monitor=mongo_connection.pool_monitor,
+        slack_api_errors=slack_service.api_error_rate,
+        cache_seconds=float(os.environ.get("READINESS_CACHE_SECONDS", 5)),
+        max_slack_error_rate=float(
+            os.environ.get("READINESS_MAX_SLACK_ERROR_RATE", 0.5)
+        ),
+    )
+
+
+@cache
+def get_notification_scheduler() -> AFKNotificationScheduler | None:
+    if os.environ.get("ENABLE_AFK_NOTIFICATIONS", "false").lower() != "true":
+        return None
+    return AFKNotificationScheduler(
+        database_service=get_storage_service(),
+        slack_service=slack_service,
+        cursor_store=(
+            MongoSchedulerCursorStore(
+                collection=mongo_connection.get_collection(SCHEDULER_STATE_COLLECTION)
+            )
+            if storage_backend_name == StorageBackendName.MONGO
+            else InMemorySchedulerCursorStore()
+        ),
+        lookahead_seconds=float(
+            os.environ.get("AFK_NOTIFICATION_LOOKAHEAD_SECONDS", 15 * 60)
+        ),
+        max_delay_seconds=float(
+            os.environ.get("AFK_NOTIFICATION_MAX_DELAY_SECONDS", 15 * 60)
+        ),
+        invalidation_bus=get_invalidation_bus(),
+    )
+
+
+async def start_background_jobs() -> None:
+    if storage_backend_name == StorageBackendName.MONGO:
+        compaction_task.start()
+    notification_scheduler = get_notification_scheduler()
+    if notification_scheduler is not None:
+        notification_scheduler.start()
+
+
+async def stop_background_jobs() -> None:
+    await compaction_task.stop()
+    notification_scheduler = get_notification_scheduler()
+    if notification_scheduler is not None:
+        await notification_scheduler.stop()
+
+
+@cache
+def get_leader_election() -> LeaderElection:
+    # Jobs that must run once across all workers and replicas go to whichever
+    # instance holds the lease
+    lease_ttl_seconds = float(os.environ.get("LEADER_LEASE_TTL_SECONDS", 30))
+    return LeaderElection(
+        lease=(
+            MongoLease(
+                collection=mongo_connection.get_collection(LEASES_COLLECTION),
+                holder=instance_id,
+                ttl_seconds=lease_ttl_seconds,
+            )
+            if storage_backend_name == StorageBackendName.MONGO
+            else InMemoryLease()
+        ),
+        on_elected=start_background_jobs,
+        on_demoted=stop_background_jobs,
+        renew_interval_seconds=lease_ttl_seconds / 3,
+    )
+
+
+def close_mongo_connection() -> None:
+    mongo_connection.close()
+    # The cached services hold collections of the closed client
+    get_storage_service.cache_clear()
+    get_record_lifecycle_service.cache_clear()
+    get_health_service.cache_clear()
+    get_notification_scheduler.cache_clear()
+    get_invalidation_bus.cache_clear()
+    get_leader_election.cache_clear()
+
+
+compaction_task = PeriodicTask(
+    name="afk_records_compaction",
+    interval_seconds=float(
+        os.environ.get("AFK_RECORD_COMPACTION_INTERVAL_SECONDS", 60 * 60)
+    ),
+    func=lambda: get_record_lifecycle_service().compact(),
+)
+slack_service = SlackService(
+    token=os.environ["SLACK_BOT_TOKEN"],
+    api_base_url=os.environ.get("SLACK_API_BASE_URL", SLACK_API_BASE_URL),
+    user_info_cache_ttl_seconds=float(
+        os.environ.get("SLACK_USER_INFO_CACHE_TTL_SECONDS", 300)
+    ),
+    user_info_cache_max_size=int(
+        os.environ.get("SLACK_USER_INFO_CACHE_MAX_SIZE", 1024)
+    ),
+    user_info_cache_max_teams=int(
+        os.environ.get("SLACK_USER_INFO_CACHE_MAX_TEAMS", 100)
+    ),
+    message_coalesce_window_seconds=float(
+        os.environ.get("SLACK_MESSAGE_COALESCE_WINDOW_SECONDS", 0.25)
+    ),
+)
+user_list_sync_interval_seconds = float(
+    os.environ.get("SLACK_USER_LIST_SYNC_INTERVAL_SECONDS", 0)
+)
+user_list_sync_task = (
+    PeriodicTask(
+        name="slack_user_list_sync",
+        interval_seconds=user_list_sync_interval_seconds,
+        func=slack_service.sync_known_teams_users,
+    )
+    if user_list_sync_interval_seconds > 0
+    else None
+)
+# Built once so grammar setup isn't paid per request
+afk_parser = CachedAFKParser(
+    max_size=int(os.environ.get("AFK_PARSE_CACHE_MAX_SIZE", 1024))
+)
+deferred_response_service = (
+    DeferredResponseService(
+        worker_count=int(os.environ.get("DEFERRED_RESPONSE_WORKERS", 4)),
+        max_queue_size=int(os.environ.get("DEFERRED_RESPONSE_QUEUE_SIZE", 100)),
+    )
+    if os.environ.get("ENABLE_DEFERRED_RESPONSES", "false").lower() == "true"
+    else None
+)
+
+
+def get_rate_limiter(
+    prefix: str, rate: float, burst: float
+) -> TokenBucketLimiter | None:
+    # A rate of 0 turns the limit off
+    rate_per_second = float(os.environ.get(f"{prefix}_REQUESTS_PER_SECOND", rate))
+    if rate_per_second <= 0:
+        return None
+    return TokenBucketLimiter(
+        rate_per_second=rate_per_second,
+        burst=float(os.environ.get(f"{prefix}_BURST", burst)),
+    )
+
+
+# Limits are per process, with several workers each one enforces them alone
+max_event_loop_lag_seconds = float(
+    os.environ.get("LOAD_SHED_MAX_EVENT_LOOP_LAG_SECONDS", 1)
+)
+event_loop_lag_monitor = (
+    EventLoopLagMonitor() if max_event_loop_lag_seconds > 0 else None
+)
+admission_controller = AdmissionController(
+    team_limiter=get_rate_limiter("RATE_LIMIT_TEAM", rate=20, burst=100),
+    user_limiter=get_rate_limiter("RATE_LIMIT_USER", rate=1, burst=10),
+    lag_monitor=event_loop_lag_monitor,
+    max_event_loop_lag_seconds=max_event_loop_lag_seconds,
+    max_in_flight=int(os.environ.get("LOAD_SHED_MAX_IN_FLIGHT", 500)),
+)
+
+
+startup_report = StartupReport()
+# Interpreter start up to here, mostly imports
+startup_report.record_process_age("imports")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    uses_mongo = storage_backend_name == StorageBackendName.MONGO
+    if uses_mongo:
+        startup_report.record("mongo_connect", await mongo_connection.connect())
+    storage_service = get_storage_service()
+    invalidation_bus = get_invalidation_bus()
+    if uses_mongo:
+        record_lifecycle_service = get_record_lifecycle_service()
+        with startup_report.measure("mongo_indexes"):
+            _ = await storage_service.ensure_indexes()
+            _ = await record_lifecycle_service.ensure_indexes()
+            _ = await record_lifecycle_service.backfill_expiry()
+            if invalidation_bus is not None:
+                _ = await invalidation_bus.ensure_indexes()
+    notification_scheduler = get_notification_scheduler()
+    if invalidation_bus is not None:
+        if active_afk_read_model is not None:
+            invalidation_bus.subscribe(
+                ACTIVE_AFK_TOPIC, active_afk_read_model.apply_invalidation
+            )
+        if notification_scheduler is not None:
+            invalidation_bus.subscribe(
+                AFK_EVENTS_TOPIC, notification_scheduler.schedule_ids
+            )
+        invalidation_bus.start()
+    leader_election = get_leader_election()
+    leader_election.start()
+    if event_loop_lag_monitor is not None:
+        event_loop_lag_monitor.start()
+    # Warms this process's own cache, so every instance runs it
+    if user_list_sync_task is not None:
+        user_list_sync_task.start()
+    read_model_task = (
+        asyncio.create_task(
+            active_afk_read_model.follow(
+                collection=mongo_connection.get_collection(AFK_RECORDS_COLLECTION),
+                load_team=storage_service.read_active_from_db,
+                poll_interval_seconds=float(
+                    os.environ.get("ACTIVE_AFK_CACHE_POLL_INTERVAL_SECONDS", 30)
+                ),
+            )
+        )
+        # In-memory storage has no change stream, write-through keeps it fresh
+        if active_afk_read_model is not None and uses_mongo
+        else None
+    )
+    if deferred_response_service is not None:
+        await deferred_response_service.start()
+    startup_report.record_process_age("ready")
+    startup_report.log()
+    yield
+    if read_model_task is not None:
+        _ = read_model_task.cancel()
+    if invalidation_bus is not None:
+        await invalidation_bus.stop()
+    if event_loop_lag_monitor is not None:
+        await event_loop_lag_monitor.stop()
+    if user_list_sync_task is not None:
+        await user_list_sync_task.stop()
+    if deferred_response_service is not None:
+        await deferred_response_service.stop()
+    # Stops the leader's jobs and hands the lease over, before the Slack client
+    # closes so queued notifications are flushed
+    await leader_election.stop()
+    await slack_service.aclose()
+    close_mongo_connection()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Added first so it runs inside the signature check and only counts real requests
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission_controller,
+    paths=("/v1/slack_bot", "/v1/interactive_message"),
+)
+app.add_middleware(
+    SlackSignatureMiddleware,
+    signing_secret=os.environ["SLACK_SIGNING_SECRET"],
+    paths=("/v1/slack_bot", "/v1/interactive_message"),
+    max_age_seconds=float(os.environ.get("SLACK_SIGNATURE_MAX_AGE_SECONDS", 5 * 60)),
+)
+# Added last so it wraps signature checks, rejected requests get an id too
+app.add_middleware(RequestContextMiddleware)
 
 
 @app.get("/")
@@ -43,6 +436,7 @@ def read_root():
 
 
 @app.get("/health-check")
+@app.get("/health-check/live")
 def read_health():
     return {
         "server_started_at": server_started_at,
@@ -50,93 +444,205 @@ def read_health():
     }
 
 
-@app.post("/v1/slack_bot")
-async def handle_slack_bot_input(request: Request):
-    raw_body = await request.body()
+@app.get("/health-check/ready")
+async def read_readiness():
+    report = await get_health_service().get_readiness()
+    return responses.JSONResponse(
+        content=report.model_dump(mode="json"),
+        status_code=(
+            status.HTTP_200_OK if report.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
+@app.get("/metrics")
+def read_metrics():
+    return responses.PlainTextResponse(
+        metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE
+    )
 
-    # TODO: enable this before commit
-    # is_valid_request = SignatureVerifier(os.environ["SLACK_SIGNING_SECRET"]).is_valid_request(
-    #     body=raw_body, headers=dict(request.headers)
-    # )
-    # if not is_valid_request:
-    #     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    form_data = await request.form()
+@app.post("/v1/slack_bot")
+async def handle_slack_bot_input(request: Request):
+    received_at = time.perf_counter()
+    # AdmissionMiddleware has already read and parsed the body
+    slack_body: SlackRequestBody | None = request.state.slack_body
+    if slack_body is None:
+        # TODO: send a slack message saying the request is malformed
+        logger.warning("Malformed slash command", extra={"error": "Body is not UTF-8"})
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
     try:
-        slack_post_request_body = SlackPostRequestBody.model_validate(
-            {k: v for k, v in form_data.items()}
-        )
+        with span("body_parse"):
+            slack_post_request_body = SlackPostRequestBody.model_validate(
+                slack_body.form
+            )
     except ValidationError as e:
-        # TODO: send a slack message saying the request is malformed
-        print(f"Error: {e}")  # TODO: replace with logger
-        print(f"Form data: {form_data}")  # TODO: replace with logger
+        # Validation errors echo their input, which includes Slack's token
+        logger.warning(
+            "Malformed slash command",
+            extra={"error": e.errors(include_input=False, include_url=False)},
+        )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    user_info = await slack_service.get_user_info(
-        user_id=slack_post_request_body.user_id
-    )
+    # Ack straight away and finish the work in the background, Slack only waits
+    # 3 seconds for the slash command response
+    if deferred_response_service is not None and deferred_response_service.submit(
+        response_url=slack_post_request_body.response_url,
+        handler=lambda: process_slash_command(slack_post_request_body),
+        received_at=received_at,
+    ):
+        return responses.Response(status_code=status.HTTP_200_OK)
+    return await process_slash_command(slack_post_request_body)
+
+
+async def process_slash_command(slack_post_request_body: SlackPostRequestBody):
+    with span("user_lookup"):
+        user_info = await slack_service.get_user_info(
+            user_id=slack_post_request_body.user_id,
+            team_id=slack_post_request_body.team_id,
+        )
     if user_info is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return await slash_commands.dispatch(
+        slack_post_request_body=slack_post_request_body, user_info=user_info
+    )
 
-    if slack_post_request_body.text.strip().lower() == SlashSubcommand.LIST.value:
-        return await handle_list_subcommand(
-            service=storage_service, user_info=user_info
-        )
-    if slack_post_request_body.text.strip().lower() == SlashSubcommand.TABLE.value:
-        return await handle_table_subcommand(
-            service=storage_service, user_info=user_info
-        )
-    if slack_post_request_body.text.strip().lower() == SlashSubcommand.CLEAR.value:
-        return await handle_clear_subcommand(
-            service=storage_service, user_info=user_info
-        )
+
+slash_commands = SlashCommandDispatcher()
+
+
+@slash_commands.register(SlashSubcommand.LIST, argument_pattern=USER_MENTION_PATTERN)
+async def dispatch_list_subcommand(command: SlashCommand):
+    return await handle_list_subcommand(
+        service=get_storage_service(),
+        slack_service=slack_service,
+        user_info=command.user_info,
+        user_id=command.arguments.get("user_id"),
+    )
+
+
+@slash_commands.register(SlashSubcommand.TABLE)
+async def dispatch_table_subcommand(command: SlashCommand):
+    return await handle_table_subcommand(
+        service=get_storage_service(),
+        slack_service=slack_service,
+        user_info=command.user_info,
+    )
+
+
+@slash_commands.register(SlashSubcommand.CLEAR, argument_pattern=RECORD_ID_PATTERN)
+async def dispatch_clear_subcommand(command: SlashCommand):
+    return await handle_clear_subcommand(
+        service=get_storage_service(),
+        user_info=command.user_info,
+        record_id=command.arguments.get("record_id"),
+    )
+
+
+@slash_commands.register_default
+async def dispatch_create_subcommand(command: SlashCommand):
     return await handle_create_subcommand(
-        slack_post_request_body=slack_post_request_body,
-        database_service=storage_service,
+        slack_post_request_body=command.body,
+        database_service=get_storage_service(),
         slack_service=slack_service,
-        user_info=user_info,
+        user_info=command.user_info,
+        afk_parser=afk_parser,
+        notification_scheduler=get_notification_scheduler(),
     )
 
 
 @app.post("/v1/interactive_message")
 async def handle_interactive_message(request: Request):
-    form_data = await request.form()
-    payload_value = form_data.get("payload")
-    if not isinstance(payload_value, str):
+    # AdmissionMiddleware has already read and parsed the body
+    slack_body: SlackRequestBody | None = request.state.slack_body
+    payload = slack_body.payload if slack_body is not None else None
+    if payload is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    payload = json.loads(payload_value)
-    print(f"Payload: {json.dumps(payload, indent=2)}")  # TODO: replace with logger
-    if not payload:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    route = interactive_actions.resolve(payload)
+    if route is None:
+        # Acknowledge anyway, Slack retries and warns the user otherwise
+        return responses.Response(status_code=status.HTTP_200_OK)
+    if payload.get("type") == SlackPayloadType.VIEW_SUBMISSION.value:
+        # Slack reads response_action from the body of the acknowledgement
+        result = await route.handler(route.interaction)
+        return result or responses.Response(status_code=status.HTTP_200_OK)
+    # Block actions are acknowledged before the work is done, any reply goes
+    # through response_url
+    return responses.Response(
+        status_code=status.HTTP_200_OK,
+        background=BackgroundTask(run_interactive_action, route),
+    )
 
-    if next(
-        (
-            action.get("action_id", "") == "submit_button"
-            for action in payload.get("actions", [])
-        ),
-        "",
-    ):
-        payload_type: str = payload.get("type", "")
-        if payload_type == SlackPayloadType.BLOCK_ACTIONS.value:
-            afk_record = AFKRecord.from_interactive_request_body(payload=payload)
-            user_info = await slack_service.get_user_info(user_id=afk_record.user_id)
-            if user_info is None:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-            return await send_slack_message(
-                afk_record=afk_record,
-                database_service=storage_service,
-                slack_service=slack_service,
-                user_info=user_info,
+
+async def run_interactive_action(route: InteractiveRoute) -> None:
+    try:
+        result = await route.handler(route.interaction)
+        response_url = route.interaction.payload.get("response_url")
+        response_url_payload = to_response_url_payload(result)
+        if response_url and response_url_payload is not None:
+            _ = await slack_service.post_to_response_url(
+                response_url=response_url, payload=response_url_payload
             )
+    except Exception:
+        logger.exception("Interactive action failed")
+
+
+interactive_actions = InteractiveActionRouter(
+    log_sample_rate=float(os.environ.get("INTERACTIVE_PAYLOAD_LOG_SAMPLE_RATE", 0))
+)
+
+
+async def get_interaction_user_info(interaction: InteractiveAction) -> UserInfo:
+    with span("user_lookup"):
+        user_info = await slack_service.get_user_info(
+            user_id=interaction.payload["user"]["id"],
+            team_id=interaction.payload["team"]["id"],
+        )
+    if user_info is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return user_info
+
+
+@interactive_actions.action(action_id=NEXT_PAGE_ACTION_ID)
+async def dispatch_next_page_action(interaction: InteractiveAction):
+    result = await handle_next_page_action(
+        service=get_storage_service(),
+        slack_service=slack_service,
+        user_info=await get_interaction_user_info(interaction),
+        value=(interaction.action or {})["value"],
+    )
+    # An error reply sets replace_original itself, leaving the page in place
+    return {"replace_original": True, **(to_response_url_payload(result) or {})}
+
+
+@interactive_actions.action(action_id="submit_button")
+async def dispatch_submit_action(interaction: InteractiveAction):
+    afk_record = AFKRecord.from_interactive_request_body(payload=interaction.payload)
+    return await send_slack_message(
+        afk_record=afk_record,
+        database_service=get_storage_service(),
+        slack_service=slack_service,
+        user_info=await get_interaction_user_info(interaction),
+        notification_scheduler=get_notification_scheduler(),
+    )
 
 
 if __name__ == "__main__":
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1 and storage_backend_name == StorageBackendName.MEMORY:
+        raise SystemExit(
+            "AFK_STORAGE_BACKEND=memory keeps records in one process, set WEB_CONCURRENCY=1"
+        )
     uvicorn.run(
         app="main:app",
         host="0.0.0.0",
         port=int(os.environ.get("PORT", 8000)),
+        # Each worker imports main on its own, with its own caches and clients
+        workers=workers,
         reload=os.environ.get("ENABLE_HOT_RELOAD", "false").lower() == "true",
         reload_dirs=["."],
         server_header=False,
+        # Logging is configured by configure_logging, keep uvicorn's logs in JSON
+        log_config=None,
     )
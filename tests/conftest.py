@@ -0,0 +1,56 @@
+from collections.abc import Callable
+from datetime import UTC, datetime
+import os
+import sys
+from typing import Any
+from uuid import uuid4
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from lib.models import AFKRecord, AFKStatus
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture(scope="function")
+def make_afk_record() -> Callable[..., AFKRecord]:
+    # An active record ending at `end_datetime`, an hour long unless a start
+    # is given. Any other field can be overridden by keyword.
+    def make(end_datetime: float, **fields: Any) -> AFKRecord:
+        return AFKRecord(
+            **{
+                "id": str(uuid4()),
+                "created": datetime.now(tz=UTC).timestamp(),
+                "team_id": "team_id_0",
+                "channel_id": "channel_id_0",
+                "user_id": "user_id_0",
+                "command": "command_0",
+                "text": "text_0",
+                "trigger_id": str(uuid4()),
+                "start_datetime": end_datetime - 60 * 60,
+                "end_datetime": end_datetime,
+                "status": AFKStatus.ACTIVE.value,
+                **fields,
+            }
+        )
+
+    return make
+
+
+@pytest.fixture(scope="function")
+def placeholder_afk_record(make_afk_record: Callable[..., AFKRecord]) -> AFKRecord:
+    now = datetime.now(tz=UTC).timestamp()
+    return make_afk_record(now, start_datetime=now, trigger_id="trigger_id_0")
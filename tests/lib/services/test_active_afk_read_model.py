@@ -0,0 +1,160 @@
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.models import AFKDisplayRow, AFKRecord
+from lib.services import ActiveAFKReadModel
+
+
+def to_rows(records: list[AFKRecord]) -> list[AFKDisplayRow]:
+    return [AFKDisplayRow.from_record(record) for record in records]
+
+
+def test_get_active__misses_until_team_is_loaded(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    read_model = ActiveAFKReadModel()
+    now = datetime.now(tz=UTC)
+    record = make_afk_record((now + timedelta(hours=1)).timestamp())
+
+    # Act
+    before_load = read_model.get_active("team_id_0", now.timestamp())
+    read_model.load(
+        "team_id_0", to_rows([record]), version=read_model.get_version("team_id_0")
+    )
+    after_load = read_model.get_active("team_id_0", now.timestamp())
+
+    # Assert
+    assert before_load is None
+    assert after_load == to_rows([record])
+
+
+def test_get_active__evicts_expired_records(make_afk_record: Callable[..., AFKRecord]):
+    # Arrange
+    read_model = ActiveAFKReadModel()
+    now = datetime.now(tz=UTC)
+    records = [
+        make_afk_record((now + timedelta(hours=1)).timestamp()),
+        make_afk_record((now + timedelta(hours=2)).timestamp()),
+    ]
+    read_model.load("team_id_0", to_rows(records), version=0)
+
+    # Act
+    result = read_model.get_active(
+        "team_id_0", (now + timedelta(hours=1, minutes=1)).timestamp()
+    )
+
+    # Assert
+    assert result == to_rows(records[1:])
+
+
+def test_apply_write__keeps_records_ordered_by_end_datetime(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    read_model = ActiveAFKReadModel()
+    now = datetime.now(tz=UTC)
+    later_record = make_afk_record((now + timedelta(hours=2)).timestamp())
+    sooner_record = make_afk_record((now + timedelta(hours=1)).timestamp())
+    read_model.load("team_id_0", to_rows([later_record]), version=0)
+
+    # Act
+    read_model.apply_write([sooner_record])
+
+    # Assert
+    assert read_model.get_active("team_id_0", now.timestamp()) == to_rows(
+        [sooner_record, later_record]
+    )
+
+
+def test_apply_clear__removes_matching_records(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    read_model = ActiveAFKReadModel()
+    now = datetime.now(tz=UTC)
+    records = [
+        make_afk_record((now + timedelta(hours=1)).timestamp(), user_id="user_id_1"),
+        make_afk_record((now + timedelta(hours=2)).timestamp(), user_id="user_id_2"),
+    ]
+    read_model.load("team_id_0", to_rows(records), version=0)
+
+    # Act
+    read_model.apply_clear({"team_id": ["team_id_0"], "user_id": ["user_id_1"]})
+
+    # Assert
+    assert read_model.get_active("team_id_0", now.timestamp()) == to_rows(records[1:])
+
+
+def test_load__ignores_snapshot_older_than_a_write(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    read_model = ActiveAFKReadModel()
+    now = datetime.now(tz=UTC)
+    version = read_model.get_version("team_id_0")
+    read_model.apply_write([make_afk_record((now + timedelta(hours=1)).timestamp())])
+
+    # Act
+    read_model.load("team_id_0", [], version=version)
+
+    # Assert
+    assert read_model.get_active("team_id_0", now.timestamp()) is None
+
+
+def test_apply_change__invalidates_once_per_burst_of_deletes(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    read_model = ActiveAFKReadModel()
+    now = datetime.now(tz=UTC)
+    records = [make_afk_record((now + timedelta(hours=1)).timestamp())]
+    read_model.load("team_id_0", to_rows(records), version=0)
+
+    # Act
+    for _ in range(3):
+        read_model.apply_change({"operationType": "delete", "documentKey": {}})
+    during_burst = read_model.get_active("team_id_0", now.timestamp())
+    read_model.apply_pending_delete()
+
+    # Assert
+    assert during_burst == to_rows(records)
+    assert read_model.get_active("team_id_0", now.timestamp()) is None
+    assert not read_model.pending_delete
+
+
+def test_load__forgets_versions_of_evicted_teams(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    read_model = ActiveAFKReadModel(max_teams=1)
+    now = datetime.now(tz=UTC)
+    stale_version = read_model.get_version("team_id_0")
+    read_model.apply_write([make_afk_record((now + timedelta(hours=1)).timestamp())])
+    read_model.load("team_id_0", [], version=read_model.get_version("team_id_0"))
+
+    # Act
+    read_model.load("team_id_1", [], version=read_model.get_version("team_id_1"))
+    read_model.load("team_id_0", [], version=stale_version)
+
+    # Assert
+    assert "team_id_0" not in read_model.versions
+    assert read_model.get_active("team_id_0", now.timestamp()) is None
+
+
+def test_invalidate__bounds_versions_of_unloaded_teams():
+    # Arrange
+    read_model = ActiveAFKReadModel(max_teams=2)
+    version = read_model.get_version("team_id_0")
+
+    # Act
+    for i in range(10):
+        read_model.invalidate(f"team_id_{i}")
+
+    # Assert
+    assert len(read_model.versions) <= 4
+    assert read_model.get_version("team_id_0") != version
@@ -1,47 +1,44 @@
 from datetime import UTC, datetime, timedelta
 import os
 import sys
+from typing import Any
 from uuid import uuid4
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 import pytest
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
 
-from lib.models import AFKRecord, AFKRecord_VERSION, AFKStatus
-from lib.services import DatabaseService, WriteMode
+from lib.models import AFKDisplayRow, AFKRecord, AFKStatus
+from lib.services import (
+    UNIQUE_TRIGGER_ID_FIELD,
+    ActiveAFKReadModel,
+    DatabaseService,
+    InMemoryStorageBackend,
+    MongoStorageBackend,
+    WriteMode,
+)
 
 
-@pytest.fixture(scope="function", autouse=True)
-async def db_service():
+@pytest.fixture(scope="function", autouse=True, params=["mongo", "memory"])
+async def db_service(request: pytest.FixtureRequest):
+    if request.param == "memory":
+        yield DatabaseService(backend=InMemoryStorageBackend())
+        return
+    if "MONGODB_URI" not in os.environ:
+        pytest.skip("MONGODB_URI is not set")
     client = AsyncIOMotorClient(os.environ["MONGODB_URI"])
     db = client.afk_slackbot
     collection = db.afk_records
 
-    service = DatabaseService(collection=collection)
+    service = DatabaseService(backend=MongoStorageBackend(collection=collection))
     yield service
     _ = await collection.delete_many({})
+    _ = await collection.drop_indexes()
     client.close()
 
 
-@pytest.fixture(scope="function")
-def placeholder_afk_record():
-    return AFKRecord(
-        id=str(uuid4()),
-        created=datetime.now(tz=UTC).timestamp(),
-        version=AFKRecord_VERSION,
-        team_id="team_id_0",
-        channel_id="channel_id_0",
-        user_id="user_id_0",
-        command="command_0",
-        text="text_0",
-        trigger_id="trigger_id_0",
-        start_datetime=datetime.now(tz=UTC).timestamp(),
-        end_datetime=datetime.now(tz=UTC).timestamp(),
-        status=AFKStatus.ACTIVE.value,
-    )
-
-
 @pytest.mark.asyncio
 async def test_read__with_no_filters(db_service: DatabaseService):
     result = await db_service.read({})
@@ -56,11 +53,13 @@ async def test_read__with_end_datetime_filter(
     now = datetime.now(tz=UTC)
     afk_records = [
         AFKRecord(
-            **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
             end_datetime=(now - timedelta(hours=1)).timestamp(),
         ),
         AFKRecord(
-            **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
             end_datetime=(now + timedelta(hours=1)).timestamp(),
         ),
     ]
@@ -82,17 +81,20 @@ async def test_write__with_default_mode(
     now = datetime.now(tz=UTC)
     existing_afk_records = [
         AFKRecord(
-            **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
             end_datetime=(now + timedelta(hours=1)).timestamp(),
         ),
         AFKRecord(
-            **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
             end_datetime=(now + timedelta(hours=2)).timestamp(),
         ),
     ]
     _ = await db_service.write(existing_afk_records)
     new_afk_record = AFKRecord(
-        **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+        **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+        id=str(uuid4()),
         end_datetime=(now + timedelta(hours=3)).timestamp(),
     )
     expected_afk_records = existing_afk_records + [new_afk_record]
@@ -113,17 +115,20 @@ async def test_write__with_overwrite_mode(
     now = datetime.now(tz=UTC)
     existing_afk_records = [
         AFKRecord(
-            **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
             end_datetime=(now + timedelta(hours=1)).timestamp(),
         ),
         AFKRecord(
-            **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
             end_datetime=(now + timedelta(hours=2)).timestamp(),
         ),
     ]
     _ = await db_service.write(existing_afk_records)
     new_afk_record = AFKRecord(
-        **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+        **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+        id=str(uuid4()),
         end_datetime=(now + timedelta(hours=3)).timestamp(),
     )
     expected_afk_records = [new_afk_record]
@@ -136,6 +141,158 @@ async def test_write__with_overwrite_mode(
     assert result == expected_afk_records
 
 
+@pytest.mark.asyncio
+async def test_write__with_overwrite_mode_keeps_records_out_of_scope(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    now = datetime.now(tz=UTC)
+    other_team_afk_record = AFKRecord(
+        **placeholder_afk_record.model_dump(exclude={"id", "team_id"}),
+        id=str(uuid4()),
+        team_id="team_id_1",
+    )
+    _ = await db_service.write([placeholder_afk_record, other_team_afk_record])
+    new_afk_record = AFKRecord(
+        **placeholder_afk_record.model_dump(exclude={"id"}), id=str(uuid4())
+    )
+
+    # Act
+    write_result = await db_service.write([new_afk_record], mode=WriteMode.OVERWRITE)
+    result = await db_service.read(
+        {"end_datetime": now - timedelta(hours=1), "status": [AFKStatus.ACTIVE]}
+    )
+
+    # Assert
+    assert write_result.inserted_ids == [new_afk_record.id]
+    assert write_result.deleted_count == 1
+    assert sorted(r.id for r in result) == sorted(
+        [other_team_afk_record.id, new_afk_record.id]
+    )
+
+
+@pytest.mark.asyncio
+async def test_write__with_create_mode_skips_repeated_trigger_id(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    retried_afk_record = AFKRecord(
+        **placeholder_afk_record.model_dump(exclude={"id"}), id=str(uuid4())
+    )
+    _ = await db_service.write([placeholder_afk_record], mode=WriteMode.CREATE)
+
+    # Act
+    write_result = await db_service.write([retried_afk_record], mode=WriteMode.CREATE)
+    result = await db_service.read({})
+
+    # Assert
+    assert write_result.inserted_ids == []
+    assert result == [placeholder_afk_record]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("db_service", ["mongo"], indirect=True)
+async def test_write__with_create_mode_treats_duplicate_trigger_id_as_created(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    backend = db_service.backend
+    assert isinstance(backend, MongoStorageBackend)
+    _ = await db_service.ensure_indexes()
+    retried_afk_record = AFKRecord(
+        **placeholder_afk_record.model_dump(exclude={"id"}), id=str(uuid4())
+    )
+    # A concurrent retry's upsert that didn't see the first insert, as if both
+    # had run their filter before either inserted
+    documents = [
+        {**db_service.to_document(record), UNIQUE_TRIGGER_ID_FIELD: True}
+        for record in (placeholder_afk_record, retried_afk_record)
+    ]
+    operations = [
+        UpdateOne(
+            filter={"id": document["id"]},
+            update={"$setOnInsert": document},
+            upsert=True,
+        )
+        for document in documents
+    ]
+
+    # Act
+    write_result = await backend.bulk_write(
+        operations, documents=documents, ignore_duplicates=True
+    )
+    result = await db_service.read({})
+
+    # Assert
+    assert write_result.inserted_ids == [placeholder_afk_record.id]
+    assert result == [placeholder_afk_record]
+
+
+@pytest.mark.asyncio
+async def test_update__replaces_records_by_id(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    afk_records = [
+        AFKRecord(
+            **placeholder_afk_record.model_dump(exclude={"id", "text"}),
+            id=str(uuid4()),
+            text=f"text_{i}",
+        )
+        for i in range(3)
+    ]
+    _ = await db_service.write(afk_records)
+    updated_afk_records = [
+        AFKRecord(**afk_record.model_dump(exclude={"text"}), text="updated")
+        for afk_record in afk_records[:2]
+    ]
+
+    # Act
+    modified_count = await db_service.update(updated_afk_records)
+    result = await db_service.read({})
+
+    # Assert
+    assert modified_count == 2
+    assert {r.id: r.text for r in result} == {
+        afk_records[0].id: "updated",
+        afk_records[1].id: "updated",
+        afk_records[2].id: "text_2",
+    }
+
+
+@pytest.mark.asyncio
+async def test_update__without_upsert_keeps_missing_records_out_of_read_model(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    db_service.read_model = ActiveAFKReadModel()
+    end_datetime = (datetime.now(tz=UTC) + timedelta(hours=1)).timestamp()
+    afk_record = AFKRecord(
+        **placeholder_afk_record.model_dump(exclude={"end_datetime"}),
+        end_datetime=end_datetime,
+    )
+    _ = await db_service.write([afk_record])
+    _ = await db_service.read_active(team_id=afk_record.team_id)
+    missing_afk_record = AFKRecord(
+        **afk_record.model_dump(exclude={"id", "trigger_id"}),
+        id=str(uuid4()),
+        trigger_id="trigger_id_1",
+    )
+
+    # Act
+    modified_count = await db_service.update(
+        [
+            AFKRecord(**afk_record.model_dump(exclude={"text"}), text="updated"),
+            missing_afk_record,
+        ]
+    )
+    result = await db_service.read_active(team_id=afk_record.team_id)
+
+    # Assert
+    assert modified_count == 1
+    assert [(r.id, r.text) for r in result] == [(afk_record.id, "updated")]
+
+
 @pytest.mark.asyncio
 async def test_clear_afk_status(
     db_service: DatabaseService, placeholder_afk_record: AFKRecord
@@ -145,16 +302,18 @@ async def test_clear_afk_status(
     existing_afk_records = [
         AFKRecord(
             **placeholder_afk_record.model_dump(
-                exclude={"team_id", "user_id", "status"}
+                exclude={"id", "team_id", "user_id", "status"}
             ),
+            id=str(uuid4()),
             team_id="team_id_1",
             user_id=user_id,
             status=AFKStatus.ACTIVE.value,
         ),
         AFKRecord(
             **placeholder_afk_record.model_dump(
-                exclude={"team_id", "user_id", "status"}
+                exclude={"id", "team_id", "user_id", "status"}
             ),
+            id=str(uuid4()),
             team_id="team_id_2",
             user_id=user_id,
             status=AFKStatus.ACTIVE.value,
@@ -181,3 +340,131 @@ async def test_clear_afk_status(
 
     # Assert
     assert result == expected_afk_records
+
+
+@pytest.mark.asyncio
+async def test_read_for_display__returns_display_fields_only(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    now = datetime.now(tz=UTC)
+    afk_record = AFKRecord(
+        **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+        id=str(uuid4()),
+        end_datetime=(now + timedelta(hours=1)).timestamp(),
+    )
+    _ = await db_service.write([afk_record])
+
+    # Act
+    result = await db_service.read_for_display(
+        {"end_datetime": now, "status": [AFKStatus.ACTIVE]}
+    )
+
+    # Assert
+    assert result == [AFKDisplayRow.from_record(afk_record)]
+    assert not hasattr(result[0], "trigger_id")
+
+
+@pytest.mark.asyncio
+async def test_read_active_page__filters_by_user_id(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    end_datetime = (datetime.now(tz=UTC) + timedelta(hours=1)).timestamp()
+    afk_records = [
+        AFKRecord(
+            **placeholder_afk_record.model_dump(
+                exclude={"id", "end_datetime", "user_id"}
+            ),
+            id=str(uuid4()),
+            end_datetime=end_datetime + i,
+            user_id=f"user_id_{i % 2}",
+        )
+        for i in range(5)
+    ]
+    _ = await db_service.write(afk_records)
+
+    # Act
+    records, has_more = await db_service.read_active_page(
+        team_id="team_id_0", offset=1, limit=1, user_id="user_id_1"
+    )
+
+    # Assert
+    assert [r.id for r in records] == [afk_records[3].id]
+    assert has_more is False
+
+
+@pytest.mark.asyncio
+async def test_read_active_page__reports_a_next_page(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    end_datetime = (datetime.now(tz=UTC) + timedelta(hours=1)).timestamp()
+    afk_records = [
+        AFKRecord(
+            **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+            id=str(uuid4()),
+            end_datetime=end_datetime + i,
+        )
+        for i in range(5)
+    ]
+    _ = await db_service.write(afk_records)
+
+    # Act
+    first_page = await db_service.read_active_page(
+        team_id="team_id_0", offset=0, limit=2
+    )
+    last_page = await db_service.read_active_page(
+        team_id="team_id_0", offset=4, limit=2
+    )
+
+    # Assert
+    assert [r.id for r in first_page[0]] == [r.id for r in afk_records[:2]]
+    assert first_page[1] is True
+    assert [r.id for r in last_page[0]] == [afk_records[4].id]
+    assert last_page[1] is False
+
+
+def collect_plan_stages(plan: Any) -> list[tuple[str, str | None]]:
+    if isinstance(plan, list):
+        return [stage for p in plan for stage in collect_plan_stages(p)]
+    if not isinstance(plan, dict):
+        return []
+    stages = [(plan["stage"], plan.get("indexName"))] if "stage" in plan else []
+    return stages + [
+        stage for value in plan.values() for stage in collect_plan_stages(value)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("db_service", ["mongo"], indirect=True)
+async def test_read__uses_compound_index_for_active_records(
+    db_service: DatabaseService, placeholder_afk_record: AFKRecord
+):
+    # Arrange
+    now = datetime.now(tz=UTC)
+    _ = await db_service.ensure_indexes()
+    _ = await db_service.write(
+        [
+            AFKRecord(
+                **placeholder_afk_record.model_dump(exclude={"id", "end_datetime"}),
+                id=str(uuid4()),
+                end_datetime=(now + timedelta(hours=hours)).timestamp(),
+            )
+            for hours in (2, 1)
+        ]
+    )
+
+    # Act
+    explanation = await db_service.explain(
+        {"end_datetime": now, "status": [AFKStatus.ACTIVE], "team_id": ["team_id_0"]}
+    )
+    result = await db_service.read(
+        {"end_datetime": now, "status": [AFKStatus.ACTIVE], "team_id": ["team_id_0"]}
+    )
+
+    # Assert
+    stages = collect_plan_stages(explanation["queryPlanner"]["winningPlan"])
+    assert ("IXSCAN", "team_id_status_end_datetime") in stages
+    assert all(stage != "SORT" for stage, _ in stages)
+    assert [r.end_datetime for r in result] == sorted(r.end_datetime for r in result)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.services import DeferredResponseService
+
+
+@pytest.fixture(scope="function")
+async def deferred_response_service():
+    service = DeferredResponseService(
+        worker_count=1, max_queue_size=1, retry_backoff_seconds=0
+    )
+    yield service
+    await service.http_client.aclose()
+
+
+def mock_transport(statuses: list[int], received: list[dict[str, object]]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(json.loads(request.content))
+        return httpx.Response(status_code=statuses.pop(0))
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_deliver__retries_until_success(
+    deferred_response_service: DeferredResponseService,
+):
+    # Arrange
+    received: list[dict[str, object]] = []
+    deferred_response_service.http_client = httpx.AsyncClient(
+        transport=mock_transport([500, 429, 200], received)
+    )
+
+    # Act
+    result = await deferred_response_service.deliver(
+        "https://hooks.slack.test/response", {"text": "hello"}
+    )
+
+    # Assert
+    assert result is True
+    assert received == [{"text": "hello"}] * 3
+
+
+@pytest.mark.asyncio
+async def test_deliver__gives_up_on_client_error(
+    deferred_response_service: DeferredResponseService,
+):
+    # Arrange
+    received: list[dict[str, object]] = []
+    deferred_response_service.http_client = httpx.AsyncClient(
+        transport=mock_transport([404], received)
+    )
+
+    # Act
+    result = await deferred_response_service.deliver(
+        "https://hooks.slack.test/response", {"text": "hello"}
+    )
+
+    # Assert
+    assert result is False
+    assert len(received) == 1
+
+
+@pytest.mark.asyncio
+async def test_submit__rejects_when_queue_is_full(
+    deferred_response_service: DeferredResponseService,
+):
+    # Arrange
+    async def handler():
+        return {"text": "done"}
+
+    # Act
+    first = deferred_response_service.submit(
+        response_url="https://hooks.slack.test/response",
+        handler=handler,
+        received_at=time.perf_counter(),
+    )
+    second = deferred_response_service.submit(
+        response_url="https://hooks.slack.test/response",
+        handler=handler,
+        received_at=time.perf_counter(),
+    )
+
+    # Assert
+    assert (first, second) == (True, False)
+
+
+@pytest.mark.asyncio
+async def test_worker__delivers_handler_result(
+    deferred_response_service: DeferredResponseService,
+):
+    # Arrange
+    received: list[dict[str, object]] = []
+    deferred_response_service.http_client = httpx.AsyncClient(
+        transport=mock_transport([200], received)
+    )
+
+    async def handler():
+        await asyncio.sleep(0)
+        return {"text": "done"}
+
+    await deferred_response_service.start()
+
+    # Act
+    _ = deferred_response_service.submit(
+        response_url="https://hooks.slack.test/response",
+        handler=handler,
+        received_at=time.perf_counter(),
+    )
+    await deferred_response_service.stop()
+
+    # Assert
+    assert received == [{"text": "done"}]
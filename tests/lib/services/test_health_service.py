@@ -0,0 +1,144 @@
+import asyncio
+import os
+import sys
+from typing import Any
+
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    PoolCreatedEvent,
+)
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.metrics import ErrorRateWindow
+from lib.services import ConnectionPoolMonitor, HealthService
+
+
+class FakeAdminDatabase:
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.pings = 0
+
+    async def command(self, name: str) -> dict[str, Any]:
+        self.pings += 1
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("no primary")
+        return {"ok": 1}
+
+
+class FakeClient:
+    def __init__(self, fail: bool = False):
+        self.admin = FakeAdminDatabase(fail=fail)
+
+    def get_database(self, name: str) -> FakeAdminDatabase:
+        assert name == "admin"
+        return self.admin
+
+
+def get_health_service(
+    client: FakeClient | None,
+    pool_monitor: ConnectionPoolMonitor | None = None,
+    slack_api_errors: ErrorRateWindow | None = None,
+) -> HealthService:
+    return HealthService(
+        client=client,
+        pool_monitor=pool_monitor or ConnectionPoolMonitor(),
+        slack_api_errors=slack_api_errors or ErrorRateWindow(),
+        max_slack_error_rate=0.5,
+        min_slack_calls=4,
+    )
+
+
+def test_get_utilization__reports_busiest_pool():
+    # Arrange
+    pool_monitor = ConnectionPoolMonitor()
+    primary, secondary = ("db-0", 27017), ("db-1", 27017)
+    pool_monitor.pool_created(PoolCreatedEvent(primary, {"maxPoolSize": 10}))
+    pool_monitor.pool_created(PoolCreatedEvent(secondary, {"maxPoolSize": 10}))
+    for connection_id in range(3):
+        pool_monitor.connection_checked_out(
+            ConnectionCheckedOutEvent(primary, connection_id, duration=0.0)
+        )
+    pool_monitor.connection_checked_in(ConnectionCheckedInEvent(primary, 0))
+    pool_monitor.connection_checked_out(
+        ConnectionCheckedOutEvent(secondary, 0, duration=0.0)
+    )
+
+    # Act
+    utilization, in_use, max_pool_size = pool_monitor.get_utilization()
+
+    # Assert
+    assert utilization == 0.2
+    assert in_use == 3
+    assert max_pool_size == 20
+
+
+@pytest.mark.asyncio
+async def test_get_readiness__caches_and_coalesces_checks():
+    # Arrange
+    client = FakeClient()
+    health_service = get_health_service(client)
+
+    # Act
+    reports = await asyncio.gather(*(health_service.get_readiness() for _ in range(5)))
+    _ = await health_service.get_readiness()
+
+    # Assert
+    assert all(report.ready for report in reports)
+    assert client.admin.pings == 1
+
+
+@pytest.mark.asyncio
+async def test_get_readiness__not_ready_when_mongo_ping_fails():
+    # Act
+    report = await get_health_service(FakeClient(fail=True)).get_readiness()
+
+    # Assert
+    assert report.ready is False
+    assert report.mongo_ping_ms is None
+
+
+@pytest.mark.asyncio
+async def test_get_readiness__ready_without_mongo_client():
+    # Act
+    report = await get_health_service(client=None).get_readiness()
+
+    # Assert
+    assert report.ready is True
+    assert report.mongo_ping_ms is None
+
+
+@pytest.mark.asyncio
+async def test_get_readiness__not_ready_when_slack_calls_mostly_fail():
+    # Arrange
+    slack_api_errors = ErrorRateWindow()
+    for error in (True, True, True, False):
+        slack_api_errors.record(error=error)
+
+    # Act
+    report = await get_health_service(
+        FakeClient(), slack_api_errors=slack_api_errors
+    ).get_readiness()
+
+    # Assert
+    assert report.ready is False
+    assert report.slack_api_error_rate == 0.75
+    assert report.slack_api_calls == 4
+
+
+@pytest.mark.asyncio
+async def test_get_readiness__ignores_slack_errors_below_min_calls():
+    # Arrange
+    slack_api_errors = ErrorRateWindow()
+    slack_api_errors.record(error=True)
+
+    # Act
+    report = await get_health_service(
+        FakeClient(), slack_api_errors=slack_api_errors
+    ).get_readiness()
+
+    # Assert
+    assert report.ready is True
@@ -0,0 +1,156 @@
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+import os
+import sys
+from typing import Any, cast
+
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.services import ACTIVE_AFK_TOPIC, InvalidationBus
+
+
+class FakeCollection:
+    # Just the insert_one and find queries InvalidationBus makes
+    def __init__(self):
+        self.documents: list[dict[str, Any]] = []
+        self.fail = False
+
+    async def insert_one(self, document: dict[str, Any]) -> None:
+        if self.fail:
+            raise ConnectionError("no primary")
+        self.documents.append({"_id": len(self.documents), **document})
+
+    async def find(
+        self, filter: dict[str, Any], sort: list[tuple[str, int]]
+    ) -> AsyncIterator[dict[str, Any]]:
+        assert sort == [("created_at", 1)]
+        for document in sorted(self.documents, key=lambda d: d["created_at"]):
+            if (
+                document["created_at"] >= filter["created_at"]["$gte"]
+                and document["origin"] != filter["origin"]["$ne"]
+            ):
+                yield document
+
+
+def make_bus(collection: FakeCollection, origin: str) -> InvalidationBus:
+    return InvalidationBus(
+        collection=cast(AsyncIOMotorCollection[dict[str, Any]], collection),
+        origin=origin,
+    )
+
+
+@pytest.fixture(scope="function")
+async def db():
+    if "MONGODB_URI" not in os.environ:
+        pytest.skip("MONGODB_URI is not set")
+    client = AsyncIOMotorClient(os.environ["MONGODB_URI"])
+    db = client.afk_slackbot
+    yield db
+    _ = await db.cache_invalidations.delete_many({})
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_poll__applies_other_instances_messages_once(
+    db: AsyncIOMotorDatabase[dict[str, object]],
+):
+    # Arrange
+    since = datetime.now(tz=UTC) - timedelta(seconds=5)
+    publisher = InvalidationBus(collection=db.cache_invalidations, origin="first")
+    subscriber = InvalidationBus(collection=db.cache_invalidations, origin="second")
+    received: list[list[str]] = []
+    published: list[list[str]] = []
+    subscriber.subscribe(ACTIVE_AFK_TOPIC, received.append)
+    publisher.subscribe(ACTIVE_AFK_TOPIC, published.append)
+    await publisher.publish(ACTIVE_AFK_TOPIC, ["team_id_0"])
+
+    # Act
+    await subscriber.poll(since=since)
+    await subscriber.poll(since=since)
+    await publisher.poll(since=since)
+
+    # Assert
+    assert received == [["team_id_0"]]
+    assert published == []
+
+
+@pytest.mark.asyncio
+async def test_poll__applies_other_instances_messages_once_in_memory():
+    # Arrange
+    collection = FakeCollection()
+    since = datetime.now(tz=UTC) - timedelta(seconds=5)
+    publisher = make_bus(collection, origin="first")
+    subscriber = make_bus(collection, origin="second")
+    received: list[list[str]] = []
+    published: list[list[str]] = []
+    subscriber.subscribe(ACTIVE_AFK_TOPIC, received.append)
+    publisher.subscribe(ACTIVE_AFK_TOPIC, published.append)
+    await publisher.publish(ACTIVE_AFK_TOPIC, ["team_id_0"])
+    await publisher.publish(ACTIVE_AFK_TOPIC, ["team_id_1"])
+
+    # Act
+    await subscriber.poll(since=since)
+    await subscriber.poll(since=since)
+    await publisher.poll(since=since)
+
+    # Assert
+    assert received == [["team_id_0"], ["team_id_1"]]
+    assert published == []
+
+
+@pytest.mark.asyncio
+async def test_poll__keeps_going_when_a_handler_fails():
+    # Arrange
+    collection = FakeCollection()
+    since = datetime.now(tz=UTC) - timedelta(seconds=5)
+    subscriber = make_bus(collection, origin="second")
+    received: list[list[str]] = []
+
+    async def failing_handler(keys: list[str]) -> None:
+        raise RuntimeError("boom")
+
+    subscriber.subscribe(ACTIVE_AFK_TOPIC, failing_handler)
+    subscriber.subscribe(ACTIVE_AFK_TOPIC, received.append)
+    await make_bus(collection, origin="first").publish(ACTIVE_AFK_TOPIC, ["team_id_0"])
+
+    # Act
+    await subscriber.poll(since=since)
+
+    # Assert
+    assert received == [["team_id_0"]]
+
+
+@pytest.mark.asyncio
+async def test_poll__forgets_messages_older_than_since():
+    # Arrange
+    collection = FakeCollection()
+    subscriber = make_bus(collection, origin="second")
+    await make_bus(collection, origin="first").publish(ACTIVE_AFK_TOPIC, ["team_id_0"])
+    await subscriber.poll(since=datetime.now(tz=UTC) - timedelta(seconds=5))
+
+    # Act
+    await subscriber.poll(since=datetime.now(tz=UTC) + timedelta(seconds=1))
+
+    # Assert
+    assert subscriber.seen == {}
+
+
+@pytest.mark.asyncio
+async def test_publish__ignores_storage_errors():
+    # Arrange
+    collection = FakeCollection()
+    collection.fail = True
+    publisher = make_bus(collection, origin="first")
+
+    # Act
+    await publisher.publish(ACTIVE_AFK_TOPIC, ["team_id_0"])
+
+    # Assert
+    assert collection.documents == []
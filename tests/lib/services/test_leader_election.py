@@ -0,0 +1,165 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+import os
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.services import InMemoryLease, LeaderElection, MongoLease
+
+
+class ScriptedLease:
+    # Answers acquire() from a script, repeating its last answer
+    def __init__(self, results: list[bool | Exception]):
+        self.results = results
+        self.released = False
+
+    async def acquire(self) -> bool:
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def release(self) -> None:
+        self.released = True
+
+
+async def run_until(calls: list[str], count: int) -> None:
+    async with asyncio.timeout(1):
+        while len(calls) < count:
+            await asyncio.sleep(0)
+
+
+@pytest.fixture(scope="function")
+async def db():
+    if "MONGODB_URI" not in os.environ:
+        pytest.skip("MONGODB_URI is not set")
+    client = AsyncIOMotorClient(os.environ["MONGODB_URI"])
+    db = client.afk_slackbot
+    yield db
+    _ = await db.leases.delete_many({})
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_acquire__only_one_holder_at_a_time(
+    db: AsyncIOMotorDatabase[dict[str, object]],
+):
+    # Arrange
+    first = MongoLease(collection=db.leases, holder="first")
+    second = MongoLease(collection=db.leases, holder="second")
+
+    # Act
+    first_acquired = await first.acquire()
+    second_acquired = await second.acquire()
+    first_renewed = await first.acquire()
+
+    # Assert
+    assert (first_acquired, second_acquired, first_renewed) == (True, False, True)
+
+
+@pytest.mark.asyncio
+async def test_acquire__takes_over_expired_or_released_lease(
+    db: AsyncIOMotorDatabase[dict[str, object]],
+):
+    # Arrange
+    first = MongoLease(collection=db.leases, holder="first")
+    second = MongoLease(collection=db.leases, holder="second")
+    _ = await first.acquire()
+    _ = await db.leases.update_one(
+        {"_id": first.name},
+        {"$set": {"expires_at": datetime.now(tz=UTC) - timedelta(seconds=1)}},
+    )
+
+    # Act
+    taken_over = await second.acquire()
+    await second.release()
+    taken_back = await first.acquire()
+
+    # Assert
+    assert (taken_over, taken_back) == (True, True)
+
+
+@pytest.mark.asyncio
+async def test_run__starts_and_stops_jobs_with_leadership():
+    # Arrange
+    calls: list[str] = []
+
+    async def on_elected():
+        calls.append("elected")
+
+    async def on_demoted():
+        calls.append("demoted")
+
+    election = LeaderElection(
+        lease=InMemoryLease(), on_elected=on_elected, on_demoted=on_demoted
+    )
+
+    # Act
+    election.start()
+    await asyncio.sleep(0)
+    await election.stop()
+
+    # Assert
+    assert calls == ["elected", "demoted"]
+    assert not election.is_leader
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "lost_with", [False, ConnectionError("no primary")], ids=["taken", "error"]
+)
+async def test_run__demotes_when_lease_is_lost(lost_with: bool | Exception):
+    # Arrange
+    calls: list[str] = []
+
+    async def on_elected():
+        calls.append("elected")
+
+    async def on_demoted():
+        calls.append("demoted")
+
+    lease = ScriptedLease([True, lost_with])
+    election = LeaderElection(
+        lease=lease,
+        on_elected=on_elected,
+        on_demoted=on_demoted,
+        renew_interval_seconds=0,
+    )
+
+    # Act
+    election.start()
+    await run_until(calls, 2)
+    await election.stop()
+
+    # Assert
+    assert calls == ["elected", "demoted"]
+    assert not election.is_leader
+    assert not lease.released
+
+
+@pytest.mark.asyncio
+async def test_stop__releases_held_lease():
+    # Arrange
+    lease = ScriptedLease([True])
+    calls: list[str] = []
+
+    async def on_elected():
+        calls.append("elected")
+
+    async def on_demoted():
+        calls.append("demoted")
+
+    election = LeaderElection(lease=lease, on_elected=on_elected, on_demoted=on_demoted)
+    election.start()
+    await run_until(calls, 1)
+
+    # Act
+    await election.stop()
+
+    # Assert
+    assert calls == ["elected", "demoted"]
+    assert lease.released
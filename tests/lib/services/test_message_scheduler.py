@@ -0,0 +1,101 @@
+from collections.abc import Sequence
+import os
+import sys
+
+import pytest
+from slack_sdk.models.blocks import Block, SectionBlock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.services import SlackMessageScheduler, SlackRateLimitedError
+
+
+@pytest.mark.asyncio
+async def test_enqueue__coalesces_announcements_per_channel():
+    # Arrange
+    posted: list[tuple[str, int]] = []
+
+    async def post_message(channel_id: str, blocks: Sequence[Block]):
+        posted.append((channel_id, len(blocks)))
+
+    scheduler = SlackMessageScheduler(
+        post_message=post_message, coalesce_window_seconds=0.01
+    )
+
+    # Act
+    for _ in range(3):
+        scheduler.enqueue(channel_id="C1", blocks=[SectionBlock(text="afk")])
+    scheduler.enqueue(channel_id="C2", blocks=[SectionBlock(text="afk")])
+    await scheduler.flush()
+
+    # Assert
+    assert sorted(posted) == [("C1", 3), ("C2", 1)]
+
+
+@pytest.mark.asyncio
+async def test_enqueue__splits_batches_at_block_limit():
+    # Arrange
+    posted: list[int] = []
+
+    async def post_message(channel_id: str, blocks: Sequence[Block]):
+        posted.append(len(blocks))
+
+    scheduler = SlackMessageScheduler(
+        post_message=post_message, coalesce_window_seconds=0.01
+    )
+
+    # Act
+    for _ in range(3):
+        scheduler.enqueue(channel_id="C1", blocks=[SectionBlock(text="afk")] * 20)
+    await scheduler.flush()
+
+    # Assert
+    assert posted == [40, 20]
+
+
+@pytest.mark.asyncio
+async def test_enqueue__waits_for_retry_after():
+    # Arrange
+    attempts = 0
+
+    async def post_message(channel_id: str, blocks: Sequence[Block]):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise SlackRateLimitedError(retry_after=0.01)
+
+    scheduler = SlackMessageScheduler(
+        post_message=post_message, coalesce_window_seconds=0
+    )
+
+    # Act
+    scheduler.enqueue(channel_id="C1", blocks=[SectionBlock(text="afk")])
+    await scheduler.flush()
+
+    # Assert
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_enqueue__drops_message_rate_limited_too_often():
+    # Arrange
+    attempts = 0
+
+    async def post_message(channel_id: str, blocks: Sequence[Block]):
+        nonlocal attempts
+        attempts += 1
+        raise SlackRateLimitedError(retry_after=0)
+
+    scheduler = SlackMessageScheduler(
+        post_message=post_message,
+        coalesce_window_seconds=0,
+        max_rate_limited_attempts=3,
+    )
+
+    # Act
+    scheduler.enqueue(channel_id="C1", blocks=[SectionBlock(text="afk")])
+    await scheduler.flush()
+
+    # Assert
+    assert attempts == 3
+    assert scheduler.drainers == {}
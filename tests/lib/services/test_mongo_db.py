@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.services import MongoConnection
+
+
+def test_get_client__is_created_on_first_use_and_reused():
+    # Arrange
+    connection = MongoConnection(uri="mongodb://localhost:27017", max_pool_size=5)
+    assert connection.client is None
+
+    # Act
+    client = connection.get_client()
+
+    # Assert
+    assert connection.get_client() is client
+    connection.close()
+    assert connection.client is None
+
+
+def test_get_client__without_uri_raises():
+    # Arrange
+    connection = MongoConnection(uri=None)
+
+    # Act / Assert
+    with pytest.raises(RuntimeError):
+        _ = connection.get_client()
@@ -0,0 +1,193 @@
+from collections.abc import Callable, Sequence
+from datetime import UTC, datetime
+import os
+import sys
+
+import httpx
+import pytest
+from slack_sdk.models.blocks import Block
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.models import AFKRecord
+from lib.services import (
+    AFKEventKind,
+    AFKNotificationScheduler,
+    DatabaseService,
+    InMemorySchedulerCursorStore,
+    InMemoryStorageBackend,
+    SlackService,
+)
+
+
+@pytest.fixture(scope="function")
+async def slack_service():
+    def handler(request: httpx.Request) -> httpx.Response:
+        user_id = request.url.params["user"]
+        return httpx.Response(
+            200,
+            json={
+                "ok": True,
+                "user": {
+                    "id": user_id,
+                    "locale": "en-US",
+                    "real_name": f"Name {user_id}",
+                    "team_id": "team_id_0",
+                    "tz_offset": 0,
+                },
+            },
+        )
+
+    service = SlackService(token="xoxb-test")
+    service.http_client = httpx.AsyncClient(
+        base_url=service.http_client.base_url, transport=httpx.MockTransport(handler)
+    )
+    yield service
+    await service.aclose()
+
+
+def record_messages(
+    slack_service: SlackService,
+) -> list[tuple[str, Sequence[Block]]]:
+    messages: list[tuple[str, Sequence[Block]]] = []
+
+    def enqueue_message(channel_id: str, blocks: Sequence[Block]) -> None:
+        messages.append((channel_id, blocks))
+
+    slack_service.enqueue_message = enqueue_message
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_tick__sends_due_events_batched_per_channel(
+    slack_service: SlackService, make_afk_record: Callable[..., AFKRecord]
+):
+    # Arrange
+    now = datetime.now(tz=UTC).timestamp()
+    database_service = DatabaseService(backend=InMemoryStorageBackend())
+    _ = await database_service.write(
+        [
+            make_afk_record(
+                now + 3600, channel_id="C1", created=now - 120, start_datetime=now - 60
+            ),
+            make_afk_record(
+                now - 30, channel_id="C1", created=now - 120, start_datetime=now - 120
+            ),
+            make_afk_record(
+                now - 10, channel_id="C2", created=now - 120, start_datetime=now - 60
+            ),
+        ]
+    )
+    messages = record_messages(slack_service)
+    cursor_store = InMemorySchedulerCursorStore()
+    await cursor_store.save(now - 300)
+    scheduler = AFKNotificationScheduler(
+        database_service=database_service,
+        slack_service=slack_service,
+        cursor_store=cursor_store,
+    )
+
+    # Act
+    _ = await scheduler.tick()
+
+    # Assert
+    assert sorted(channel_id for channel_id, _ in messages) == ["C1", "C2"]
+    blocks = dict(messages)
+    # C1 gets one start and one end, C2 a start and an end of the same record
+    assert [type(block).__name__ for block in blocks["C1"]] == [
+        "SectionBlock",
+        "SectionBlock",
+    ]
+    assert "is back" in blocks["C2"][-1].to_dict()["text"]["text"]
+    assert scheduler.events == []
+    assert cursor_store.cursor is not None and cursor_store.cursor >= now
+
+
+@pytest.mark.asyncio
+async def test_tick__skips_cleared_records(
+    slack_service: SlackService, make_afk_record: Callable[..., AFKRecord]
+):
+    # Arrange
+    now = datetime.now(tz=UTC).timestamp()
+    database_service = DatabaseService(backend=InMemoryStorageBackend())
+    record = make_afk_record(
+        now + 2, channel_id="C1", created=now - 120, start_datetime=now + 1
+    )
+    _ = await database_service.write([record])
+    messages = record_messages(slack_service)
+    scheduler = AFKNotificationScheduler(
+        database_service=database_service,
+        slack_service=slack_service,
+        cursor_store=InMemorySchedulerCursorStore(),
+    )
+    _ = await scheduler.load(now)
+    _ = await database_service.clear_afk_status(
+        {"team_id": [record.team_id], "user_id": [record.user_id]}
+    )
+
+    # Act
+    _ = await scheduler.fire(scheduler.pop_due(now + 5), now + 5)
+
+    # Assert
+    assert messages == []
+
+
+@pytest.mark.asyncio
+async def test_load__resumes_from_persisted_cursor(
+    slack_service: SlackService, make_afk_record: Callable[..., AFKRecord]
+):
+    # Arrange
+    now = datetime.now(tz=UTC).timestamp()
+    database_service = DatabaseService(backend=InMemoryStorageBackend())
+    _ = await database_service.write(
+        [
+            make_afk_record(
+                now - 90, channel_id="C1", created=now - 120, start_datetime=now - 100
+            ),
+            make_afk_record(
+                now - 50, channel_id="C1", created=now - 120, start_datetime=now - 60
+            ),
+        ]
+    )
+    cursor_store = InMemorySchedulerCursorStore()
+    await cursor_store.save(now - 80)
+    scheduler = AFKNotificationScheduler(
+        database_service=database_service,
+        slack_service=slack_service,
+        cursor_store=cursor_store,
+    )
+
+    # Act
+    loaded = await scheduler.load(now)
+
+    # Assert
+    assert loaded == 2
+    assert sorted(event.fire_at for event in scheduler.events) == [now - 60, now - 50]
+
+
+@pytest.mark.asyncio
+async def test_schedule__only_adds_events_inside_the_loaded_window(
+    slack_service: SlackService,
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    now = datetime.now(tz=UTC).timestamp()
+    scheduler = AFKNotificationScheduler(
+        database_service=DatabaseService(backend=InMemoryStorageBackend()),
+        slack_service=slack_service,
+        cursor_store=InMemorySchedulerCursorStore(),
+        lookahead_seconds=60,
+    )
+    _ = await scheduler.load(now)
+    record = make_afk_record(
+        now + 3600, channel_id="C1", created=now, start_datetime=now + 30
+    )
+
+    # Act
+    scheduled = scheduler.schedule(record)
+    scheduled_again = scheduler.schedule(record)
+
+    # Assert
+    assert scheduled == 1
+    assert scheduled_again == 0
+    assert [event.kind for event in scheduler.events] == [AFKEventKind.START]
@@ -0,0 +1,122 @@
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+import gzip
+import json
+import os
+from pathlib import Path
+import sys
+from typing import cast
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.models import AFKRecord
+from lib.services import (
+    ArchiveMode,
+    DatabaseService,
+    MongoStorageBackend,
+    RecordLifecycleService,
+)
+
+
+@pytest.fixture(scope="function")
+async def db():
+    if "MONGODB_URI" not in os.environ:
+        pytest.skip("MONGODB_URI is not set")
+    client = AsyncIOMotorClient(os.environ["MONGODB_URI"])
+    db = client.afk_slackbot
+    yield db
+    _ = await db.afk_records.delete_many({})
+    _ = await db.afk_records_archive.delete_many({})
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_compact__moves_expired_records_to_archive_collection(
+    db: AsyncIOMotorDatabase[dict[str, object]],
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    now = datetime.now(tz=UTC)
+    retention = timedelta(days=1)
+    db_service = DatabaseService(
+        backend=MongoStorageBackend(collection=db.afk_records), retention=retention
+    )
+    expired_record = make_afk_record((now - timedelta(days=2)).timestamp())
+    active_record = make_afk_record((now + timedelta(hours=1)).timestamp())
+    _ = await db_service.write([expired_record, active_record])
+    lifecycle_service = RecordLifecycleService(
+        collection=db.afk_records,
+        retention=retention,
+        archive_collection=db.afk_records_archive,
+    )
+
+    # Act
+    compacted = await lifecycle_service.compact()
+
+    # Assert
+    assert compacted == 1
+    assert await db_service.read({}) == [active_record]
+    archived = await db.afk_records_archive.find({}).to_list(length=None)
+    assert [AFKRecord.model_validate(o) for o in archived] == [expired_record]
+
+
+@pytest.mark.asyncio
+async def test_compact__exports_expired_records_to_jsonl(
+    db: AsyncIOMotorDatabase[dict[str, object]],
+    tmp_path: Path,
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    now = datetime.now(tz=UTC)
+    retention = timedelta(days=1)
+    db_service = DatabaseService(
+        backend=MongoStorageBackend(collection=db.afk_records), retention=retention
+    )
+    expired_record = make_afk_record((now - timedelta(days=2)).timestamp())
+    _ = await db_service.write([expired_record])
+    archive_path = tmp_path / "archive.jsonl.gz"
+    lifecycle_service = RecordLifecycleService(
+        collection=db.afk_records,
+        retention=retention,
+        archive_mode=ArchiveMode.JSONL,
+        archive_path=str(archive_path),
+    )
+
+    # Act
+    _ = await lifecycle_service.compact()
+
+    # Assert
+    with gzip.open(archive_path, mode="rt", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert [AFKRecord.model_validate(json.loads(line)) for line in lines] == [
+        expired_record
+    ]
+    assert await db_service.read({}) == []
+
+
+@pytest.mark.asyncio
+async def test_clear_afk_status__expires_cancelled_records_after_retention(
+    db: AsyncIOMotorDatabase[dict[str, object]],
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    retention = timedelta(days=1)
+    db_service = DatabaseService(
+        backend=MongoStorageBackend(collection=db.afk_records), retention=retention
+    )
+    record = make_afk_record((datetime.now(tz=UTC) + timedelta(days=30)).timestamp())
+    _ = await db_service.write([record])
+
+    # Act
+    _ = await db_service.clear_afk_status(
+        {"team_id": [record.team_id], "user_id": [record.user_id]}
+    )
+
+    # Assert
+    document = await db.afk_records.find_one({"id": record.id})
+    assert document is not None
+    expires_at = cast(datetime, document["expires_at"]).replace(tzinfo=UTC)
+    assert expires_at <= datetime.now(tz=UTC) + retention
@@ -0,0 +1,208 @@
+import os
+import sys
+
+import httpx
+import pytest
+from slack_sdk.models.blocks import ActionsBlock, SectionBlock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.models import AFKRecordToPrint, SlashSubcommand
+from lib.services import NEXT_PAGE_ACTION_ID, SlackService
+
+
+def make_slack_user(user_id: str) -> dict[str, object]:
+    return {
+        "id": user_id,
+        "locale": "en-US",
+        "real_name": f"Name {user_id}",
+        "team_id": "team_id_0",
+        "tz_offset": 0,
+    }
+
+
+@pytest.fixture(scope="function")
+async def slack_service():
+    service = SlackService(token="xoxb-test")
+    yield service
+    await service.aclose()
+
+
+def use_mock_slack_api(slack_service: SlackService, requests: list[httpx.Request]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("users.info"):
+            user_id = request.url.params["user"]
+            if user_id == "missing":
+                return httpx.Response(
+                    200, json={"ok": False, "error": "user_not_found"}
+                )
+            return httpx.Response(
+                200, json={"ok": True, "user": make_slack_user(user_id)}
+            )
+        cursor = request.url.params["cursor"]
+        return httpx.Response(
+            200,
+            json={
+                "ok": True,
+                "members": [make_slack_user(f"U{cursor or 0}")],
+                "response_metadata": {"next_cursor": "" if cursor else "1"},
+            },
+        )
+
+    slack_service.http_client = httpx.AsyncClient(
+        base_url=slack_service.http_client.base_url,
+        transport=httpx.MockTransport(handler),
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_users_info__looks_up_each_distinct_user_once(
+    slack_service: SlackService,
+):
+    # Arrange
+    requests: list[httpx.Request] = []
+    use_mock_slack_api(slack_service, requests)
+
+    # Act
+    result = await slack_service.get_users_info(
+        user_ids=["U1", "U2", "U1", "missing"], team_id="team_id_0"
+    )
+
+    # Assert
+    assert sorted(result) == ["U1", "U2"]
+    assert result["U2"].real_name == "Name U2"
+    assert len(requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_sync_team_users__warms_user_info_cache(slack_service: SlackService):
+    # Arrange
+    requests: list[httpx.Request] = []
+    use_mock_slack_api(slack_service, requests)
+
+    # Act
+    synced = await slack_service.sync_team_users(team_id="team_id_0")
+    result = await slack_service.get_users_info(
+        user_ids=["U0", "U1"], team_id="team_id_0"
+    )
+
+    # Assert
+    assert synced == 2
+    assert sorted(result) == ["U0", "U1"]
+    assert all(request.url.path.endswith("users.list") for request in requests)
+
+
+@pytest.mark.asyncio
+async def test_sync_team_users__retries_rate_limited_pages(
+    slack_service: SlackService,
+):
+    # Arrange
+    statuses = [429, 200, 429, 429, 429]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status_code = statuses.pop(0)
+        if status_code == 429:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={"ok": False})
+        return httpx.Response(
+            200,
+            json={
+                "ok": True,
+                "members": [make_slack_user("U0")],
+                "response_metadata": {"next_cursor": "1"},
+            },
+        )
+
+    slack_service.http_client = httpx.AsyncClient(
+        base_url=slack_service.http_client.base_url,
+        transport=httpx.MockTransport(handler),
+    )
+
+    # Act
+    synced = await slack_service.sync_team_users(team_id="team_id_0")
+
+    # Assert
+    assert synced == 1
+    assert statuses == []
+
+
+def test_get_user_info_cache__evicts_least_recently_used_team():
+    # Arrange
+    slack_service = SlackService(token="xoxb-test", user_info_cache_max_teams=2)
+    cache_0 = slack_service.get_user_info_cache("team_id_0")
+    _ = slack_service.get_user_info_cache("team_id_1")
+    _ = slack_service.get_user_info_cache("team_id_0")
+
+    # Act
+    _ = slack_service.get_user_info_cache("team_id_2")
+
+    # Assert
+    assert list(slack_service.user_info_caches) == ["team_id_0", "team_id_2"]
+    assert slack_service.get_user_info_cache("team_id_0") is cache_0
+
+
+def make_afk_records_to_print(count: int) -> list[AFKRecordToPrint]:
+    return [
+        AFKRecordToPrint(
+            end_datetime="1/1/26, 5:00 PM",
+            real_name=f"user {i}",
+            start_datetime="1/1/26, 4:00 PM",
+            text="for 1 hour",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_user_info__uses_configured_api_base_url():
+    # Arrange
+    requests: list[httpx.Request] = []
+    slack_service = SlackService(
+        token="xoxb-test", api_base_url="http://localhost:8081/api"
+    )
+    use_mock_slack_api(slack_service, requests)
+
+    # Act
+    user_info = await slack_service.fetch_user_info("U1")
+
+    # Assert
+    assert user_info is not None
+    assert str(requests[0].url).startswith("http://localhost:8081/api/users.info?")
+    await slack_service.aclose()
+
+
+def test_get_list_response__splits_fields_across_sections():
+    # Act
+    blocks = SlackService.get_list_response(records=make_afk_records_to_print(23))
+
+    # Assert
+    sections = [block for block in blocks if isinstance(block, SectionBlock)]
+    assert len(sections) == len(blocks)
+    assert [len(block.fields or []) for block in sections] == [10, 10, 3]
+
+
+def test_get_list_response__shows_record_ids_when_set():
+    # Arrange
+    records = make_afk_records_to_print(2)
+    records[0].id = "id_0"
+
+    # Act
+    (block,) = SlackService.get_list_response(records=records)
+
+    # Assert
+    assert isinstance(block, SectionBlock)
+    texts = [field.text for field in block.fields or []]
+    assert texts[0].endswith("\nId: `id_0`")
+    assert "Id:" not in texts[1]
+
+
+def test_get_next_page_block():
+    # Act
+    block = SlackService.get_next_page_block(
+        subcommand=SlashSubcommand.TABLE, offset=25
+    )
+
+    # Assert
+    assert isinstance(block, ActionsBlock)
+    assert block.to_dict()["elements"][0]["action_id"] == NEXT_PAGE_ACTION_ID
+    assert block.to_dict()["elements"][0]["value"] == "table:25"
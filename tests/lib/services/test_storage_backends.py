@@ -0,0 +1,76 @@
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.models import AFKRecord, AFKRecordFilter
+from lib.services import DatabaseService, InMemoryStorageBackend
+
+
+@pytest.mark.asyncio
+async def test_find__replaced_record_keeps_its_place_among_equal_end_datetimes(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    backend = InMemoryStorageBackend()
+    db_service = DatabaseService(backend=backend)
+    end_datetime = (datetime.now(tz=UTC) + timedelta(hours=1)).timestamp()
+    afk_records = [
+        make_afk_record(end_datetime, user_id=f"user_id_{i}") for i in range(3)
+    ]
+    _ = await db_service.write(afk_records)
+
+    # Act
+    _ = await db_service.update(
+        [AFKRecord(**afk_records[0].model_dump(exclude={"text"}), text="updated")]
+    )
+    result = await db_service.read({"end_datetime": datetime.now(tz=UTC)})
+
+    # Assert
+    assert [r.id for r in result] == [r.id for r in afk_records]
+    assert result[0].text == "updated"
+
+
+@pytest.mark.asyncio
+async def test_explain__reports_lookups_used_by_the_filter():
+    # Arrange
+    backend = InMemoryStorageBackend()
+    now = datetime.now(tz=UTC)
+
+    # Act
+    explanation = await backend.explain(
+        {"end_datetime": now, "team_id": ["team_id_0"], "user_id": ["user_id_0"]}
+    )
+
+    # Assert
+    assert explanation == {
+        "indexes": ["team_id", "user_id"],
+        "end_datetime_lower_bound": now.timestamp(),
+    }
+
+
+@pytest.mark.asyncio
+async def test_find__looks_up_id_filters_by_key(
+    make_afk_record: Callable[..., AFKRecord],
+):
+    # Arrange
+    backend = InMemoryStorageBackend()
+    db_service = DatabaseService(backend=backend)
+    end_datetime = (datetime.now(tz=UTC) + timedelta(hours=1)).timestamp()
+    afk_records = [
+        make_afk_record(end_datetime, user_id=f"user_id_{i}") for i in range(3)
+    ]
+    _ = await db_service.write(afk_records)
+    filter: AFKRecordFilter = {"id": [afk_records[1].id, "missing_id"]}
+
+    # Act
+    candidate_ids = backend.get_candidate_ids(filter)
+    result = await db_service.read(filter)
+
+    # Assert
+    assert candidate_ids == {afk_records[1].id}
+    assert result == [afk_records[1]]
@@ -0,0 +1,170 @@
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.admission import (
+    AdmissionController,
+    AdmissionDecision,
+    AdmissionMiddleware,
+    TokenBucketLimiter,
+    get_requester,
+    parse_slack_request_body,
+)
+from lib.middleware import SlackSignatureMiddleware
+
+SIGNING_SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+
+
+def sign(body: bytes) -> dict[str, str]:
+    timestamp = str(int(time.time()))
+    digest = hmac.new(
+        SIGNING_SECRET.encode(),
+        f"v0:{timestamp}:".encode() + body,
+        hashlib.sha256,
+    ).hexdigest()
+    return {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": f"v0={digest}",
+    }
+
+
+def test_try_acquire__refills_at_configured_rate():
+    # Arrange
+    now = 0.0
+    limiter = TokenBucketLimiter(rate_per_second=2, burst=2, clock=lambda: now)
+
+    # Act
+    burst = [limiter.try_acquire("T1") for _ in range(3)]
+    now = 0.5
+    refilled = limiter.try_acquire("T1")
+    other_key = limiter.try_acquire("T2")
+
+    # Assert
+    assert burst == [0, 0, 0.5]
+    assert refilled == 0
+    assert other_key == 0
+
+
+def test_admit__user_limit_leaves_team_tokens():
+    # Arrange
+    controller = AdmissionController(
+        team_limiter=TokenBucketLimiter(rate_per_second=1, burst=2, clock=lambda: 0),
+        user_limiter=TokenBucketLimiter(rate_per_second=1, burst=1, clock=lambda: 0),
+    )
+
+    # Act
+    decisions = [controller.admit("T1", "U1").decision for _ in range(3)]
+    other_user = controller.admit("T1", "U2").decision
+    team_exhausted = controller.admit("T1", "U3").decision
+
+    # Assert
+    assert decisions == [
+        AdmissionDecision.ADMIT,
+        AdmissionDecision.USER_RATE_LIMITED,
+        AdmissionDecision.USER_RATE_LIMITED,
+    ]
+    assert other_user == AdmissionDecision.ADMIT
+    assert team_exhausted == AdmissionDecision.TEAM_RATE_LIMITED
+
+
+def test_admit__sheds_load_over_max_in_flight():
+    # Arrange
+    controller = AdmissionController(max_in_flight=1)
+    controller.in_flight = 1
+
+    # Act
+    admission = controller.admit("T1", "U1")
+
+    # Assert
+    assert admission.decision == AdmissionDecision.OVERLOADED
+
+
+def test_get_requester__reads_slash_commands_and_interactions():
+    # Arrange
+    slash_command = urlencode({"team_id": "T1", "user_id": "U1"}).encode()
+    interaction = urlencode(
+        {"payload": json.dumps({"team": {"id": "T2"}, "user": {"id": "U2"}})}
+    ).encode()
+
+    # Act
+    requesters = [
+        get_requester(parse_slack_request_body(body))
+        for body in (slash_command, interaction, b"\xff", b"payload=%7B")
+    ]
+
+    # Assert
+    assert requesters == [("T1", "U1"), ("T2", "U2"), (None, None), (None, None)]
+
+
+def test_middleware__leaves_parsed_body_for_handlers():
+    # Arrange
+    async def handler(request: Request):
+        return PlainTextResponse(request.state.slack_body.payload["type"])
+
+    app = Starlette(
+        routes=[Route("/v1/interactive_message", handler, methods=["POST"])]
+    )
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(),
+        paths=("/v1/interactive_message",),
+    )
+    app.add_middleware(
+        SlackSignatureMiddleware,
+        signing_secret=SIGNING_SECRET,
+        paths=("/v1/interactive_message",),
+    )
+    client = TestClient(app)
+    body = urlencode({"payload": json.dumps({"type": "block_actions"})}).encode()
+
+    # Act
+    response = client.post("/v1/interactive_message", content=body, headers=sign(body))
+
+    # Assert
+    assert response.text == "block_actions"
+
+
+def test_middleware__answers_rejected_requests_with_try_again():
+    # Arrange
+    async def handler(request: Request):
+        return PlainTextResponse("handled")
+
+    app = Starlette(routes=[Route("/v1/slack_bot", handler, methods=["POST"])])
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            user_limiter=TokenBucketLimiter(rate_per_second=1, burst=1)
+        ),
+        paths=("/v1/slack_bot",),
+    )
+    app.add_middleware(
+        SlackSignatureMiddleware,
+        signing_secret=SIGNING_SECRET,
+        paths=("/v1/slack_bot",),
+    )
+    client = TestClient(app)
+    body = urlencode({"team_id": "T1", "user_id": "U1"}).encode()
+
+    # Act
+    first = client.post("/v1/slack_bot", content=body, headers=sign(body))
+    second = client.post("/v1/slack_bot", content=body, headers=sign(body))
+
+    # Assert
+    assert first.text == "handled"
+    assert second.status_code == 200
+    assert second.json()["response_type"] == "ephemeral"
+    assert "try again" in second.json()["text"]
+    assert second.headers["Retry-After"] == "1"
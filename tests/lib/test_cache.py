@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.cache import TTLCache
+from tests.conftest import FakeClock
+
+
+def test_get__expires_after_ttl(clock: FakeClock):
+    # Arrange
+    cache: TTLCache[str, int] = TTLCache(ttl_seconds=10, max_size=2, clock=clock)
+    cache.set("a", 1)
+
+    # Act
+    before_expiry = cache.get("a")
+    clock.now += 10
+    after_expiry = cache.get("a")
+
+    # Assert
+    assert before_expiry == 1
+    assert after_expiry is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_set__evicts_least_recently_used():
+    # Arrange
+    cache: TTLCache[str, int] = TTLCache(ttl_seconds=10, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    _ = cache.get("a")
+
+    # Act
+    cache.set("c", 3)
+
+    # Assert
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_get_or_load__coalesces_concurrent_misses():
+    # Arrange
+    cache: TTLCache[str, int] = TTLCache(ttl_seconds=10, max_size=2)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    # Act
+    results = await asyncio.gather(
+        *(cache.get_or_load(key="a", loader=loader) for _ in range(10))
+    )
+
+    # Assert
+    assert results == [42] * 10
+    assert calls == 1
+    assert cache.get("a") == 42
+
+
+@pytest.mark.asyncio
+async def test_get_or_load__does_not_cache_missing_values():
+    # Arrange
+    cache: TTLCache[str, int] = TTLCache(ttl_seconds=10, max_size=2)
+
+    async def loader():
+        return None
+
+    # Act
+    result = await cache.get_or_load(key="a", loader=loader)
+
+    # Assert
+    assert result is None
+    assert len(cache) == 0
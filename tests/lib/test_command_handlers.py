@@ -0,0 +1,222 @@
+from collections.abc import Callable
+from datetime import UTC, datetime
+import os
+import sys
+from typing import Any
+
+import httpx
+import pytest
+from slack_sdk.models.blocks import MarkdownTextObject
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.command_handlers import (
+    LIST_PAGE_SIZE,
+    TABLE_PAGE_SIZE,
+    handle_list_subcommand,
+    handle_next_page_action,
+    handle_table_subcommand,
+    parse_next_page_value,
+)
+from lib.models import AFKRecord, SlashSubcommand, UserInfo
+from lib.services import (
+    ActiveAFKReadModel,
+    DatabaseService,
+    InMemoryStorageBackend,
+    SlackService,
+)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("list:40", (SlashSubcommand.LIST, 40, None)),
+        ("list:40:U1", (SlashSubcommand.LIST, 40, "U1")),
+        ("table:25", (SlashSubcommand.TABLE, 25, None)),
+    ],
+)
+def test_parse_next_page_value(
+    value: str, expected: tuple[SlashSubcommand, int, str | None]
+):
+    assert parse_next_page_value(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value", ["", "list", "list:", "list:-1", "list:ten", "clear:0", "table:25:U1"]
+)
+def test_parse_next_page_value__rejects_malformed_values(value: str):
+    assert parse_next_page_value(value) is None
+
+
+@pytest.fixture(scope="function")
+def make_afk_records(
+    make_afk_record: Callable[..., AFKRecord],
+) -> Callable[[int], list[AFKRecord]]:
+    # Spread over three users, ending one second apart
+    def make(count: int) -> list[AFKRecord]:
+        end_datetime = datetime.now(tz=UTC).timestamp() + 3600
+        return [
+            make_afk_record(end_datetime + i, user_id=f"U{i % 3}") for i in range(count)
+        ]
+
+    return make
+
+
+@pytest.fixture(scope="function")
+async def slack_service():
+    def handler(request: httpx.Request) -> httpx.Response:
+        user_id = request.url.params["user"]
+        return httpx.Response(
+            200,
+            json={
+                "ok": True,
+                "user": {
+                    "id": user_id,
+                    "locale": "en-US",
+                    "real_name": f"Name {user_id}",
+                    "team_id": "team_id_0",
+                    "tz_offset": 0,
+                },
+            },
+        )
+
+    service = SlackService(token="xoxb-test")
+    service.http_client = httpx.AsyncClient(
+        base_url=service.http_client.base_url, transport=httpx.MockTransport(handler)
+    )
+    yield service
+    await service.aclose()
+
+
+@pytest.fixture(scope="function", params=["database", "read_model"])
+async def database_service(request: pytest.FixtureRequest):
+    return DatabaseService(
+        backend=InMemoryStorageBackend(),
+        read_model=ActiveAFKReadModel() if request.param == "read_model" else None,
+    )
+
+
+USER_INFO = UserInfo(
+    id="U0", locale="en-US", real_name="Name U0", team_id="team_id_0", tz_offset=0
+)
+
+
+def get_next_page_value(response: dict[str, Any]) -> str | None:
+    last_block = response["blocks"][-1]
+    if last_block["type"] != "actions":
+        return None
+    return last_block["elements"][0]["value"]
+
+
+@pytest.mark.asyncio
+async def test_handle_list_subcommand__pages_through_records(
+    database_service: DatabaseService,
+    slack_service: SlackService,
+    make_afk_records: Callable[[int], list[AFKRecord]],
+):
+    # Arrange
+    _ = await database_service.write(make_afk_records(LIST_PAGE_SIZE + 1))
+
+    # Act
+    first_page = await handle_list_subcommand(
+        service=database_service, slack_service=slack_service, user_info=USER_INFO
+    )
+    assert isinstance(first_page, dict)
+    next_page_value = get_next_page_value(first_page)
+    assert next_page_value is not None
+    second_page = await handle_next_page_action(
+        service=database_service,
+        slack_service=slack_service,
+        user_info=USER_INFO,
+        value=next_page_value,
+    )
+
+    # Assert
+    assert next_page_value == f"list:{LIST_PAGE_SIZE}"
+    assert len(first_page["blocks"]) == LIST_PAGE_SIZE // 10 + 1
+    assert isinstance(second_page, dict)
+    assert get_next_page_value(second_page) is None
+    assert len(second_page["blocks"][0]["fields"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_handle_list_subcommand__keeps_user_filter_across_pages(
+    database_service: DatabaseService,
+    slack_service: SlackService,
+    make_afk_records: Callable[[int], list[AFKRecord]],
+):
+    # Arrange
+    _ = await database_service.write(make_afk_records(3 * LIST_PAGE_SIZE + 3))
+
+    # Act
+    first_page = await handle_list_subcommand(
+        service=database_service,
+        slack_service=slack_service,
+        user_info=USER_INFO,
+        user_id="U1",
+    )
+    assert isinstance(first_page, dict)
+    next_page_value = get_next_page_value(first_page)
+    assert next_page_value is not None
+    second_page = await handle_next_page_action(
+        service=database_service,
+        slack_service=slack_service,
+        user_info=USER_INFO,
+        value=next_page_value,
+    )
+
+    # Assert
+    assert next_page_value == f"list:{LIST_PAGE_SIZE}:U1"
+    assert isinstance(second_page, dict)
+    assert get_next_page_value(second_page) is None
+    assert len(second_page["blocks"][0]["fields"]) == 1
+    assert "Name U1" in second_page["blocks"][0]["fields"][0]["text"]
+
+
+@pytest.mark.asyncio
+async def test_handle_table_subcommand__pages_through_records(
+    database_service: DatabaseService,
+    slack_service: SlackService,
+    make_afk_records: Callable[[int], list[AFKRecord]],
+):
+    # Arrange
+    _ = await database_service.write(make_afk_records(TABLE_PAGE_SIZE + 1))
+
+    # Act
+    first_page = await handle_table_subcommand(
+        service=database_service, slack_service=slack_service, user_info=USER_INFO
+    )
+    assert isinstance(first_page, dict)
+    next_page_value = get_next_page_value(first_page)
+    assert next_page_value is not None
+    last_page = await handle_next_page_action(
+        service=database_service,
+        slack_service=slack_service,
+        user_info=USER_INFO,
+        value=next_page_value,
+    )
+
+    # Assert
+    assert next_page_value == f"table:{TABLE_PAGE_SIZE}"
+    assert first_page["blocks"][0]["type"] == "section"
+    # The last page is the bare table, without a section around it
+    assert isinstance(last_page, MarkdownTextObject)
+    assert last_page.text.count("\n") == 2
+
+
+@pytest.mark.asyncio
+async def test_handle_next_page_action__rejects_malformed_values(
+    database_service: DatabaseService, slack_service: SlackService
+):
+    # Act
+    result = await handle_next_page_action(
+        service=database_service,
+        slack_service=slack_service,
+        user_info=USER_INFO,
+        value="table:25:U1",
+    )
+
+    # Assert
+    assert isinstance(result, dict)
+    assert result["replace_original"] is False
+    assert "no longer available" in result["text"]
@@ -0,0 +1,114 @@
+import os
+import sys
+from typing import Any
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.interactions import (
+    InteractiveAction,
+    InteractiveActionRouter,
+    parse_interactive_payload,
+)
+
+
+def get_router() -> InteractiveActionRouter:
+    router = InteractiveActionRouter()
+
+    @router.action(action_id="next_page_button")
+    async def next_page(interaction: InteractiveAction):
+        return "next_page"
+
+    @router.action(block_id="submit_block")
+    async def submit(interaction: InteractiveAction):
+        return "submit"
+
+    @router.view_submission(callback_id="afk_modal")
+    async def modal(interaction: InteractiveAction):
+        return "modal"
+
+    return router
+
+
+def block_actions(*actions: dict[str, str]) -> dict[str, Any]:
+    return {"type": "block_actions", "actions": list(actions)}
+
+
+@pytest.mark.parametrize(
+    "payload,expected",
+    [
+        (
+            block_actions({"action_id": "next_page_button", "value": "list:40"}),
+            "next_page",
+        ),
+        (
+            block_actions({"action_id": "submit_button", "block_id": "submit_block"}),
+            "submit",
+        ),
+        (
+            block_actions(
+                {"action_id": "start_time_picker", "block_id": "afk_start_input"},
+                {"action_id": "next_page_button", "block_id": "pagination_block"},
+            ),
+            "next_page",
+        ),
+        ({"type": "view_submission", "view": {"callback_id": "afk_modal"}}, "modal"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_resolve__routes_to_registered_handler(
+    payload: dict[str, Any], expected: str
+):
+    # Act
+    route = get_router().resolve(payload)
+
+    # Assert
+    assert route is not None
+    assert await route.handler(route.interaction) == expected
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        block_actions(
+            {"action_id": "start_time_picker", "block_id": "afk_start_input"}
+        ),
+        block_actions(),
+        {"type": "view_submission", "view": {"callback_id": "unknown"}},
+        {"type": "shortcut"},
+    ],
+)
+def test_resolve__returns_none_when_unhandled(payload: dict[str, Any]):
+    # Act
+    route = get_router().resolve(payload)
+
+    # Assert
+    assert route is None
+
+
+def test_resolve__passes_clicked_action_to_handler():
+    # Arrange
+    action = {"action_id": "next_page_button", "value": "table:25"}
+
+    # Act
+    route = get_router().resolve(block_actions(action))
+
+    # Assert
+    assert route is not None
+    assert route.interaction.action == action
+
+
+@pytest.mark.parametrize("payload_value", ["{}", "not json", "[1]"])
+def test_parse_interactive_payload__rejects_invalid_payloads(payload_value: str):
+    # Act
+    payload = parse_interactive_payload(payload_value)
+
+    # Assert
+    assert payload is None
+
+
+def test_action__requires_exactly_one_key():
+    # Act / Assert
+    with pytest.raises(ValueError):
+        _ = InteractiveActionRouter().action(action_id="a", block_id="b")
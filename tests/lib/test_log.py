@@ -0,0 +1,47 @@
+import json
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.log import JSONFormatter, request_id
+
+
+def get_record(**extra: object) -> logging.LogRecord:
+    record = logging.LogRecord(
+        name="lib.test",
+        level=logging.WARNING,
+        pathname=__file__,
+        lineno=1,
+        msg="User lookup %s",
+        args=("failed",),
+        exc_info=None,
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_format__includes_request_id_and_extra_fields():
+    # Arrange
+    token = request_id.set("request-1")
+
+    # Act
+    entry = json.loads(JSONFormatter().format(get_record(user_id="U123")))
+    request_id.reset(token)
+
+    # Assert
+    assert entry["level"] == "warning"
+    assert entry["logger"] == "lib.test"
+    assert entry["message"] == "User lookup failed"
+    assert entry["request_id"] == "request-1"
+    assert entry["user_id"] == "U123"
+
+
+def test_format__omits_request_id_outside_requests():
+    # Act
+    entry = json.loads(JSONFormatter().format(get_record()))
+
+    # Assert
+    assert "request_id" not in entry
+    assert set(entry) == {"time", "level", "logger", "message"}
@@ -0,0 +1,85 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.metrics import ErrorRateWindow, MetricsRegistry
+from lib.tracing import span, span_durations
+
+
+def test_render_prometheus__renders_counters_and_cumulative_buckets():
+    # Arrange
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests received").inc(3)
+    histogram = registry.histogram(
+        "latency_seconds", "Latency", buckets=(0.1, 1.0), labels={"span": "parse"}
+    )
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    # Act
+    text = registry.render_prometheus()
+
+    # Assert
+    assert text == (
+        "# HELP requests_total Requests received\n"
+        "# TYPE requests_total counter\n"
+        "requests_total 3\n"
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{span="parse",le="0.1"} 2\n'
+        'latency_seconds_bucket{span="parse",le="1"} 3\n'
+        'latency_seconds_bucket{span="parse",le="+Inf"} 4\n'
+        'latency_seconds_sum{span="parse"} 2.65\n'
+        'latency_seconds_count{span="parse"} 4\n'
+    )
+
+
+def test_render_prometheus__describes_each_name_once():
+    # Arrange
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors", labels={"kind": "a"}).inc()
+    registry.counter("errors_total", "Errors", labels={"kind": "b"}).inc()
+
+    # Act
+    text = registry.render_prometheus()
+
+    # Assert
+    assert text.count("# TYPE errors_total counter") == 1
+    assert 'errors_total{kind="a"} 1' in text
+    assert 'errors_total{kind="b"} 1' in text
+
+
+def test_span__accumulates_durations_for_current_request():
+    # Arrange
+    durations: dict[str, float] = {}
+    token = span_durations.set(durations)
+
+    # Act
+    with span("slack_post"):
+        pass
+    with span("slack_post"):
+        pass
+    span_durations.reset(token)
+
+    # Assert
+    assert list(durations) == ["slack_post"]
+    assert durations["slack_post"] >= 0
+
+
+def test_error_rate_window__forgets_outcomes_outside_window():
+    # Arrange
+    now = [0.0]
+    window = ErrorRateWindow(window_seconds=60, clock=lambda: now[0])
+    window.record(error=True)
+    now[0] = 30
+    window.record(error=False)
+
+    # Act
+    before_expiry = window.get_error_rate()
+    now[0] = 61
+    after_expiry = window.get_error_rate()
+
+    # Assert
+    assert before_expiry == (0.5, 2)
+    assert after_expiry == (0.0, 1)
@@ -0,0 +1,117 @@
+import hashlib
+import hmac
+import os
+import sys
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.log import request_id
+from lib.middleware import RequestContextMiddleware, SlackSignatureMiddleware
+
+SIGNING_SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+NOW = 1_700_000_000
+
+
+async def echo(request: Request):
+    form_data = await request.form()
+    return JSONResponse(
+        {
+            "raw_body": request.state.raw_body.decode(),
+            "text": form_data.get("text"),
+        }
+    )
+
+
+def get_client() -> TestClient:
+    app = Starlette(routes=[Route("/v1/slack_bot", echo, methods=["POST"])])
+    app.add_middleware(
+        SlackSignatureMiddleware,
+        signing_secret=SIGNING_SECRET,
+        paths=("/v1/slack_bot",),
+        clock=lambda: NOW,
+    )
+    return TestClient(app)
+
+
+def sign(body: bytes, timestamp: int) -> dict[str, str]:
+    digest = hmac.new(
+        SIGNING_SECRET.encode(),
+        f"v0:{timestamp}:".encode() + body,
+        hashlib.sha256,
+    ).hexdigest()
+    return {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "X-Slack-Request-Timestamp": str(timestamp),
+        "X-Slack-Signature": f"v0={digest}",
+    }
+
+
+def test_middleware__passes_signed_request_and_body_through():
+    # Arrange
+    body = b"text=for+1+hour&user_id=U123"
+
+    # Act
+    response = get_client().post("/v1/slack_bot", content=body, headers=sign(body, NOW))
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json() == {"raw_body": body.decode(), "text": "for 1 hour"}
+
+
+def test_middleware__rejects_tampered_body():
+    # Arrange
+    headers = sign(b"text=for+1+hour", NOW)
+
+    # Act
+    response = get_client().post(
+        "/v1/slack_bot", content=b"text=for+9+hours", headers=headers
+    )
+
+    # Assert
+    assert response.status_code == 400
+
+
+def test_middleware__rejects_stale_timestamp():
+    # Arrange
+    body = b"text=for+1+hour"
+
+    # Act
+    response = get_client().post(
+        "/v1/slack_bot", content=body, headers=sign(body, NOW - 10 * 60)
+    )
+
+    # Assert
+    assert response.status_code == 400
+
+
+def test_middleware__rejects_missing_headers():
+    # Act
+    response = get_client().post("/v1/slack_bot", content=b"text=for+1+hour")
+
+    # Assert
+    assert response.status_code == 400
+
+
+def test_request_context_middleware__sets_and_returns_request_id():
+    # Arrange
+    async def current_request_id(request: Request):
+        return JSONResponse({"request_id": request_id.get()})
+
+    app = Starlette(routes=[Route("/", current_request_id)])
+    app.add_middleware(RequestContextMiddleware)
+    client = TestClient(app)
+
+    # Act
+    generated = client.get("/")
+    forwarded = client.get("/", headers={"X-Request-ID": "abc123"})
+
+    # Assert
+    assert generated.headers["x-request-id"] == generated.json()["request_id"]
+    assert forwarded.headers["x-request-id"] == "abc123"
+    assert forwarded.json() == {"request_id": "abc123"}
@@ -0,0 +1,136 @@
+from datetime import UTC, datetime
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.phrase_parser import CachedAFKParser, normalize_phrase
+from tests.conftest import FakeClock
+
+HOUR = 60 * 60
+
+
+class FakeAFKParser:
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.calls = 0
+        self.end_at = 1_700_050_000.0
+        self.phrases: list[str] = []
+
+    def parse_dates(self, phrase: str, tz_offset: int):
+        self.calls += 1
+        self.phrases.append(phrase)
+        now = self.clock.now
+        phrase = phrase.lower()
+        if phrase.startswith("for"):
+            return (
+                datetime.fromtimestamp(now, tz=UTC),
+                datetime.fromtimestamp(now + HOUR, tz=UTC),
+            )
+        if phrase.startswith("until"):
+            # Rolls over to the next day once it has passed
+            end_at = self.end_at if self.end_at > now else self.end_at + 24 * HOUR
+            return (
+                datetime.fromtimestamp(now, tz=UTC),
+                datetime.fromtimestamp(end_at, tz=UTC),
+            )
+        return None
+
+
+def get_parser(clock: FakeClock) -> tuple[CachedAFKParser, FakeAFKParser]:
+    parser = CachedAFKParser(absolute_plan_ttl_seconds=60, clock=clock)
+    fake_parser = FakeAFKParser(clock)
+    parser.parser = fake_parser
+    return parser, fake_parser
+
+
+def test_normalize_phrase__collapses_case_and_whitespace():
+    # Act
+    normalized = normalize_phrase("  For   1\tHour ")
+
+    # Assert
+    assert normalized == "for 1 hour"
+
+
+def test_parse_dates__resolves_relative_plan_against_current_time(clock: FakeClock):
+    # Arrange
+    parser, fake_parser = get_parser(clock)
+    _ = parser.parse_dates("for 1 hour", tz_offset=0)
+    clock.now += 10
+    _ = parser.parse_dates("For 1  hour", tz_offset=0)
+
+    # Act
+    clock.now += 3 * HOUR
+    parse_result = parser.parse_dates("for 1 hour", tz_offset=0)
+
+    # Assert
+    assert fake_parser.calls == 2
+    assert fake_parser.phrases == ["for 1 hour", "For 1  hour"]
+    assert parse_result is not None
+    assert parse_result[0].timestamp() == clock.now
+    assert parse_result[1].timestamp() == clock.now + HOUR
+
+
+def test_parse_dates__keeps_absolute_end_and_expires_plan(clock: FakeClock):
+    # Arrange
+    parser, fake_parser = get_parser(clock)
+    _ = parser.parse_dates("until 5pm", tz_offset=0)
+    clock.now += 10
+    _ = parser.parse_dates("until 5pm", tz_offset=0)
+
+    # Act
+    clock.now += 30
+    cached_result = parser.parse_dates("until 5pm", tz_offset=0)
+    clock.now += 60
+    _ = parser.parse_dates("until 5pm", tz_offset=0)
+
+    # Assert
+    assert cached_result is not None
+    assert cached_result[0].timestamp() == clock.now - 60
+    assert cached_result[1].timestamp() == 1_700_050_000
+    assert fake_parser.calls == 3
+
+
+def test_parse_dates__expires_absolute_plan_when_its_end_passes(clock: FakeClock):
+    # Arrange
+    parser, fake_parser = get_parser(clock)
+    fake_parser.end_at = clock.now + 30
+    _ = parser.parse_dates("until 5pm", tz_offset=0)
+    clock.now += 10
+    _ = parser.parse_dates("until 5pm", tz_offset=0)
+
+    # Act
+    clock.now += 20
+    parse_result = parser.parse_dates("until 5pm", tz_offset=0)
+
+    # Assert
+    assert fake_parser.calls == 3
+    assert parse_result is not None
+    assert parse_result[1].timestamp() > clock.now
+
+
+def test_parse_dates__keys_plans_by_tz_offset(clock: FakeClock):
+    # Arrange
+    parser, fake_parser = get_parser(clock)
+    _ = parser.parse_dates("for 1 hour", tz_offset=0)
+    clock.now += 10
+    _ = parser.parse_dates("for 1 hour", tz_offset=0)
+
+    # Act
+    _ = parser.parse_dates("for 1 hour", tz_offset=19800)
+
+    # Assert
+    assert fake_parser.calls == 3
+
+
+def test_parse_dates__caches_unparseable_phrases(clock: FakeClock):
+    # Arrange
+    parser, fake_parser = get_parser(clock)
+    _ = parser.parse_dates("lunch", tz_offset=0)
+
+    # Act
+    parse_result = parser.parse_dates("lunch", tz_offset=0)
+
+    # Assert
+    assert parse_result is None
+    assert fake_parser.calls == 1
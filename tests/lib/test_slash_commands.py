@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.models import SlackPostRequestBody, SlashSubcommand, UserInfo
+from lib.slash_commands import (
+    RECORD_ID_PATTERN,
+    USER_MENTION_PATTERN,
+    SlashCommand,
+    SlashCommandDispatcher,
+)
+
+
+def get_dispatcher() -> SlashCommandDispatcher:
+    dispatcher = SlashCommandDispatcher()
+
+    @dispatcher.register(SlashSubcommand.LIST, argument_pattern=USER_MENTION_PATTERN)
+    async def list_subcommand(command: SlashCommand):
+        return ("list", command.arguments)
+
+    @dispatcher.register(SlashSubcommand.CLEAR, argument_pattern=RECORD_ID_PATTERN)
+    async def clear_subcommand(command: SlashCommand):
+        return ("clear", command.arguments)
+
+    @dispatcher.register_default
+    async def create_subcommand(command: SlashCommand):
+        return ("create", command.arguments)
+
+    return dispatcher
+
+
+def get_request_body(text: str) -> SlackPostRequestBody:
+    return SlackPostRequestBody(
+        api_app_id="api_app_id",
+        channel_id="channel_id",
+        command="/afk",
+        is_enterprise_install=False,
+        response_url="https://hooks.slack.com/commands/1",
+        team_id="team_id",
+        text=text,
+        token="token",
+        trigger_id="trigger_id",
+        user_id="user_id",
+    )
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("list", ("list", {})),
+        ("  LIST ", ("list", {})),
+        ("list <@U123ABC|jane>", ("list", {"user_id": "U123ABC"})),
+        ("list <@W42>", ("list", {"user_id": "W42"})),
+        ("list for 2 hours", ("create", {})),
+        (
+            "clear 0b6f2f4e-8d52-4f8b-9d4e-2f3c9a1b7e10",
+            ("clear", {"record_id": "0b6f2f4e-8d52-4f8b-9d4e-2f3c9a1b7e10"}),
+        ),
+        ("clear", ("clear", {})),
+        ("clear my schedule", ("create", {})),
+        ("for 1 hour", ("create", {})),
+        ("", ("create", {})),
+    ],
+)
+@pytest.mark.asyncio
+async def test_dispatch__routes_text_to_registered_handler(
+    text: str, expected: tuple[str, dict[str, str]]
+):
+    # Arrange
+    user_info = UserInfo(
+        id="user_id", locale="en-US", real_name="Jane", team_id="team_id", tz_offset=0
+    )
+
+    # Act
+    result = await get_dispatcher().dispatch(get_request_body(text), user_info)
+
+    # Assert
+    assert result == expected
+
+
+def test_resolve__without_default_handler_raises():
+    # Act / Assert
+    with pytest.raises(RuntimeError):
+        _ = SlashCommandDispatcher().resolve("for 1 hour")
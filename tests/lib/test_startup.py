@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.metrics import metrics
+from lib.startup import StartupReport, get_process_age_seconds
+
+
+def test_measure__records_phase_duration_and_gauge():
+    # Arrange
+    report = StartupReport()
+
+    # Act
+    with report.measure("mongo_connect"):
+        pass
+
+    # Assert
+    assert report.phases["mongo_connect"] >= 0
+    assert (
+        metrics.gauge("startup_phase_seconds", labels={"phase": "mongo_connect"}).value
+        == report.phases["mongo_connect"]
+    )
+
+
+def test_get_process_age_seconds__is_positive_on_linux():
+    # Act
+    process_age = get_process_age_seconds()
+
+    # Assert
+    if sys.platform == "linux":
+        assert process_age is not None and process_age > 0
+    else:
+        assert process_age is None
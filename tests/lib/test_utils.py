@@ -0,0 +1,181 @@
+from datetime import UTC, datetime, timedelta, timezone
+import os
+import sys
+
+from babel import dates
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
+
+from lib.models import AFKDisplayRow, AFKStatus, UserInfo
+from lib.utils import (
+    fields_to_mongodb_projection,
+    format_afk_records_to_print,
+    get_datetime_formatter,
+    parse_retry_after,
+    typed_dict_to_mongodb_query,
+)
+
+
+def test_typed_dict_to_mongodb_query__with_no_filters():
+    assert typed_dict_to_mongodb_query({}) == {}
+
+
+def test_typed_dict_to_mongodb_query__uses_equality_for_single_values():
+    # Arrange
+    now = datetime.now(tz=UTC)
+
+    # Act
+    result = typed_dict_to_mongodb_query(
+        {"team_id": ["team_id_0"], "status": [AFKStatus.ACTIVE], "end_datetime": now}
+    )
+
+    # Assert
+    assert result == {
+        "end_datetime": {"$gte": now.timestamp()},
+        "status": AFKStatus.ACTIVE.value,
+        "team_id": "team_id_0",
+    }
+    assert list(result) == ["end_datetime", "status", "team_id"]
+
+
+def test_typed_dict_to_mongodb_query__uses_in_for_many_values():
+    result = typed_dict_to_mongodb_query(
+        {"status": [AFKStatus.ACTIVE, AFKStatus.CANCELLED], "user_id": []}
+    )
+
+    assert result == {
+        "status": {"$in": [AFKStatus.ACTIVE.value, AFKStatus.CANCELLED.value]}
+    }
+
+
+def test_typed_dict_to_mongodb_query__with_datetime_range():
+    # Arrange
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    end = datetime(2026, 1, 2, tzinfo=UTC)
+
+    # Act
+    result = typed_dict_to_mongodb_query({"start_datetime": {"lt": end, "gte": start}})
+
+    # Assert
+    assert result == {
+        "start_datetime": {"$gte": start.timestamp(), "$lt": end.timestamp()}
+    }
+
+
+def test_fields_to_mongodb_projection():
+    assert fields_to_mongodb_projection(("text", "user_id")) == {
+        "_id": 0,
+        "text": 1,
+        "user_id": 1,
+    }
+
+
+@pytest.mark.parametrize(
+    "locale,tz_offset",
+    [
+        ("en-US", -18000),
+        ("en-GB", 0),
+        ("de-DE", 3600),
+        ("ja-JP", 32400),
+        ("hi-IN", 19800),
+    ],
+)
+def test_get_datetime_formatter__matches_babel_short_format(
+    locale: str, tz_offset: int
+):
+    # Arrange
+    timestamp = datetime(2026, 3, 14, 15, 9, 26, tzinfo=UTC).timestamp()
+    expected_result = dates.format_datetime(
+        datetime.fromtimestamp(timestamp, tz=timezone(timedelta(seconds=tz_offset))),
+        locale=locale.replace("-", "_"),
+        format="short",
+    )
+
+    # Act
+    result = get_datetime_formatter(locale=locale, tz_offset=tz_offset).format(
+        timestamp
+    )
+
+    # Assert
+    assert result == expected_result
+
+
+@pytest.mark.parametrize(
+    ("mention_unknown_users", "expected"), [(True, "<@U2>"), (False, "U2")]
+)
+def test_format_afk_records_to_print__falls_back_for_unknown_users(
+    mention_unknown_users: bool, expected: str
+):
+    # Arrange
+    user_info = UserInfo(
+        id="U1", locale="en-US", real_name="Name U1", team_id="T1", tz_offset=0
+    )
+    record = AFKDisplayRow(
+        channel_id="C1",
+        created=0,
+        end_datetime=7200,
+        id="id_0",
+        start_datetime=3600,
+        status=AFKStatus.ACTIVE.value,
+        team_id="T1",
+        text="for 1 hour",
+        user_id="U2",
+    )
+
+    # Act
+    (result,) = format_afk_records_to_print(
+        afk_records=[record],
+        user_info=user_info,
+        mention_unknown_users=mention_unknown_users,
+    )
+
+    # Assert
+    assert result.real_name == expected
+
+
+def test_format_afk_records_to_print__shows_only_own_record_ids():
+    # Arrange
+    user_info = UserInfo(
+        id="U1", locale="en-US", real_name="Name U1", team_id="T1", tz_offset=0
+    )
+    records = [
+        AFKDisplayRow(
+            channel_id="C1",
+            created=0,
+            end_datetime=7200,
+            id=f"id_{user_id}",
+            start_datetime=3600,
+            status=AFKStatus.ACTIVE.value,
+            team_id="T1",
+            text="for 1 hour",
+            user_id=user_id,
+        )
+        for user_id in ("U1", "U2")
+    ]
+
+    # Act
+    result = format_afk_records_to_print(
+        afk_records=records, user_info=user_info, show_own_record_ids=True
+    )
+
+    # Assert
+    assert [record.id for record in result] == ["id_U1", None]
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(None, 2.0), ("3", 3.0), ("1.5", 1.5), ("-1", 0.0), ("soon", 2.0)],
+)
+def test_parse_retry_after__with_seconds(value: str | None, expected: float):
+    assert parse_retry_after(value, default=2.0) == expected
+
+
+def test_parse_retry_after__with_http_date():
+    retry_at = datetime.now(tz=UTC) + timedelta(seconds=30)
+
+    retry_after = parse_retry_after(
+        retry_at.strftime("%a, %d %b %Y %H:%M:%S GMT"), default=2.0
+    )
+
+    assert 25 <= retry_after <= 30